@@ -1,15 +1,597 @@
 #!/usr/bin/env python3
 
 import argparse
+import codecs
+import copy
+import fnmatch
+import glob
+import gzip
+import hashlib
+import heapq
 import json
 import os
+import sqlite3
 import subprocess
 import sys
 import tempfile
 import webbrowser
 import traceback
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from itertools import count, groupby
 from pathlib import Path
 import re
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_JSON_WHITESPACE = ' \t\n\r'
+_JSON_NUMBER_RE = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?')
+_JSON_NUMBER_CHARS_RE = re.compile(r'[-+0-9.eE]+')
+_JSON_LITERALS = (('true', True), ('false', False), ('null', None))
+
+
+def iter_json_events(stream, chunk_size=65536):
+    """Incrementally tokenize a JSON stream into (event, value) pairs
+
+    Only one chunk of the input is held in memory at a time, so arbitrarily
+    large documents (such as build logs) can be walked with bounded memory.
+    Events are 'start_map', 'end_map', 'start_array', 'end_array', 'map_key'
+    and 'value'.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    eof = False
+    containers = []  # True for objects, False for arrays
+    expect_key = False
+
+    while True:
+        while pos < len(buf) and buf[pos] in _JSON_WHITESPACE:
+            pos += 1
+
+        needs_more = pos >= len(buf)
+        if not needs_more:
+            ch = buf[pos]
+            if ch == '{':
+                containers.append(True)
+                expect_key = True
+                pos += 1
+                yield 'start_map', None
+                continue
+            if ch == '}':
+                containers.pop()
+                expect_key = False
+                pos += 1
+                yield 'end_map', None
+                continue
+            if ch == '[':
+                containers.append(False)
+                expect_key = False
+                pos += 1
+                yield 'start_array', None
+                continue
+            if ch == ']':
+                containers.pop()
+                pos += 1
+                yield 'end_array', None
+                continue
+            if ch == ',':
+                expect_key = bool(containers and containers[-1])
+                pos += 1
+                continue
+            if ch == ':':
+                expect_key = False
+                pos += 1
+                continue
+            if ch == '"':
+                try:
+                    value, end = json.decoder.scanstring(buf, pos + 1)
+                except json.JSONDecodeError:
+                    # The string may continue in the next chunk
+                    if eof:
+                        raise
+                    needs_more = True
+                else:
+                    pos = end
+                    if expect_key:
+                        expect_key = False
+                        yield 'map_key', value
+                    else:
+                        yield 'value', value
+                    continue
+            else:
+                token = _JSON_NUMBER_CHARS_RE.match(buf, pos)
+                if token and token.end() == len(buf) and not eof:
+                    # The number may continue in the next chunk
+                    needs_more = True
+                elif token and _JSON_NUMBER_RE.fullmatch(token.group()):
+                    text = token.group()
+                    pos = token.end()
+                    is_float = '.' in text or 'e' in text or 'E' in text
+                    yield 'value', float(text) if is_float else int(text)
+                    continue
+                else:
+                    literal = next(((word, value) for word, value in _JSON_LITERALS
+                                    if buf.startswith(word, pos)), None)
+                    if literal:
+                        pos += len(literal[0])
+                        yield 'value', literal[1]
+                        continue
+                    if eof or len(buf) - pos >= 5:
+                        raise ValueError(f"Unexpected character {ch!r} in JSON stream")
+                    needs_more = True
+
+        if needs_more:
+            if eof:
+                if containers:
+                    raise ValueError("Unexpected end of JSON stream")
+                return
+            chunk = stream.read(chunk_size)
+            if isinstance(chunk, bytes):
+                text = decoder.decode(chunk, final=not chunk)
+            else:
+                text = chunk
+            eof = not chunk
+            buf = buf[pos:] + text
+            pos = 0
+
+
+def json_value_from_events(events, event, value):
+    """Materialize the JSON value that starts with (event, value) from an event stream"""
+    if event == 'start_map':
+        obj = {}
+        for event, value in events:
+            if event == 'end_map':
+                return obj
+            key = value
+            event, value = next(events)
+            obj[key] = json_value_from_events(events, event, value)
+    elif event == 'start_array':
+        items = []
+        for event, value in events:
+            if event == 'end_array':
+                return items
+            items.append(json_value_from_events(events, event, value))
+    return value
+
+
+def iter_json_path(events, path, scalars=None, build=json_value_from_events):
+    """Yield the values at path from a JSON event stream, one at a time
+
+    path is a tuple of map keys where '*' matches any array item or key.
+    Only matched values are materialized, by build(events, event, value).
+    When scalars is a dict, scalar members of the top-level object are
+    stored into it as they stream past.
+    """
+    events = iter(events)
+    stack = []  # map key or '*' per open container
+    for event, value in events:
+        if event == 'map_key':
+            stack[-1] = value
+        elif event in ('end_map', 'end_array'):
+            stack.pop()
+        elif len(stack) == len(path) and all(want == '*' or want == key for want, key in zip(path, stack)):
+            yield build(events, event, value)
+        elif event == 'start_map':
+            stack.append(None)
+        elif event == 'start_array':
+            stack.append('*')
+        elif scalars is not None and len(stack) == 1:
+            scalars[stack[0]] = value
+
+
+def parse_size(value):
+    """Parse a byte size such as 512M or 2G (argparse type)"""
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*$', str(value), re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid size: {value} (expected e.g. 512M or 2G)")
+    multiplier = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[match.group(2).upper()]
+    return int(float(match.group(1)) * multiplier)
+
+
+def parse_xcresult_date(value):
+    """Parse an xcresult Date value (e.g. 2024-05-02T10:11:12.345+0000)"""
+    if not isinstance(value, str) or not value:
+        return None
+    for date_format in ('%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%dT%H:%M:%S%z'):
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+class JSONBackend:
+    """Decode and encode JSON with orjson when it is installed, the stdlib otherwise
+
+    Decoding takes the raw bytes read from a subprocess or file, so the
+    accelerated backend never needs an intermediate str copy. Encoding
+    returns bytes for the same reason.
+    """
+
+    NAMES = ('auto', 'orjson', 'json')
+
+    def __init__(self, name='auto'):
+        self.select(name)
+
+    def select(self, name):
+        """Switch backend; 'auto' prefers orjson and falls back to the stdlib"""
+        if name == 'auto':
+            name = 'orjson' if orjson is not None else 'json'
+        if name == 'orjson' and orjson is None:
+            raise ValueError("The orjson JSON backend is not installed. Run: pip install orjson")
+        if name not in self.NAMES:
+            raise ValueError(f"Unknown JSON backend: {name}")
+        self.name = name
+        return self
+
+    def loads(self, data):
+        """Decode a JSON document given as bytes or str"""
+        if self.name == 'orjson':
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def dumps(self, obj, indent=None, sort_keys=False):
+        """Encode obj as UTF-8 bytes; any indent is rendered as two spaces by orjson"""
+        if self.name == 'orjson':
+            option = orjson.OPT_NON_STR_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, option=option)
+        separators = None if indent else (',', ':')
+        return json.dumps(obj, indent=indent, sort_keys=sort_keys, separators=separators).encode('utf-8')
+
+    def load(self, path):
+        """Read and decode a JSON file, gzip-compressed when it ends with .gz"""
+        open_file = gzip.open if str(path).endswith('.gz') else open
+        with open_file(path, 'rb') as f:
+            return self.loads(f.read())
+
+    def dump(self, obj, path, indent=None, sort_keys=False):
+        """Encode obj into a JSON file, gzip-compressed when it ends with .gz"""
+        open_file = gzip.open if str(path).endswith('.gz') else open
+        with open_file(path, 'wb') as f:
+            f.write(self.dumps(obj, indent=indent, sort_keys=sort_keys))
+
+
+json_backend = JSONBackend()
+
+
+class SpillStore:
+    """Keep report records within a memory budget and spill the rest to disk
+
+    Spilled records live in a private temporary SQLite database, which
+    SQLite deletes as soon as the connection is closed. Sizes are estimated
+    from each record's encoded JSON; parsed objects take several times that
+    in memory, hence OBJECT_OVERHEAD.
+    """
+
+    OBJECT_OVERHEAD = 4
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.used = 0
+        self.segments = 0
+        self.spilled_records = 0
+        self._connection = None
+
+    @classmethod
+    def record_size(cls, record):
+        """Estimate the in-memory size of a parsed record"""
+        return len(json_backend.dumps(record)) * cls.OBJECT_OVERHEAD
+
+    def reserve(self, size):
+        """Account for records kept in memory; False once they would exceed the budget"""
+        if self.used + size > self.budget:
+            return False
+        self.used += size
+        return True
+
+    def segment(self):
+        """Start a new on-disk segment"""
+        if self._connection is None:
+            # An empty filename is a temporary on-disk database, not an in-memory one
+            self._connection = sqlite3.connect('')
+            self._connection.execute('PRAGMA cache_size = -2048')
+            self._connection.execute(
+                'CREATE TABLE records (segment INTEGER, seq INTEGER, sort_key TEXT, sort_name TEXT, data BLOB)')
+            self._connection.execute('CREATE INDEX records_by_seq ON records (segment, seq)')
+            self._connection.execute('CREATE INDEX records_by_key ON records (segment, sort_key, sort_name, seq)')
+        self.segments += 1
+        return SpilledSegment(self, self.segments)
+
+    def close(self):
+        """Drop the spilled records"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SpilledSegment:
+    """An append-only sequence of JSON records stored in a SpillStore"""
+
+    def __init__(self, store, segment_id):
+        self.store = store
+        self.segment_id = segment_id
+        self.count = 0
+
+    def append(self, record, sort_key='', sort_name=''):
+        """Store a record with the keys ordered() sorts by"""
+        self.store._connection.execute(
+            'INSERT INTO records VALUES (?, ?, ?, ?, ?)',
+            (self.segment_id, self.count, sort_key, sort_name, json_backend.dumps(record))
+        )
+        self.count += 1
+        self.store.spilled_records += 1
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self._query('seq')
+
+    def ordered(self):
+        """Iterate the records by (sort_key, sort_name), then insertion order"""
+        return self._query('sort_key, sort_name, seq')
+
+    def _query(self, order):
+        cursor = self.store._connection.execute(
+            f'SELECT data FROM records WHERE segment = ? ORDER BY {order}', (self.segment_id,))
+        for (data,) in cursor:
+            yield json_backend.loads(data)
+
+
+VIRTUAL_REPORT_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Xcode Test Results</title>
+    <style>
+        body { font-family: -apple-system, BlinkMacSystemFont, sans-serif; margin: 16px; }
+        .toolbar { display: flex; gap: 8px; margin: 8px 0; }
+        .viewport { height: 70vh; overflow-y: auto; border: 1px solid #ddd; }
+        .spacer { position: relative; }
+        .row { position: absolute; left: 0; right: 0; height: 24px; line-height: 24px; padding: 0 8px;
+               white-space: nowrap; overflow: hidden; text-overflow: ellipsis; box-sizing: border-box;
+               border-bottom: 1px solid #f3f3f3; }
+        .group { font-weight: bold; cursor: pointer; background: #fafafa; }
+        .child { padding-left: 32px; }
+        .failure { padding-left: 56px; color: #b71c1c; }
+        .num { float: right; margin-left: 16px; font-variant-numeric: tabular-nums; }
+    </style>
+</head>
+<body>
+    <h1>Xcode Test Results</h1>
+    <div id="summary">Loading report data&hellip;</div>
+    <p id="loader" hidden>Could not load <code id="data-url"></code>. Select it manually: <input type="file" id="data-file"></p>
+
+    <h2>Test Details</h2>
+    <div class="toolbar">
+        <input id="test-search" type="search" placeholder="Filter tests and failures">
+        <select id="test-status">
+            <option value="">All statuses</option>
+            <option value="F">Failed</option>
+            <option value="S">Passed</option>
+            <option value="K">Skipped</option>
+            <option value="E">Expected failure</option>
+        </select>
+    </div>
+    <div id="tests" class="viewport"></div>
+
+    <h2>Code Coverage</h2>
+    <div class="toolbar"><input id="coverage-search" type="search" placeholder="Filter files"></div>
+    <div id="coverage" class="viewport"></div>
+
+    <script>
+    const DATA_URL = __DATA_URL__;
+    const ROW_HEIGHT = 24;
+    const ICONS = {S: '\\u2705', F: '\\u274c', K: '\\u23e9', E: '\\u26a0\\ufe0f'};
+
+    // Render only the rows inside the scrolled window of a fixed-height viewport
+    function virtualList(container, renderRow) {
+        const spacer = document.createElement('div');
+        spacer.className = 'spacer';
+        container.appendChild(spacer);
+        const list = {rows: []};
+        function draw() {
+            const first = Math.max(0, Math.floor(container.scrollTop / ROW_HEIGHT) - 10);
+            const last = Math.min(list.rows.length, first + Math.ceil(container.clientHeight / ROW_HEIGHT) + 20);
+            const fragment = document.createDocumentFragment();
+            for (let i = first; i < last; i++) {
+                const row = renderRow(list.rows[i]);
+                row.classList.add('row');
+                row.style.top = (i * ROW_HEIGHT) + 'px';
+                fragment.appendChild(row);
+            }
+            spacer.replaceChildren(fragment);
+        }
+        list.refresh = rows => {
+            list.rows = rows;
+            spacer.style.height = (rows.length * ROW_HEIGHT) + 'px';
+            draw();
+        };
+        container.addEventListener('scroll', () => requestAnimationFrame(draw));
+        return list;
+    }
+
+    function element(className, text, title) {
+        const node = document.createElement('div');
+        node.className = className;
+        node.textContent = text;
+        if (title) node.title = title;
+        return node;
+    }
+
+    function withNumbers(node, numbers) {
+        for (const value of numbers.reverse()) {
+            const span = document.createElement('span');
+            span.className = 'num';
+            span.textContent = value;
+            node.prepend(span);
+        }
+        return node;
+    }
+
+    function percent(covered, executable) {
+        return executable ? (covered / executable * 100).toFixed(2) + '%' : '-';
+    }
+
+    function showTests(data) {
+        const tests = data.tests;
+        const groups = new Map();
+        for (const test of tests.rows) {
+            const key = tests.testables[test[0]] + '/' + tests.classes[test[1]];
+            if (!groups.has(key)) groups.set(key, {key: key, tests: []});
+            groups.get(key).tests.push(test);
+        }
+        const sortedGroups = [...groups.values()].sort((a, b) => a.key.localeCompare(b.key));
+        const expanded = new Set();
+        const search = document.getElementById('test-search');
+        const status = document.getElementById('test-status');
+        let list;
+
+        function matches(test, query) {
+            if (status.value && test[3] !== status.value) return false;
+            if (!query) return true;
+            const failures = (test[5] || []).map(failure => failure.join(' ')).join(' ');
+            return (tests.classes[test[1]] + ' ' + test[2] + ' ' + failures).toLowerCase().includes(query);
+        }
+
+        function flatten() {
+            const query = search.value.trim().toLowerCase();
+            const filtering = Boolean(query || status.value);
+            const rows = [];
+            for (const group of sortedGroups) {
+                const members = group.tests.filter(test => matches(test, query));
+                if (!members.length) continue;
+                const open = filtering || expanded.has(group.key);
+                const failed = members.filter(test => test[3] === 'F').length;
+                rows.push({group: group, count: members.length, failed: failed, open: open});
+                if (!open) continue;
+                for (const test of members) {
+                    rows.push({test: test});
+                    for (const failure of test[5] || []) rows.push({failure: failure});
+                }
+            }
+            list.refresh(rows);
+        }
+
+        list = virtualList(document.getElementById('tests'), row => {
+            if (row.group) {
+                const node = element('group', (row.open ? '\\u25be ' : '\\u25b8 ') + row.group.key);
+                node.onclick = () => {
+                    expanded.has(row.group.key) ? expanded.delete(row.group.key) : expanded.add(row.group.key);
+                    flatten();
+                };
+                return withNumbers(node, [row.failed + ' failed', row.count + ' tests']);
+            }
+            if (row.test) {
+                const test = row.test;
+                return withNumbers(element('child', (ICONS[test[3]] || ICONS.E) + ' ' + test[2]), [test[4].toFixed(2) + 's']);
+            }
+            return element('failure', row.failure[0] + ' \\u2014 ' + row.failure[1], row.failure[0]);
+        });
+        search.addEventListener('input', flatten);
+        status.addEventListener('change', flatten);
+        flatten();
+    }
+
+    function showCoverage(data) {
+        const coverage = data.coverage;
+        const container = document.getElementById('coverage');
+        if (!coverage) {
+            container.replaceWith(element('', 'No code coverage data.'));
+            return;
+        }
+        const expanded = new Set();
+        const search = document.getElementById('coverage-search');
+        let list;
+
+        function flatten() {
+            const query = search.value.trim().toLowerCase();
+            const rows = [{total: coverage}];
+            for (const target of coverage.targets) {
+                const files = target.files.filter(file => !query || file[0].toLowerCase().includes(query));
+                if (query && !files.length) continue;
+                const open = Boolean(query) || expanded.has(target.name);
+                rows.push({target: target, open: open});
+                if (open) for (const file of files) rows.push({file: file});
+            }
+            list.refresh(rows);
+        }
+
+        list = virtualList(container, row => {
+            if (row.total) {
+                return withNumbers(element('group', 'Total'), [
+                    percent(row.total.covered, row.total.executable), row.total.covered + ' / ' + row.total.executable]);
+            }
+            if (row.target) {
+                const node = element('group', (row.open ? '\\u25be ' : '\\u25b8 ') + row.target.name);
+                node.onclick = () => {
+                    expanded.has(row.target.name) ? expanded.delete(row.target.name) : expanded.add(row.target.name);
+                    flatten();
+                };
+                return withNumbers(node, [
+                    percent(row.target.covered, row.target.executable), row.target.covered + ' / ' + row.target.executable]);
+            }
+            const node = element('child', '');
+            const link = document.createElement('a');
+            link.textContent = row.file[0];
+            link.target = '_blank';
+            if (coverage.urlBase) link.href = coverage.urlBase + row.file[1];
+            node.appendChild(link);
+            return withNumbers(node, [percent(row.file[2], row.file[3]), row.file[2] + ' / ' + row.file[3]]);
+        });
+        search.addEventListener('input', flatten);
+        flatten();
+    }
+
+    // The sidecar may be plain or gzip-compressed JSON
+    async function decode(stream) {
+        const bytes = new Uint8Array(await new Response(stream).arrayBuffer());
+        if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+            stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+            return new Response(stream).json();
+        }
+        return JSON.parse(new TextDecoder().decode(bytes));
+    }
+
+    function show(data) {
+        document.getElementById('summary').innerHTML = data.summaryHtml;
+        showTests(data);
+        showCoverage(data);
+    }
+
+    fetch(DATA_URL)
+        .then(response => { if (!response.ok) throw new Error(response.statusText); return decode(response.body); })
+        .then(show)
+        .catch(() => {
+            // Browsers refuse fetch() from file:// pages, so let the user pick the file
+            document.getElementById('data-url').textContent = DATA_URL;
+            document.getElementById('loader').hidden = false;
+            document.getElementById('data-file').onchange = event => decode(event.target.files[0].stream()).then(show);
+        });
+    </script>
+</body>
+</html>
+"""
 
 
 class Parser:
@@ -18,23 +600,78 @@ class Parser:
 
     def parse(self, reference=None):
         """Parse JSON data from xcresulttool"""
-        json_str = self._to_json(reference)
-        root = json.loads(json_str)
+        json_bytes = self._to_json(reference)
+        root = json_backend.loads(json_bytes)
         return self._parse_object(root)
 
+    def iter_parse(self, references, max_workers=8):
+        """Parse many references concurrently, yielding (reference, object) in order
+
+        At most 2 * max_workers fetches are in flight, so callers can consume
+        the results lazily without holding every object in memory.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for reference in references:
+                pending.append((reference, executor.submit(self.parse, reference)))
+                if len(pending) >= max_workers * 2:
+                    reference, future = pending.popleft()
+                    yield reference, future.result()
+            while pending:
+                reference, future = pending.popleft()
+                yield reference, future.result()
+
+    def stream_events(self, reference=None):
+        """Stream JSON events from xcresulttool without buffering the whole document"""
+        return self._stream_command(self._object_args(reference), 'xcresult JSON')
+
+    def stream_code_coverage(self):
+        """Stream JSON events of the code coverage report"""
+        return self._stream_command(['xcrun', 'xccov', 'view', '--report', '--json', self.bundle_path], 'code coverage')
+
+    def _stream_command(self, args, label):
+        """Yield JSON events from a command's stdout as it runs"""
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=stderr)
+            try:
+                yield from iter_json_events(process.stdout)
+            finally:
+                process.stdout.close()
+                if process.wait() != 0:
+                    stderr.seek(0)
+                    print(f"Error streaming {label}: {stderr.read().decode(errors='replace')}")
+
+    def export_attachment(self, reference, output_path):
+        """Export an attachment payload (e.g. a console log) to a file"""
+        args = [
+            'xcrun', 'xcresulttool', 'export',
+            '--legacy',
+            '--type', 'file',
+            '--path', self.bundle_path,
+            '--id', reference,
+            '--output-path', output_path
+        ]
+        
+        try:
+            subprocess.run(args, capture_output=True, check=True)
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"Error exporting attachment {reference}: {e.stderr.decode(errors='replace')}")
+            return False
+
     def export_code_coverage(self):
-        """Export code coverage data in JSON format"""
+        """Export code coverage data as raw JSON bytes"""
         args = ['xcrun', 'xccov', 'view', '--report', '--json', self.bundle_path]
         
         try:
-            result = subprocess.run(args, capture_output=True, text=True, check=True)
+            result = subprocess.run(args, capture_output=True, check=True)
             return result.stdout
         except subprocess.CalledProcessError as e:
-            print(f"Error exporting code coverage: {e.stderr}")
-            return ""
+            print(f"Error exporting code coverage: {e.stderr.decode(errors='replace')}")
+            return b""
 
-    def _to_json(self, reference=None):
-        """Convert xcresult data to JSON"""
+    def _object_args(self, reference=None):
+        """Build the xcresulttool command line for fetching an object"""
         args = [
             'xcrun', 'xcresulttool', 'get', 'object',
             '--legacy',
@@ -44,13 +681,18 @@ class Parser:
         
         if reference:
             args.extend(['--id', reference])
+        return args
+
+    def _to_json(self, reference=None):
+        """Fetch xcresult data as raw JSON bytes"""
+        args = self._object_args(reference)
         
         try:
-            result = subprocess.run(args, capture_output=True, text=True, check=True)
+            result = subprocess.run(args, capture_output=True, check=True)
             return result.stdout
         except subprocess.CalledProcessError as e:
-            print(f"Error getting xcresult JSON: {e.stderr}")
-            return "{}"
+            print(f"Error getting xcresult JSON: {e.stderr.decode(errors='replace')}")
+            return b"{}"
 
     def _parse_object(self, element):
         """Parse xcresult JSON object structure"""
@@ -120,19 +762,981 @@ class Parser:
             return element['_value']
 
 
+class BuildLogAnalyzer:
+    """Aggregate Swift compile time per file and target from a streamed build log"""
+
+    # Large free-form fields that are never needed for timing analysis
+    SKIPPED_KEYS = {'emittedOutput', 'commandDetails', 'attachments'}
+    COMPILE_TITLE_RE = re.compile(r'^(?:Compile|Compiling|SwiftCompile|CompileSwift)\b')
+    SWIFT_FILE_RE = re.compile(r'([^\s/]+\.swift)\b')
+    TARGET_TITLE_RE = re.compile(r'^Build target (?P<target>.+?)(?: of project .*)?$')
+    TYPE_CHECK_RE = re.compile(r'^(?P<subject>.+?) took (?P<ms>\d+(?:\.\d+)?)ms to type-check')
+    WORKSPACE_PREFIX = '/Users/runner/work/iterable-swift-sdk/iterable-swift-sdk/'
+
+    def __init__(self, parser, top_n=20):
+        self.parser = parser
+        self.top_n = top_n
+        self.files = {}    # (target, path) -> [seconds, steps]
+        self.targets = {}  # target -> [seconds, steps]
+        self.total_duration = 0.0
+        self.sections_seen = 0
+        self._type_checks = []  # bounded min-heap of (ms, seq, entry)
+        self._seq = 0
+
+    def analyze_reference(self, reference):
+        """Stream and analyze the build log behind an xcresult log reference"""
+        self.analyze(self.parser.stream_events(reference))
+
+    def analyze_file(self, path):
+        """Analyze a recorded build log JSON file (as written by xcresulttool)"""
+        with open(path, 'rb') as f:
+            self.analyze(iter_json_events(f))
+
+    def analyze(self, events):
+        """Consume the JSON events of an ActivityLogSection tree
+
+        Subsections are folded into per-file totals as soon as they are
+        complete, so only the chain of currently open sections is held in
+        memory regardless of the size of the log.
+        """
+        # Each frame is [container, current_key, attached_key, skip, kind]
+        stack = []
+        accumulators = []
+
+        def attach(value):
+            frame = stack[-1]
+            if isinstance(frame[0], dict):
+                frame[0][frame[1]] = value
+            else:
+                frame[0].append(value)
+
+        for event, value in events:
+            if event == 'map_key':
+                stack[-1][1] = value
+                continue
+
+            parent = stack[-1] if stack else None
+            skip = parent is not None and (parent[3] or parent[1] in self.SKIPPED_KEYS)
+
+            if event == 'value':
+                if not skip:
+                    attach(value)
+            elif event in ('start_map', 'start_array'):
+                kind = None
+                attached_key = parent[1] if parent else None
+                if event == 'start_map' and (parent is None or parent[4] == 'section_list'):
+                    kind = 'section'
+                    accumulators.append({'files': {}, 'type_checks': []})
+                elif (event == 'start_array' and parent is not None and parent[1] == '_values'
+                      and parent[2] == 'subsections'):
+                    kind = 'section_list'
+                container = {} if event == 'start_map' else []
+                stack.append([container, None, attached_key, skip, kind])
+            else:
+                frame = stack.pop()
+                if frame[4] == 'section':
+                    self._finish_section(frame[0], accumulators.pop(), accumulators)
+                elif not frame[3] and stack:
+                    attach(frame[0])
+
+    def _finish_section(self, raw_section, accumulator, accumulators):
+        """Record a completed section and hand its totals to the enclosing one"""
+        section = self.parser._parse_object(raw_section)
+        self.sections_seen += 1
+        title = section.get('title') or ''
+        duration = section.get('duration') or 0
+        if not isinstance(duration, (int, float)):
+            try:
+                duration = float(duration)
+            except (ValueError, TypeError):
+                duration = 0
+
+        source_path = self._source_path(section)
+        if self.COMPILE_TITLE_RE.match(title):
+            if not source_path:
+                file_match = self.SWIFT_FILE_RE.search(title)
+                source_path = file_match.group(1) if file_match else None
+            if source_path:
+                entry = accumulator['files'].setdefault(source_path, [0.0, 0])
+                entry[0] += duration
+                entry[1] += 1
+
+        for message in section.get('messages') or []:
+            if not isinstance(message, dict):
+                continue
+            type_check_match = self.TYPE_CHECK_RE.match(message.get('title', ''))
+            if type_check_match:
+                location = self._source_path(message) or source_path or ''
+                self._push_type_check(accumulator['type_checks'], (
+                    float(type_check_match.group('ms')),
+                    {'subject': type_check_match.group('subject'), 'file': location}
+                ))
+
+        target_match = self.TARGET_TITLE_RE.match(title)
+        if target_match:
+            self._commit(target_match.group('target'), accumulator)
+        elif accumulators:
+            parent = accumulators[-1]
+            for path, (seconds, steps) in accumulator['files'].items():
+                entry = parent['files'].setdefault(path, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += steps
+            for item in accumulator['type_checks']:
+                self._push_type_check(parent['type_checks'], (item[0], item[2]))
+        else:
+            # Root section: whatever was not attributed to a target
+            self.total_duration += duration
+            self._commit('Other', accumulator)
+
+    def _commit(self, target, accumulator):
+        """Attribute accumulated compile steps to a target"""
+        for path, (seconds, steps) in accumulator['files'].items():
+            entry = self.files.setdefault((target, path), [0.0, 0])
+            entry[0] += seconds
+            entry[1] += steps
+            target_entry = self.targets.setdefault(target, [0.0, 0])
+            target_entry[0] += seconds
+            target_entry[1] += steps
+        for ms, _, entry in accumulator['type_checks']:
+            self._push_type_check(self._type_checks, (ms, dict(entry, target=target)))
+
+    def _push_type_check(self, heap, item):
+        """Keep only the top_n slowest type-check entries in a min-heap"""
+        self._seq += 1
+        heap_item = (item[0], self._seq, item[1])
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, heap_item)
+        elif heap_item[0] > heap[0][0]:
+            heapq.heapreplace(heap, heap_item)
+
+    def _source_path(self, element):
+        """Extract a repository-relative source path from a document location"""
+        location = element.get('location')
+        url = location.get('url', '') if isinstance(location, dict) else ''
+        if not url:
+            return None
+        path = url.split('#', 1)[0]
+        if path.startswith('file://'):
+            path = path[len('file://'):]
+        if not path.endswith('.swift'):
+            return None
+        return path.replace(self.WORKSPACE_PREFIX, '')
+
+    def top_files(self):
+        """Return the top_n slowest (target, path, seconds, steps) entries"""
+        slowest = heapq.nlargest(self.top_n, self.files.items(), key=lambda item: item[1][0])
+        return [(target, path, seconds, steps) for (target, path), (seconds, steps) in slowest]
+
+    def top_type_checks(self):
+        """Return the slowest type-check entries, slowest first"""
+        return [dict(entry, ms=ms) for ms, _, entry in sorted(self._type_checks, key=lambda item: -item[0])]
+
+    def to_dict(self):
+        """Summarize the analysis as a JSON-serializable dictionary"""
+        return {
+            'totalDuration': self.total_duration,
+            'sections': self.sections_seen,
+            'targets': [
+                {'name': name, 'compileSeconds': seconds, 'steps': steps}
+                for name, (seconds, steps) in sorted(self.targets.items(), key=lambda item: -item[1][0])
+            ],
+            'slowestFiles': [
+                {'target': target, 'path': path, 'compileSeconds': seconds, 'steps': steps}
+                for target, path, seconds, steps in self.top_files()
+            ],
+            'slowestTypeChecks': self.top_type_checks()
+        }
+
+
+class TestTimeline:
+    """Reconstruct when each test ran on each parallel test worker"""
+
+    # Tests on the same worker run back to back; allow for clock rounding
+    LANE_TOLERANCE = 0.01
+
+    def __init__(self, parser, max_workers=8, top_n=20):
+        self.parser = parser
+        self.max_workers = max_workers
+        self.top_n = top_n
+
+    def build(self, report):
+        """Build the timeline for every chapter of a report"""
+        return {'chapters': [self._build_chapter(chapter) for chapter in report['chapters']]}
+
+    def _collect_intervals(self, chapter):
+        """Resolve the start time of every test in a chapter"""
+        tests = []
+        for section_name, section in chapter['sections'].items():
+            for test in section['details']:
+                if isinstance(test, dict):
+                    tests.append((section_name, test))
+
+        # Test metadata only carries durations; start times come from the
+        # activities of each test summary, which are fetched concurrently
+        references = [test['summaryRef']['id'] for _, test in tests
+                      if 'startTime' not in test and 'id' in test.get('summaryRef', {})]
+        starts = {}
+        for reference, summary in self.parser.iter_parse(references, self.max_workers):
+            activity_starts = [parse_xcresult_date(activity.get('start'))
+                               for activity in summary.get('activitySummaries', [])
+                               if isinstance(activity, dict)]
+            activity_starts = [start for start in activity_starts if start]
+            if activity_starts:
+                starts[reference] = min(activity_starts)
+
+        intervals = []
+        untimed = 0
+        for section_name, test in tests:
+            start = parse_xcresult_date(test.get('startTime'))
+            if not start and 'summaryRef' in test:
+                start = starts.get(test['summaryRef'].get('id'))
+            if not start:
+                untimed += 1
+                continue
+            intervals.append({
+                'identifier': test.get('identifier', test.get('name', 'Unknown Test')),
+                'testable': section_name,
+                'status': test.get('testStatus', 'Unknown'),
+                'startTime': start,
+                'duration': test.get('duration', 0) or 0
+            })
+        return intervals, untimed
+
+    def _build_chapter(self, chapter):
+        """Assign tests to workers and measure overhead for one test action"""
+        intervals, untimed = self._collect_intervals(chapter)
+        action_start = parse_xcresult_date(chapter.get('startedTime'))
+        action_end = parse_xcresult_date(chapter.get('endedTime'))
+        timeline = {
+            'title': chapter.get('title') or chapter.get('schemeCommandName', 'Tests'),
+            'startedTime': chapter.get('startedTime'),
+            'endedTime': chapter.get('endedTime'),
+            'tests': len(intervals),
+            'untimedTests': untimed,
+            'workers': [],
+            'gaps': [],
+            'idleByKind': {},
+            'criticalPath': None
+        }
+        if not intervals:
+            return timeline
+
+        # All offsets are seconds since the action started
+        origin = action_start or min(interval['startTime'] for interval in intervals)
+        for interval in intervals:
+            interval['start'] = (interval.pop('startTime') - origin).total_seconds()
+            interval['end'] = interval['start'] + interval['duration']
+        intervals.sort(key=lambda interval: (interval['start'], interval['identifier']))
+
+        # A worker runs its tests back to back, so place each test on the
+        # worker that became free most recently before it started (best fit)
+        lanes = []
+        for interval in intervals:
+            best_lane = None
+            for lane in lanes:
+                lane_end = lane[-1]['end']
+                if lane_end <= interval['start'] + self.LANE_TOLERANCE and (
+                        best_lane is None or lane_end > best_lane[-1]['end']):
+                    best_lane = lane
+            if best_lane is None:
+                best_lane = []
+                lanes.append(best_lane)
+            best_lane.append(interval)
+
+        first_start = intervals[0]['start']
+        last_end = max(interval['end'] for interval in intervals)
+        wall = (action_end - origin).total_seconds() if action_end else last_end
+        wall = max(wall, last_end)
+        busy = sum(interval['duration'] for interval in intervals)
+
+        for worker, lane in enumerate(lanes):
+            previous = None
+            lane_idle = 0.0
+            for interval in lane:
+                interval['worker'] = worker
+                previous_end = previous['end'] if previous else 0.0
+                gap = interval['start'] - previous_end
+                if gap > self.LANE_TOLERANCE:
+                    if previous is None:
+                        kind = 'start-up'  # build, simulator boot, app launch, test host set-up
+                    elif self._test_class(previous) != self._test_class(interval):
+                        kind = 'class set-up'
+                    else:
+                        kind = 'test set-up'
+                    timeline['gaps'].append({
+                        'worker': worker, 'start': previous_end, 'duration': gap,
+                        'kind': kind, 'before': interval['identifier']
+                    })
+                    timeline['idleByKind'][kind] = timeline['idleByKind'].get(kind, 0.0) + gap
+                    lane_idle += gap
+                previous = interval
+            lane_busy = sum(interval['duration'] for interval in lane)
+            timeline['workers'].append({
+                'worker': worker,
+                'start': lane[0]['start'],
+                'end': lane[-1]['end'],
+                'busy': lane_busy,
+                'idle': lane_idle,
+                'tests': lane
+            })
+
+        trailing = wall - last_end
+        if trailing > self.LANE_TOLERANCE:
+            timeline['idleByKind']['tear-down'] = trailing
+
+        # The worker that finishes last determines the wall-clock time
+        critical = max(timeline['workers'], key=lambda worker: worker['end'])
+        slowest = heapq.nlargest(self.top_n, critical['tests'], key=lambda interval: interval['duration'])
+        timeline['criticalPath'] = {
+            'worker': critical['worker'],
+            'duration': wall,
+            'testTime': critical['busy'],
+            'overheadTime': wall - critical['busy'],
+            'slowestTests': [{'identifier': interval['identifier'], 'duration': interval['duration']}
+                             for interval in slowest]
+        }
+        timeline['gaps'] = heapq.nlargest(self.top_n, timeline['gaps'], key=lambda gap: gap['duration'])
+        timeline.update({
+            'wallTime': wall,
+            'testTime': busy,
+            'testPhaseTime': last_end - first_start,
+            'workerCount': len(lanes),
+            'utilization': busy / (len(lanes) * (last_end - first_start)) if last_end > first_start else 1.0,
+            'overallUtilization': busy / (len(lanes) * wall) if wall > 0 else 1.0
+        })
+        return timeline
+
+    def _test_class(self, interval):
+        """Return the test class part of a test identifier"""
+        parts = interval['identifier'].split('/')
+        return parts[-2] if len(parts) >= 2 else None
+
+
+class ActivityProfiler:
+    """Profile where UI tests spend their time across nested activity summaries"""
+
+    QUOTED_RE = re.compile(r'"[^"]*"|\'[^\']*\'')
+    NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+    WAIT_RE = re.compile(r'^(?:Wait|Waiting|Expect)', re.IGNORECASE)
+    QUERY_RE = re.compile(r'^(?:Find|Get all elements|Get number of matches|Check existence|Checking existence|'
+                          r'Requesting snapshot|Get the|Evaluate)', re.IGNORECASE)
+
+    def __init__(self, parser, max_workers=8, top_n=20):
+        self.parser = parser
+        self.max_workers = max_workers
+        self.top_n = top_n
+        self.tests_profiled = 0
+        self.activity_types = {}  # normalized title -> [count, self seconds, total seconds, max seconds]
+        self.folded_stacks = {}   # stack -> self milliseconds
+        self._slowest_waits = []
+        self._slowest_queries = []
+        self._seq = 0
+
+    def profile(self, report, patterns=None):
+        """Fetch and profile the activity trees of the tests matching patterns
+
+        Patterns are shell-style globs matched against 'testable/identifier'
+        (e.g. 'ui-tests/*' or '*/InboxTests/*'); all tests are profiled when
+        no patterns are given. Summaries are loaded lazily through a bounded
+        number of concurrent fetches and discarded once aggregated.
+        """
+        selected = {}
+        for chapter in report['chapters']:
+            for section_name, section in chapter['sections'].items():
+                for test in section['details']:
+                    if not isinstance(test, dict) or 'id' not in test.get('summaryRef', {}):
+                        continue
+                    qualified = f"{section_name}/{test.get('identifier', test.get('name', ''))}"
+                    if patterns and not any(fnmatch.fnmatchcase(qualified, pattern) for pattern in patterns):
+                        continue
+                    selected[test['summaryRef']['id']] = qualified
+
+        for reference, summary in self.parser.iter_parse(list(selected), self.max_workers):
+            frames = selected[reference].split('/')
+            self.tests_profiled += 1
+            for activity in summary.get('activitySummaries', []):
+                self._profile_activity(activity, frames, selected[reference])
+        return self
+
+    def _profile_activity(self, activity, parent_frames, test_name):
+        """Aggregate self time of an activity and recurse into its subactivities"""
+        if not isinstance(activity, dict):
+            return 0.0
+        duration = self._duration(activity)
+        title = activity.get('title', 'Unknown activity')
+        activity_type = self.normalize_title(title)
+        frames = parent_frames + [activity_type.replace(';', ',')]
+
+        children = 0.0
+        for subactivity in activity.get('subactivities', []):
+            children += self._profile_activity(subactivity, frames, test_name)
+        self_time = max(duration - children, 0.0)
+
+        stats = self.activity_types.setdefault(activity_type, [0, 0.0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += self_time
+        stats[2] += duration
+        stats[3] = max(stats[3], duration)
+
+        stack = ';'.join(frames)
+        self.folded_stacks[stack] = self.folded_stacks.get(stack, 0) + int(round(self_time * 1000))
+
+        if self.WAIT_RE.match(title):
+            self._push(self._slowest_waits, duration, {'title': title, 'test': test_name})
+        elif self.QUERY_RE.match(title):
+            self._push(self._slowest_queries, duration, {'title': title, 'test': test_name})
+        return duration
+
+    def _duration(self, activity):
+        """Return the wall-clock duration of an activity in seconds"""
+        start = parse_xcresult_date(activity.get('start'))
+        finish = parse_xcresult_date(activity.get('finish'))
+        if not start or not finish:
+            return 0.0
+        return max((finish - start).total_seconds(), 0.0)
+
+    def _push(self, heap, duration, entry):
+        """Keep only the top_n longest entries in a min-heap"""
+        self._seq += 1
+        item = (duration, self._seq, entry)
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, item)
+        elif duration > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+    @classmethod
+    def normalize_title(cls, title):
+        """Collapse element labels and numbers so similar activities group together"""
+        return cls.NUMBER_RE.sub('N', cls.QUOTED_RE.sub('"…"', title))
+
+    def slowest(self, heap):
+        """Return heap entries ordered from slowest to fastest"""
+        return [dict(entry, duration=duration) for duration, _, entry in sorted(heap, key=lambda item: -item[0])]
+
+    def write_folded(self, path):
+        """Write self times as folded stacks for flamegraph.pl / speedscope"""
+        with open(path, 'w') as f:
+            for stack in sorted(self.folded_stacks):
+                if self.folded_stacks[stack] > 0:
+                    f.write(f"{stack} {self.folded_stacks[stack]}\n")
+
+    def to_dict(self):
+        """Summarize the profile as a JSON-serializable dictionary"""
+        ranked = heapq.nlargest(self.top_n, self.activity_types.items(), key=lambda item: item[1][1])
+        return {
+            'testsProfiled': self.tests_profiled,
+            'activityTypes': [
+                {'activity': name, 'count': count, 'selfTime': self_time,
+                 'totalTime': total, 'maxTime': longest}
+                for name, (count, self_time, total, longest) in ranked
+            ],
+            'slowestWaits': self.slowest(self._slowest_waits),
+            'slowestQueries': self.slowest(self._slowest_queries)
+        }
+
+
+class FailureClusterer:
+    """Group failing tests by a normalized failure signature"""
+
+    UUID_RE = re.compile(r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b')
+    ADDRESS_RE = re.compile(r'\b0x[0-9a-fA-F]+\b')
+    NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+    def __init__(self):
+        self.clusters = {}  # signature -> cluster
+        self._test_ids = {}  # signature -> set of test ids already in cluster['tests']
+        self.test_signatures = {}  # test id -> set of signatures of its failures
+        self.failure_count = 0
+
+    @classmethod
+    def normalize(cls, message):
+        """Mask UUIDs, addresses and numbers that vary between otherwise identical failures"""
+        message = cls.UUID_RE.sub('<UUID>', message)
+        message = cls.ADDRESS_RE.sub('<ADDR>', message)
+        return cls.NUMBER_RE.sub('<N>', message)
+
+    @staticmethod
+    def location(failure):
+        """Format the source location of a failure summary"""
+        file_path = failure.get('fileName', '')
+        line_number = failure.get('lineNumber', 0)
+        return f"{file_path}:{line_number}" if file_path and line_number else "Unknown location"
+
+    @classmethod
+    def signature(cls, failure):
+        """Hash the normalized message and location of a failure summary"""
+        normalized = cls.normalize(failure.get('message', 'Unknown failure'))
+        digest = hashlib.sha1(f"{normalized}\0{cls.location(failure)}".encode()).hexdigest()
+        return digest[:12], normalized
+
+    def add(self, test_id, failure):
+        """Add one failure of a test to its cluster and return the signature"""
+        signature, normalized = self.signature(failure)
+        cluster = self.clusters.get(signature)
+        if cluster is None:
+            cluster = self.clusters[signature] = {
+                'signature': signature,
+                'message': normalized,
+                'example': failure.get('message', 'Unknown failure'),
+                'location': self.location(failure),
+                'tests': []
+            }
+            self._test_ids[signature] = set()
+        test_ids = self._test_ids[signature]
+        if test_id not in test_ids:
+            test_ids.add(test_id)
+            cluster['tests'].append(test_id)
+        self.test_signatures.setdefault(test_id, set()).add(signature)
+        self.failure_count += 1
+        return signature
+
+    def cluster_report(self, report):
+        """Cluster every failure summary in a report"""
+        for chapter in report['chapters']:
+            for section_name, section in chapter['sections'].items():
+                for test in section['details']:
+                    if isinstance(test, dict) and test.get('testStatus') == 'Failure':
+                        test_id = f"{section_name}/{test.get('identifier', test.get('name', 'Unknown Test'))}"
+                        for failure in test.get('failureSummaries', []):
+                            self.add(test_id, failure)
+        return self
+
+    def ranked(self):
+        """Return clusters with the most affected tests first"""
+        return sorted(self.clusters.values(), key=lambda cluster: (-len(cluster['tests']), cluster['signature']))
+
+
+class FunctionCoverageAnalyzer:
+    """Rank functions per coverage target with bounded top-K heaps"""
+
+    def __init__(self, top_n=20):
+        self.top_n = top_n
+        self.functions_seen = 0
+        self.targets = {}  # target -> {'uncovered': heap, 'hottest': heap}
+        self._seq = 0
+
+    def analyze(self, code_coverage):
+        """Rank every function of an already loaded xccov report"""
+        for target in (code_coverage or {}).get('targets', []):
+            heaps = self.targets.setdefault(target.get('name', 'Unknown'), {'uncovered': [], 'hottest': []})
+            for file in target.get('files', []):
+                self._add_file(heaps, file)
+        return self
+
+    def analyze_events(self, events):
+        """Rank functions from an xccov JSON event stream, holding one file at a time"""
+        for name, heaps in iter_json_path(events, ('targets', '*'), build=self._build_target):
+            target = self.targets.setdefault(name, {'uncovered': [], 'hottest': []})
+            for kind in ('uncovered', 'hottest'):
+                for key, _, entry in heaps[kind]:
+                    self._push(target[kind], key, entry)
+        return self
+
+    def _build_target(self, events, event, value):
+        """Consume one target object, ranking its files as they stream past
+
+        xccov writes a target's name after its files, so the target's
+        heaps are filled first and named when the object ends.
+        """
+        name = 'Unknown'
+        heaps = {'uncovered': [], 'hottest': []}
+        for event, value in events:
+            if event == 'end_map':
+                break
+            key = value
+            event, value = next(events)
+            if key == 'files' and event == 'start_array':
+                for event, value in events:
+                    if event == 'end_array':
+                        break
+                    self._add_file(heaps, json_value_from_events(events, event, value))
+            else:
+                value = json_value_from_events(events, event, value)
+                if key == 'name':
+                    name = value
+        return name, heaps
+
+    def _add_file(self, heaps, file):
+        """Push the functions of one coverage file into a target's heaps"""
+        for function in file.get('functions', []):
+            self.functions_seen += 1
+            executable = function.get('executableLines', 0)
+            covered = function.get('coveredLines', 0)
+            entry = None
+            if executable > covered:
+                entry = self._entry(file, function)
+                self._push(heaps['uncovered'], (executable - covered, executable), entry)
+            if function.get('executionCount', 0) > 0:
+                self._push(heaps['hottest'], (function['executionCount'],), entry or self._entry(file, function))
+
+    def _entry(self, file, function):
+        """Keep only the fields needed to report a function"""
+        return {
+            'name': function.get('name', 'Unknown'),
+            'file': file.get('name', 'Unknown'),
+            'path': file.get('path', ''),
+            'line': function.get('lineNumber', 0),
+            'executableLines': function.get('executableLines', 0),
+            'coveredLines': function.get('coveredLines', 0),
+            'executionCount': function.get('executionCount', 0)
+        }
+
+    def _push(self, heap, key, entry):
+        """Keep only the top_n entries with the largest keys in a min-heap"""
+        self._seq += 1
+        item = (key, self._seq, entry)
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, item)
+        elif key > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+    def ranked(self, target, kind):
+        """Return a target's 'uncovered' or 'hottest' functions, largest first"""
+        return [entry for _, _, entry in sorted(self.targets[target][kind], key=lambda item: item[0], reverse=True)]
+
+    def to_dict(self):
+        """Summarize the ranking as a JSON-serializable dictionary"""
+        return {
+            'functionsAnalyzed': self.functions_seen,
+            'targets': [
+                {
+                    'name': target,
+                    'largestUncovered': self.ranked(target, 'uncovered'),
+                    'hottest': self.ranked(target, 'hottest')
+                }
+                for target in sorted(self.targets, key=str.lower)
+            ]
+        }
+
+
+class LogIndex:
+    """Per-test console logs stored compressed in SQLite with an inverted word index
+
+    Runs accumulate in one index file, so logs of earlier bundles can be
+    searched without exporting them from the xcresult again. Re-indexing a
+    bundle replaces its previous logs.
+    """
+
+    VERSION = 1
+    WORD_RE = re.compile(r'[A-Za-z0-9_]+')
+    MAX_WORD_LENGTH = 64
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, self.VERSION):
+            raise ValueError(f"Unsupported log index version in {path}: {version}")
+        self.connection.executescript(f"""
+            PRAGMA user_version = {self.VERSION};
+            CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, bundle TEXT UNIQUE, indexed TEXT);
+            CREATE TABLE IF NOT EXISTS logs (
+                id INTEGER PRIMARY KEY, run INTEGER, test TEXT, status TEXT, name TEXT, size INTEGER, data BLOB
+            );
+            CREATE INDEX IF NOT EXISTS logs_by_test ON logs (test);
+            CREATE TABLE IF NOT EXISTS postings (token TEXT, log INTEGER, PRIMARY KEY (token, log)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_by_log ON postings (log);
+        """)
+
+    def add_run(self, bundle_path):
+        """Register a bundle, dropping the logs of any earlier indexing of it"""
+        previous = self.connection.execute('SELECT id FROM runs WHERE bundle = ?', (bundle_path,)).fetchone()
+        if previous:
+            self.connection.execute(
+                'DELETE FROM postings WHERE log IN (SELECT id FROM logs WHERE run = ?)', previous)
+            self.connection.execute('DELETE FROM logs WHERE run = ?', previous)
+            self.connection.execute('DELETE FROM runs WHERE id = ?', previous)
+        cursor = self.connection.execute(
+            'INSERT INTO runs (bundle, indexed) VALUES (?, ?)', (bundle_path, datetime.now().isoformat()))
+        return cursor.lastrowid
+
+    def add_log(self, run_id, test, status, name, data):
+        """Store a log compressed and post each distinct word of it"""
+        text = data.decode('utf-8', errors='replace')
+        cursor = self.connection.execute(
+            'INSERT INTO logs (run, test, status, name, size, data) VALUES (?, ?, ?, ?, ?, ?)',
+            (run_id, test, status, name, len(data), zlib.compress(data))
+        )
+        words = {word.lower()[:self.MAX_WORD_LENGTH] for word in self.WORD_RE.findall(text)}
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO postings (token, log) VALUES (?, ?)',
+            ((word, cursor.lastrowid) for word in words)
+        )
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def _candidate_logs(self, pattern):
+        """Return the ids of logs containing every word of pattern, or None if it has no words
+
+        Words of the pattern are whole words in a match, except the last one
+        when it ends the pattern, which is looked up as a prefix.
+        """
+        candidates = None
+        for match in self.WORD_RE.finditer(pattern.lower()):
+            word = match.group()[:self.MAX_WORD_LENGTH]
+            if match.end() < len(pattern) and len(word) < self.MAX_WORD_LENGTH:
+                rows = self.connection.execute('SELECT log FROM postings WHERE token = ?', (word,))
+            else:
+                upper = word[:-1] + chr(ord(word[-1]) + 1)
+                rows = self.connection.execute(
+                    'SELECT log FROM postings WHERE token >= ? AND token < ?', (word, upper))
+            logs = {log for (log,) in rows}
+            candidates = logs if candidates is None else candidates & logs
+            if not candidates:
+                break
+        return candidates
+
+    def search(self, pattern, regex=False, ignore_case=False, tests=None, bundles=None):
+        """Yield (bundle, test, status, line number, line) for matching log lines
+
+        A plain pattern matches where it starts at a word boundary, which
+        lets the word index pick the candidate logs; a regex scans every log.
+        """
+        flags = re.IGNORECASE if ignore_case else 0
+        if regex:
+            matcher = re.compile(pattern, flags)
+            candidates = None
+        else:
+            boundary = r'(?<![A-Za-z0-9_])' if self.WORD_RE.match(pattern) else ''
+            matcher = re.compile(boundary + re.escape(pattern), flags)
+            candidates = self._candidate_logs(pattern)
+        
+        logs = self.connection.execute(
+            'SELECT logs.id, runs.bundle, logs.test, logs.status FROM logs '
+            'JOIN runs ON runs.id = logs.run ORDER BY runs.id, logs.id'
+        ).fetchall()
+        for log_id, bundle, test, status in logs:
+            if candidates is not None and log_id not in candidates:
+                continue
+            if tests and not any(fnmatch.fnmatchcase(test, test_glob) for test_glob in tests):
+                continue
+            if bundles and not any(fnmatch.fnmatchcase(bundle, bundle_glob) for bundle_glob in bundles):
+                continue
+            (data,) = self.connection.execute('SELECT data FROM logs WHERE id = ?', (log_id,)).fetchone()
+            text = zlib.decompress(data).decode('utf-8', errors='replace')
+            for line_number, line in enumerate(text.splitlines(), 1):
+                if matcher.search(line):
+                    yield bundle, test, status, line_number, line
+
+
+class ConsoleLogExtractor:
+    """Export the console logs attached to tests into a LogIndex"""
+
+    TEXT_TYPES = ('public.plain-text', 'public.utf8-plain-text', 'public.log')
+    UNSAFE_PATH_RE = re.compile(r'[^A-Za-z0-9._-]+')
+
+    def __init__(self, parser, index, max_workers=8):
+        self.parser = parser
+        self.index = index
+        self.max_workers = max_workers
+        self.logs_exported = 0
+        self.bytes_exported = 0
+
+    @classmethod
+    def log_attachments(cls, activities):
+        """Yield the text attachments (console output, log files) of an activity tree"""
+        for activity in activities or []:
+            if not isinstance(activity, dict):
+                continue
+            for attachment in activity.get('attachments', []):
+                if not isinstance(attachment, dict) or 'id' not in attachment.get('payloadRef', {}):
+                    continue
+                if (attachment.get('uniformTypeIdentifier') in cls.TEXT_TYPES or
+                        attachment.get('filename', '').endswith(('.txt', '.log'))):
+                    yield attachment
+            yield from cls.log_attachments(activity.get('subactivities'))
+
+    def extract(self, report, bundle_path, failed_only=False, logs_dir=None):
+        """Index the logs of a report's tests
+
+        Summaries and attachment exports are fetched concurrently with a
+        bounded number in flight. The logs of failed tests are also written
+        to logs_dir; returns {'testable/identifier': log file} for those.
+        """
+        selected = {}  # summary reference -> (testable/identifier, status)
+        for chapter in report['chapters']:
+            for section_name, section in chapter['sections'].items():
+                for test in section['details']:
+                    if not isinstance(test, dict) or 'id' not in test.get('summaryRef', {}):
+                        continue
+                    if failed_only and test.get('testStatus') != 'Failure':
+                        continue
+                    selected[test['summaryRef']['id']] = (
+                        f"{section_name}/{test.get('identifier', test.get('name', ''))}", test.get('testStatus'))
+        
+        run_id = self.index.add_run(os.path.abspath(bundle_path))
+        links = {}
+        with tempfile.TemporaryDirectory() as export_dir, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            export_numbers = count()  # One file name per submitted export, even when earlier exports fail
+            for reference, summary in self.parser.iter_parse(list(selected), self.max_workers):
+                test, status = selected[reference]
+                for attachment in self.log_attachments(summary.get('activitySummaries')):
+                    output_path = os.path.join(export_dir, str(next(export_numbers)))
+                    future = executor.submit(self._export, attachment['payloadRef']['id'], output_path)
+                    pending.append((test, status, attachment, future))
+                    if len(pending) >= self.max_workers * 2:
+                        self._store(run_id, links, logs_dir, *pending.popleft())
+            while pending:
+                self._store(run_id, links, logs_dir, *pending.popleft())
+        
+        self.index.commit()
+        return links
+
+    def _export(self, reference, output_path):
+        """Export one attachment and return its bytes"""
+        if not self.parser.export_attachment(reference, output_path):
+            return None
+        with open(output_path, 'rb') as f:
+            data = f.read()
+        os.unlink(output_path)
+        return data
+
+    def _store(self, run_id, links, logs_dir, test, status, attachment, future):
+        """Add an exported log to the index, and to logs_dir for a failed test"""
+        data = future.result()
+        if data is None:
+            return
+        name = attachment.get('name') or attachment.get('filename', 'log')
+        self.index.add_log(run_id, test, status, name, data)
+        self.logs_exported += 1
+        self.bytes_exported += len(data)
+        
+        if logs_dir and status == 'Failure':
+            parts = [self.UNSAFE_PATH_RE.sub('_', part.replace('()', '')) or '_' for part in test.split('/')]
+            log_path = os.path.join(logs_dir, *parts) + '.txt'
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            # A test can attach several logs; append them in order under a header each
+            with open(log_path, 'ab' if test in links else 'wb') as f:
+                f.write(f"==> {name} <==\n".encode('utf-8'))
+                f.write(data)
+                if not data.endswith(b'\n'):
+                    f.write(b'\n')
+            links[test] = log_path
+
+
+class SkipTrie:
+    """Prefix trie over the skippedTests of one or more test plans
+
+    Paths run target -> class -> method, so classifying a test identifier
+    walks at most one node per component regardless of how many tests the
+    plans skip. A node carrying an entry skips everything beneath it, which
+    is how a class-level skip covers all of its methods.
+    """
+
+    RAN_STATUSES = ('Success', 'Failure', 'Expected Failure')
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    @classmethod
+    def from_plans(cls, test_plan_paths):
+        """Merge the skippedTests of several .xctestplan files into one trie"""
+        trie = cls()
+        for test_plan_path in test_plan_paths:
+            for target, target_skips in load_test_plan_skips(test_plan_path).items():
+                for entry in target_skips:
+                    trie.add(target, entry)
+        return trie
+
+    def add(self, target, entry):
+        """Add a 'Class' or 'Class/method' skip for a target"""
+        node = None
+        children = self.root
+        for part in [target] + entry.replace('()', '').split('/'):
+            node = children.setdefault(part, {'children': {}, 'entry': None})
+            children = node['children']
+        if node['entry'] is None:
+            node['entry'] = entry.replace('()', '')
+            self.size += 1
+
+    def match(self, target, identifier):
+        """Return the skip entry covering a test identifier, or None"""
+        node = self.root.get(target)
+        if node is None:
+            return None
+        for part in identifier.replace('()', '').split('/'):
+            node = node['children'].get(part)
+            if node is None:
+                return None
+            if node['entry'] is not None:
+                return node['entry']
+        return None
+
+    def entries(self):
+        """Yield (target, entry) for every skip in the trie"""
+        stack = [(target, node) for target, node in self.root.items()]
+        while stack:
+            target, node = stack.pop()
+            if node['entry'] is not None:
+                yield target, node['entry']
+            stack.extend((target, child) for child in node['children'].values())
+
+    def summarize(self, tests):
+        """Classify (target, identifier, status, duration) tuples into skipped tests
+
+        Tests the plan covers but that did run are not counted, so a plan
+        shared between bundles never inflates the totals. Entries matching
+        no reported test are listed as not run; a class entry with no reported
+        methods counts once since its methods are unknown.
+        """
+        rows = []
+        matched = set()
+        for target, identifier, status, duration in tests:
+            entry = self.match(target, identifier)
+            if entry is not None:
+                matched.add((target, entry))
+            if status == 'Skipped' or (entry is not None and status not in self.RAN_STATUSES):
+                rows.append({
+                    'target': target,
+                    'identifier': identifier,
+                    'status': status or 'Skipped',
+                    'duration': duration,
+                    'wholeClass': False
+                })
+        for target, entry in sorted(self.entries()):
+            if (target, entry) not in matched:
+                rows.append({
+                    'target': target,
+                    'identifier': entry,
+                    'status': 'Not run',
+                    'duration': None,
+                    'wholeClass': '/' not in entry
+                })
+        
+        targets = {}
+        for row in rows:
+            target = targets.setdefault(row['target'], {'skipped': 0, 'classes': {}})
+            test_class = row['identifier'].split('/')[0]
+            target['skipped'] += 1
+            target['classes'][test_class] = target['classes'].get(test_class, 0) + 1
+        return {'count': len(rows), 'targets': targets, 'rows': rows}
+
+
 class Formatter:
-    def __init__(self, bundle_path, test_stats=None, commit_sha=None, skipped_tests=None):
+    # Define status icons similar to TypeScript version
+    passed_icon = "✅"  # In TypeScript this is an image
+    failed_icon = "❌"  # In TypeScript this is an image
+    skipped_icon = "⏩"  # In TypeScript this is an image
+    expected_failure_icon = "⚠️"  # In TypeScript this is an image
+
+    def __init__(self, bundle_path, test_stats=None, commit_sha=None, skipped_tests=None, skip_index=None):
         self.bundle_path = bundle_path
         self.parser = Parser(bundle_path)
         self.test_stats = test_stats
         self.commit_sha = commit_sha
         self.skipped_tests = skipped_tests or set()
-        
-        # Define status icons similar to TypeScript version
-        self.passed_icon = "✅"  # In TypeScript this is an image
-        self.failed_icon = "❌"  # In TypeScript this is an image
-        self.skipped_icon = "⏩"  # In TypeScript this is an image
-        self.expected_failure_icon = "⚠️"  # In TypeScript this is an image
+        self.skip_index = skip_index
+        self.render_processes = 1
+        self.parallel_threshold = 5000
+        self.log_links = {}
+        self.log_link_base = None
 
     def format(self, options=None):
         """Format xcresult data into HTML report"""
@@ -142,87 +1746,57 @@ class Formatter:
                 'showCodeCoverage': True
             }
             
+        report = None
         try:
-            # Parse the main invocation record
-            actions_invocation_record = self.parser.parse()
-            
-            # Create report structure
-            report = {
-                'entityName': None,
-                'creatingWorkspaceFilePath': None,
-                'testStatus': 'neutral',
-                'annotations': [],
-                'buildLog': None,
-                'chapters': [],
-                'codeCoverage': None
-            }
-            
-            # Process metadata
-            if 'metadataRef' in actions_invocation_record:
-                metadata = self.parser.parse(actions_invocation_record['metadataRef']['id'])
-                if 'schemeIdentifier' in metadata and 'entityName' in metadata['schemeIdentifier']:
-                    report['entityName'] = metadata['schemeIdentifier']['entityName']
-                if 'creatingWorkspaceFilePath' in metadata:
-                    report['creatingWorkspaceFilePath'] = metadata['creatingWorkspaceFilePath']
-            
-            # Process actions
-            if 'actions' in actions_invocation_record:
-                for action in actions_invocation_record['actions']:
-                    # Process test results
-                    if 'actionResult' in action and 'testsRef' in action['actionResult']:
-                        chapter = {
-                            'title': action.get('title'),
-                            'schemeCommandName': action.get('schemeCommandName', ''),
-                            'runDestination': action.get('runDestination', {}),
-                            'sections': {},
-                            'summaries': [],
-                            'details': []
-                        }
-                        report['chapters'].append(chapter)
-                        
-                        # Process test plan run summaries
-                        action_test_plan_run_summaries = self.parser.parse(
-                            action['actionResult']['testsRef']['id']
-                        )
-                        
-                        for summary in action_test_plan_run_summaries.get('summaries', []):
-                            for testable_summary in summary.get('testableSummaries', []):
-                                if testable_summary.get('name'):
-                                    # Collect all tests recursively
-                                    all_tests = []
-                                    self._collect_tests_recursively(testable_summary.get('tests', []), all_tests)
-                                    
-                                    chapter['sections'][testable_summary['name']] = {
-                                        'summary': testable_summary,
-                                        'details': all_tests
-                                    }
-                    
-                    # Process code coverage if enabled
-                    if options['showCodeCoverage'] and 'actionResult' in action and 'coverage' in action['actionResult']:
-                        try:
-                            code_coverage_json = self.parser.export_code_coverage()
-                            if code_coverage_json:
-                                code_coverage = json.loads(code_coverage_json)
-                                report['codeCoverage'] = code_coverage
-                        except Exception as e:
-                            print(f"Error processing code coverage: {str(e)}")
+            report = self.build_report(options)
+            # Spilled records are read back from disk sequentially
+            self.render_processes = 1 if report['spill'] else options.get('renderProcesses', 1)
+            self.parallel_threshold = options.get('parallelThreshold', self.parallel_threshold)
+            self.log_links = options.get('logLinks') or {}
+            self.log_link_base = options.get('logLinkBase')
             
             # Generate test summary HTML
             test_summary_html = self._generate_test_summary_html(report)
             
+            # Cluster failures when asked to, or when there are too many to list individually
+            failure_clusters = None
+            if options.get('clusterFailures') or options.get('clusterThreshold'):
+                failure_clusters = FailureClusterer().cluster_report(report)
+                if not options.get('clusterFailures') and failure_clusters.failure_count < options['clusterThreshold']:
+                    failure_clusters = None
+            
             # Generate test details HTML
-            test_details_html = self._generate_test_details_html(report, options['showPassedTests'])
+            test_details_html = self._generate_test_details_html(report, options['showPassedTests'], failure_clusters)
             
             # Generate code coverage HTML if available
             code_coverage_html = ""
             if options['showCodeCoverage'] and report['codeCoverage']:
                 code_coverage_html = self._generate_code_coverage_html(report['codeCoverage'])
             
+            # Generate function coverage hotspots HTML if requested
+            function_coverage_html = ""
+            if options.get('showFunctionCoverage') and report['codeCoverage']:
+                function_coverage = FunctionCoverageAnalyzer(options.get('topN', 20)).analyze(report['codeCoverage'])
+                function_coverage_html = self._generate_function_coverage_html(function_coverage)
+            
+            # Generate build performance HTML if requested
+            build_performance_html = ""
+            if report['buildLog']:
+                build_performance_html = self._generate_build_performance_html(report['buildLog'])
+            
+            # Generate skipped tests HTML from the test plan skips
+            skipped_tests_html = self._generate_skipped_tests_html(report)
+            
+            test_status = self._determine_test_status(report)
+            
             return {
                 'reportSummary': test_summary_html,
                 'reportDetail': test_details_html,
                 'codeCoverage': code_coverage_html,
-                'testStatus': self._determine_test_status(report)
+                'functionCoverage': function_coverage_html,
+                'buildPerformance': build_performance_html,
+                'skippedTests': skipped_tests_html,
+                'testStatus': test_status
             }
             
         except Exception as e:
@@ -232,8 +1806,223 @@ class Formatter:
                 'reportSummary': f"<h1>Error Formatting Test Results</h1>\n<p>{str(e)}</p>",
                 'reportDetail': "",
                 'codeCoverage': "",
+                'functionCoverage': "",
+                'buildPerformance': "",
+                'skippedTests': "",
                 'testStatus': 'failure'
             }
+        finally:
+            # The rendered HTML (or error page) no longer needs the spilled records
+            if report and report['spill']:
+                report['spill'].close()
+
+    @contextmanager
+    def open_report(self, options):
+        """Build the report and drop its spilled records when the block exits"""
+        report = self.build_report(options)
+        try:
+            yield report
+        finally:
+            if report['spill']:
+                report['spill'].close()
+
+    def build_report(self, options):
+        """Parse the bundle into the report structure that all renderers share
+
+        In bounded-memory mode (maxMemory) records beyond the budget are
+        spilled to a SpillStore in report['spill'], which the caller closes
+        (see open_report). It is closed here if building fails.
+        """
+        spill = SpillStore(options['maxMemory']) if options.get('maxMemory') else None
+        try:
+            return self._build_report(options, spill)
+        except BaseException:
+            if spill:
+                spill.close()
+            raise
+
+    def _build_report(self, options, spill):
+        # Parse the main invocation record
+        actions_invocation_record = self.parser.parse()
+        
+        # Create report structure
+        report = {
+            'entityName': None,
+            'creatingWorkspaceFilePath': None,
+            'testStatus': 'neutral',
+            'annotations': [],
+            'buildLog': None,
+            'chapters': [],
+            'codeCoverage': None,
+            'spill': spill
+        }
+        
+        # Process metadata
+        if 'metadataRef' in actions_invocation_record:
+            metadata = self.parser.parse(actions_invocation_record['metadataRef']['id'])
+            if 'schemeIdentifier' in metadata and 'entityName' in metadata['schemeIdentifier']:
+                report['entityName'] = metadata['schemeIdentifier']['entityName']
+            if 'creatingWorkspaceFilePath' in metadata:
+                report['creatingWorkspaceFilePath'] = metadata['creatingWorkspaceFilePath']
+        
+        # Build log analysis is opt-in since it requires fetching the full log
+        if options.get('showBuildPerformance'):
+            report['buildLog'] = BuildLogAnalyzer(self.parser, options.get('topN', 20))
+            if options.get('buildLogPath'):
+                report['buildLog'].analyze_file(options['buildLogPath'])
+        
+        # Process actions
+        if 'actions' in actions_invocation_record:
+            for action in actions_invocation_record['actions']:
+                # Process the build log (prefer the build step's log over the test step's)
+                if report['buildLog'] and not options.get('buildLogPath'):
+                    log_ref = (action.get('buildResult', {}).get('logRef') or
+                               action.get('actionResult', {}).get('logRef'))
+                    if log_ref and 'id' in log_ref:
+                        report['buildLog'].analyze_reference(log_ref['id'])
+                
+                # Process test results
+                if 'actionResult' in action and 'testsRef' in action['actionResult']:
+                    chapter = {
+                        'title': action.get('title'),
+                        'schemeCommandName': action.get('schemeCommandName', ''),
+                        'runDestination': action.get('runDestination', {}),
+                        'startedTime': action.get('startedTime'),
+                        'endedTime': action.get('endedTime'),
+                        'sections': {},
+                        'summaries': [],
+                        'details': []
+                    }
+                    report['chapters'].append(chapter)
+                    
+                    # Process test plan run summaries
+                    if report['spill']:
+                        self._add_sections_bounded(chapter, action['actionResult']['testsRef']['id'], report['spill'])
+                    else:
+                        action_test_plan_run_summaries = self.parser.parse(
+                            action['actionResult']['testsRef']['id']
+                        )
+                        
+                        for summary in action_test_plan_run_summaries.get('summaries', []):
+                            for testable_summary in summary.get('testableSummaries', []):
+                                if testable_summary.get('name'):
+                                    # Collect all tests recursively
+                                    all_tests = []
+                                    self._collect_tests_recursively(testable_summary.get('tests', []), all_tests)
+                                    
+                                    chapter['sections'][testable_summary['name']] = {
+                                        'summary': testable_summary,
+                                        'details': all_tests
+                                    }
+                
+                # Process code coverage if enabled
+                if options.get('showCodeCoverage', True) and 'actionResult' in action and 'coverage' in action['actionResult']:
+                    try:
+                        if report['spill']:
+                            report['codeCoverage'] = self._load_code_coverage_bounded(report['spill'])
+                        else:
+                            code_coverage_json = self.parser.export_code_coverage()
+                            if code_coverage_json:
+                                code_coverage = json_backend.loads(code_coverage_json)
+                                report['codeCoverage'] = code_coverage
+                    except Exception as e:
+                        print(f"Error processing code coverage: {str(e)}")
+        
+        return report
+
+    def _add_sections_bounded(self, chapter, tests_ref, spill):
+        """Stream tests into per-testable sections one at a time, spilling them once over budget"""
+        current = {'tests': []}
+        
+        def add_test(test):
+            tests = current['tests']
+            if isinstance(tests, list):
+                if spill.reserve(spill.record_size(test)):
+                    tests.append(test)
+                    return
+                segment = spill.segment()
+                for kept in tests:
+                    segment.append(kept, self._test_class_name(kept), kept.get('name', ''))
+                current['tests'] = tests = segment
+            tests.append(test, self._test_class_name(test), test.get('name', ''))
+        
+        def build_testable(events, event, value):
+            return self._stream_test_tree(events, event, value, add_test)
+        
+        path = ('summaries', '_values', '*', 'testableSummaries', '_values', '*')
+        for raw_testable in iter_json_path(self.parser.stream_events(tests_ref), path, build=build_testable):
+            testable_summary = self.parser._parse_object(raw_testable)
+            all_tests, current['tests'] = current['tests'], []
+            if testable_summary.get('name'):
+                chapter['sections'][testable_summary['name']] = {
+                    'summary': testable_summary,
+                    'details': all_tests
+                }
+
+    def _stream_test_tree(self, events, event, value, add_test):
+        """Materialize a test tree node from JSON events, handing each test to add_test
+
+        The 'tests' and 'subtests' arrays keep only their groups (whose own
+        subtests are streamed the same way), so the tree is never held whole.
+        Tests are passed on parsed, in the order _collect_tests_recursively
+        would collect them.
+        """
+        if event != 'start_map':
+            return json_value_from_events(events, event, value)
+        node = {}
+        for event, value in events:
+            if event == 'end_map':
+                break
+            key = value
+            event, value = next(events)
+            if key in ('tests', 'subtests') and event == 'start_map':
+                node[key] = self._stream_test_children(events, add_test)
+            else:
+                node[key] = json_value_from_events(events, event, value)
+        return node
+
+    def _stream_test_children(self, events, add_test):
+        """Stream a {'_values': [...]} array of test tree nodes, keeping only the groups"""
+        wrapper = {}
+        groups = []
+        for event, value in events:
+            if event == 'end_map':
+                break
+            key = value
+            event, value = next(events)
+            if key == '_values' and event == 'start_array':
+                for event, value in events:
+                    if event == 'end_array':
+                        break
+                    child = self._stream_test_tree(events, event, value, add_test)
+                    if isinstance(child, dict) and 'subtests' not in child:
+                        add_test(self.parser._parse_object(child))
+                    else:
+                        groups.append(child)
+            else:
+                wrapper[key] = json_value_from_events(events, event, value)
+        wrapper['_values'] = groups
+        return wrapper
+
+    def _load_code_coverage_bounded(self, spill):
+        """Stream coverage targets one at a time, spilling them once over budget"""
+        code_coverage = {}
+        targets = []
+        for target in iter_json_path(self.parser.stream_code_coverage(), ('targets', '*'), code_coverage):
+            if isinstance(targets, list):
+                if spill.reserve(spill.record_size(target)):
+                    targets.append(target)
+                    continue
+                segment = spill.segment()
+                for kept in targets:
+                    segment.append(kept, kept.get('name', '').lower())
+                targets = segment
+            targets.append(target, target.get('name', '').lower())
+        
+        if not code_coverage and not len(targets):
+            return None
+        code_coverage['targets'] = targets
+        return code_coverage
 
     def _collect_tests_recursively(self, tests, result):
         """Collect tests recursively from nested test structure"""
@@ -434,97 +2223,230 @@ class Formatter:
         
         return "\n".join(lines)
 
-    def _generate_test_details_html(self, report, show_passed_tests=True):
+    def _generate_test_details_html(self, report, show_passed_tests=True, failure_clusters=None):
         """Generate HTML for test details"""
         lines = []
         
+        if failure_clusters and failure_clusters.clusters:
+            lines.append(self._generate_failure_clusters_html(failure_clusters))
+        
         for chapter in report['chapters']:
             lines.append("<h2>Test Details</h2>")
             
-            # Process each section (testable)
+            # Render each section (testable) independently, in parallel for large reports.
+            # Units carry only their own section's log links and cluster sizes, and the
+            # renderer is a classmethod, so workers never receive the whole Formatter
+            units = []
             for section_name, section in chapter['sections'].items():
-                lines.append(f"<h3>{section_name}</h3>")
+                prefix = f"{section_name}/"
+                log_links = {test_id: path for test_id, path in self.log_links.items() if test_id.startswith(prefix)}
+                cluster_sizes = None
+                if failure_clusters:
+                    cluster_sizes = {
+                        signature: len(failure_clusters.clusters[signature]['tests'])
+                        for test_id, signatures in failure_clusters.test_signatures.items()
+                        if test_id.startswith(prefix)
+                        for signature in signatures
+                    }
+                units.append((section_name, section, show_passed_tests, log_links, self.log_link_base, cluster_sizes))
+            weight = sum(len(section['details']) for section in chapter['sections'].values())
+            lines.extend(self._render_units(self._generate_test_section_html, units, weight))
+        
+        return "\n".join(lines)
+
+    @classmethod
+    def _generate_test_section_html(cls, section_name, section, show_passed_tests=True, log_links=None,
+                                    log_link_base=None, cluster_sizes=None):
+        """Generate HTML for the test details of one testable
+
+        log_links maps test ids to extracted console logs; cluster_sizes maps
+        the failure signatures of the section to their test counts when
+        failures are clustered.
+        """
+        lines = []
+        log_links = log_links or {}
+        
+        lines.append(f"<h3>{section_name}</h3>")
+        
+        for class_name, sorted_tests in cls._group_tests_by_class(section['details'], show_passed_tests):
+            # Create a unique ID for this class for anchoring
+            class_id = class_name.replace(' ', '_').replace('.', '_')
+            
+            lines.append(f'<h4 id="{class_id}">{class_name}</h4>')
+            lines.append('<table>')
+            
+            for test in sorted_tests:
+                status = test.get('testStatus', 'Unknown')
+                duration = test.get('duration', 0)
+                test_name = test.get('name', 'Unknown Test')
                 
-                # Group test results by test class
-                test_classes = {}
-                for test in section['details']:
-                    if isinstance(test, dict):
-                        # Skip passed tests if not showing them
-                        if not show_passed_tests and test.get('testStatus') == 'Success':
+                # Choose icon based on status
+                icon = cls.passed_icon if status == "Success" else \
+                       cls.failed_icon if status == "Failure" else \
+                       cls.skipped_icon if status == "Skipped" else \
+                       cls.expected_failure_icon
+                
+                # Create table row for test
+                test_id = f"{class_id}_{test_name.replace(' ', '_').replace('.', '_')}"
+                lines.append(f'<tr id="{test_id}">')
+                lines.append(f'<td>{icon}</td>')
+                lines.append(f'<td>{test_name}</td>')
+                lines.append(f'<td>{duration:.2f}s</td>')
+                lines.append('</tr>')
+                
+                # Link the console log extracted for a failed test
+                test_key = f"{section_name}/{test.get('identifier', test_name)}"
+                log_path = log_links.get(test_key)
+                if status == "Failure" and log_path:
+                    log_url = (os.path.relpath(log_path, log_link_base).replace(os.sep, '/')
+                               if log_link_base else Path(log_path).resolve().as_uri())
+                    lines.append('<tr>')
+                    lines.append('<td></td>')  # Empty cell for alignment
+                    lines.append(f'<td colspan="2"><a href="{log_url}" target="_blank">Console log</a></td>')
+                    lines.append('</tr>')
+                
+                # Add failure details if the test failed
+                if status == "Failure" and 'failureSummaries' in test:
+                    for failure in test['failureSummaries']:
+                        if cluster_sizes is not None:
+                            # Link to the shared signature instead of repeating the message
+                            signature, _ = FailureClusterer.signature(failure)
+                            member_count = cluster_sizes[signature]
+                            lines.append('<tr>')
+                            lines.append('<td></td>')  # Empty cell for alignment
+                            lines.append(f'<td colspan="2"><a href="#failure-{signature}">Failure {signature}</a> ({member_count} tests)</td>')
+                            lines.append('</tr>')
                             continue
-                            
-                        # Extract test class and name
-                        test_class = None
-                        test_name = test.get('name', 'Unknown Test')
-                        
-                        # Try to extract class name from test identifier
-                        if 'identifier' in test:
-                            parts = test['identifier'].split('/')
-                            if len(parts) >= 2:
-                                test_class = parts[-2]
                         
-                        # If no class found, use a default
-                        if not test_class:
-                            test_class = "Tests"
-                            
-                        # Add to the appropriate class group
-                        if test_class not in test_classes:
-                            test_classes[test_class] = []
-                        test_classes[test_class].append(test)
-                
-                # Sort classes alphabetically to match TypeScript behavior
-                for class_name in sorted(test_classes.keys()):
-                    tests = test_classes[class_name]
-                    
-                    # Create a unique ID for this class for anchoring
-                    class_id = class_name.replace(' ', '_').replace('.', '_')
-                    
-                    lines.append(f'<h4 id="{class_id}">{class_name}</h4>')
-                    lines.append('<table>')
-                    
-                    # Sort tests by name for consistent ordering
-                    sorted_tests = sorted(tests, key=lambda t: t.get('name', ''))
-                    
-                    for test in sorted_tests:
-                        status = test.get('testStatus', 'Unknown')
-                        duration = test.get('duration', 0)
-                        test_name = test.get('name', 'Unknown Test')
+                        message = failure.get('message', 'Unknown failure')
+                        file_path = failure.get('fileName', '')
+                        line_number = failure.get('lineNumber', 0)
                         
-                        # Choose icon based on status
-                        icon = self.passed_icon if status == "Success" else \
-                               self.failed_icon if status == "Failure" else \
-                               self.skipped_icon if status == "Skipped" else \
-                               self.expected_failure_icon
+                        location = f"{file_path}:{line_number}" if file_path and line_number else "Unknown location"
                         
-                        # Create table row for test
-                        test_id = f"{class_id}_{test_name.replace(' ', '_').replace('.', '_')}"
-                        lines.append(f'<tr id="{test_id}">')
-                        lines.append(f'<td>{icon}</td>')
-                        lines.append(f'<td>{test_name}</td>')
-                        lines.append(f'<td>{duration:.2f}s</td>')
+                        lines.append('<tr>')
+                        lines.append('<td></td>')  # Empty cell for alignment
+                        lines.append('<td colspan="2">')
+                        lines.append('<div class="failure">')
+                        lines.append(f'<strong>Failure:</strong> {message}<br>')
+                        lines.append(f'<code>{location}</code>')
+                        lines.append('</div>')
+                        lines.append('</td>')
                         lines.append('</tr>')
-                        
-                        # Add failure details if the test failed
-                        if status == "Failure" and 'failureSummaries' in test:
-                            for failure in test['failureSummaries']:
-                                message = failure.get('message', 'Unknown failure')
-                                file_path = failure.get('fileName', '')
-                                line_number = failure.get('lineNumber', 0)
-                                
-                                location = f"{file_path}:{line_number}" if file_path and line_number else "Unknown location"
-                                
-                                lines.append('<tr>')
-                                lines.append('<td></td>')  # Empty cell for alignment
-                                lines.append('<td colspan="2">')
-                                lines.append('<div class="failure">')
-                                lines.append(f'<strong>Failure:</strong> {message}<br>')
-                                lines.append(f'<code>{location}</code>')
-                                lines.append('</div>')
-                                lines.append('</td>')
-                                lines.append('</tr>')
-                    
-                    lines.append('</table>')
+            
+            lines.append('</table>')
+        
+        return "\n".join(lines)
+
+    @staticmethod
+    def _test_class_name(test):
+        """Extract the class name from a test identifier ('Tests' if there is none)"""
+        test_class = None
+        if 'identifier' in test:
+            parts = test['identifier'].split('/')
+            if len(parts) >= 2:
+                test_class = parts[-2]
+        return test_class or "Tests"
+
+    @classmethod
+    def _group_tests_by_class(cls, details, show_passed_tests=True):
+        """Yield (class name, tests sorted by name) with classes in alphabetical order"""
+        if isinstance(details, SpilledSegment):
+            # Spilled tests come back from disk already sorted by class and name
+            tests = (test for test in details.ordered()
+                     if show_passed_tests or test.get('testStatus') != 'Success')
+            yield from groupby(tests, key=cls._test_class_name)
+            return
+        
+        # Group test results by test class, skipping passed tests if not showing them
+        test_classes = {}
+        for test in details:
+            if isinstance(test, dict):
+                if not show_passed_tests and test.get('testStatus') == 'Success':
+                    continue
+                test_classes.setdefault(cls._test_class_name(test), []).append(test)
+        
+        # Sort classes alphabetically to match TypeScript behavior, and tests by name
+        for class_name in sorted(test_classes.keys()):
+            yield class_name, sorted(test_classes[class_name], key=lambda t: t.get('name', ''))
+
+    def _render_units(self, render, units, weight):
+        """Render independent report units, in a process pool when the report is large
+
+        Results come back in the order of units, so the report is identical
+        to an in-process render. Below parallel_threshold rows the cost of
+        pickling the units outweighs the gain and rendering stays in-process.
+        """
+        processes = min(self.render_processes, len(units))
+        if processes <= 1 or weight < self.parallel_threshold:
+            return [render(*unit) for unit in units]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return list(executor.map(render, *zip(*units)))
+
+    def _generate_function_coverage_html(self, analyzer):
+        """Generate HTML for the largest uncovered and hottest functions per target"""
+        lines = ["<h2>Function Coverage Hotspots</h2>"]
+        
+        for target in analyzer.to_dict()['targets']:
+            lines.append(f"<h3>{target['name']}</h3>")
+            
+            for kind, title in (('largestUncovered', 'Largest Uncovered Functions'), ('hottest', 'Hottest Functions')):
+                if not target[kind]:
+                    continue
+                lines.append(f"<h4>{title}</h4>")
+                lines.append("<table>")
+                lines.append("<tr>")
+                lines.append("<th>Function</th>")
+                lines.append("<th>File</th>")
+                lines.append("<th width='100px'>Uncovered</th>")
+                lines.append("<th width='100px'>Executable</th>")
+                lines.append("<th width='100px'>Executions</th>")
+                lines.append("</tr>")
+                for function in target[kind]:
+                    file_label = f"{function['file']}:{function['line']}"
+                    if self.commit_sha:
+                        github_url = (f"https://github.com/Iterable/iterable-swift-sdk/blob/{self.commit_sha}/"
+                                      f"{self._repository_file_path(function['path'])}#L{function['line']}")
+                        file_label = f"<a href=\"{github_url}\" target=\"_blank\">{file_label}</a>"
+                    lines.append("<tr>")
+                    lines.append(f"<td><code>{function['name']}</code></td>")
+                    lines.append(f"<td>{file_label}</td>")
+                    lines.append(f"<td>{function['executableLines'] - function['coveredLines']}</td>")
+                    lines.append(f"<td>{function['executableLines']}</td>")
+                    lines.append(f"<td>{function['executionCount']}</td>")
+                    lines.append("</tr>")
+                lines.append("</table>")
+        
+        return "\n".join(lines)
+
+    def _generate_failure_clusters_html(self, failure_clusters):
+        """Generate HTML for failures grouped by signature"""
+        lines = ["<h2>Failure Signatures</h2>"]
+        lines.append(f"<p>{failure_clusters.failure_count} failures in {len(failure_clusters.clusters)} distinct signatures</p>")
+        lines.append("<table>")
+        lines.append("<tr>")
+        lines.append("<th>Tests</th>")
+        lines.append("<th>Signature</th>")
+        lines.append("</tr>")
+        
+        for cluster in failure_clusters.ranked():
+            lines.append(f'<tr id="failure-{cluster["signature"]}">')
+            lines.append(f"<td>{len(cluster['tests'])}</td>")
+            lines.append("<td>")
+            lines.append('<div class="failure">')
+            lines.append(f"<strong>Failure:</strong> {cluster['example']}<br>")
+            lines.append(f"<code>{cluster['location']}</code>")
+            lines.append("</div>")
+            lines.append(f"<details><summary>{len(cluster['tests'])} tests failed with this signature</summary>")
+            lines.append("<ul>")
+            for test_id in cluster['tests']:
+                lines.append(f"<li>{test_id}</li>")
+            lines.append("</ul>")
+            lines.append("</details>")
+            lines.append("</td>")
+            lines.append("</tr>")
         
+        lines.append("</table>")
         return "\n".join(lines)
 
     def _generate_code_coverage_html(self, code_coverage):
@@ -566,154 +2488,428 @@ class Formatter:
         lines.append("</tr>")
         
         # Per-target coverage
-        if 'targets' in code_coverage:
+        if isinstance(code_coverage.get('targets'), SpilledSegment):
+            # Spilled targets come back from disk sorted by name and render one at a time
+            for target in code_coverage['targets'].ordered():
+                target_html = self._generate_coverage_target_html(target)
+                if target_html:
+                    lines.append(target_html)
+        elif 'targets' in code_coverage:
             sorted_targets = sorted(code_coverage['targets'], key=lambda t: t.get('name', '').lower())
             
-            for target in sorted_targets:
-                name = target.get('name', 'Unknown')
-                coverage = target.get('lineCoverage', 0) * 100
-                covered = target.get('coveredLines', 0)
-                executable = target.get('executableLines', 0)
+            units = [(target,) for target in sorted_targets]
+            weight = sum(len(target.get('files', [])) for target in sorted_targets)
+            lines.extend(html for html in self._render_units(self._generate_coverage_target_html, units, weight) if html)
+        
+        lines.append("</table>")
+        
+        return "\n".join(lines)
+
+    def _generate_coverage_target_html(self, target):
+        """Generate the coverage rows of one target and its files"""
+        lines = []
+        coverage_width = 20  # Width of the coverage bar in Unicode blocks
+        
+        name = target.get('name', 'Unknown')
+        coverage = target.get('lineCoverage', 0) * 100
+        covered = target.get('coveredLines', 0)
+        executable = target.get('executableLines', 0)
+        
+        # Skip targets with no executable lines
+        if executable == 0:
+            return ""
+        
+        lines.append("<tr>")
+        lines.append(f"<td>{name}</td>")
+        
+        # Coverage bar using Unicode blocks
+        covered_blocks = int(coverage_width * (coverage / 100))
+        uncovered_blocks = coverage_width - covered_blocks
+        
+        lines.append("<td>")
+        lines.append(f"{'█' * covered_blocks}{'░' * uncovered_blocks}")
+        lines.append("</td>")
+        
+        lines.append(f"<td>{coverage:.2f}%</td>")
+        lines.append(f"<td>{covered}</td>")
+        lines.append(f"<td>{executable}</td>")
+        lines.append("</tr>")
+        
+        # File-level coverage for this target
+        if 'files' in target:
+            sorted_files = sorted(target['files'], key=lambda f: f.get('name', '').lower())
+            
+            for file in sorted_files:
+                file_name = file.get('name', 'Unknown')
                 
-                # Skip targets with no executable lines
-                if executable == 0:
+                # Generate GitHub URL
+                encoded_file_path = self._repository_file_path(file.get('path', ''))
+                github_url = f"https://github.com/Iterable/iterable-swift-sdk/blob/{self.commit_sha}/{encoded_file_path}"
+                
+                file_coverage = file.get('lineCoverage', 0) * 100
+                file_covered = file.get('coveredLines', 0)
+                file_executable = file.get('executableLines', 0)
+                
+                # Skip files with no executable lines
+                if file_executable == 0:
                     continue
                 
                 lines.append("<tr>")
-                lines.append(f"<td>{name}</td>")
+                lines.append(f"<td>&nbsp;&nbsp;<a href=\"{github_url}\" target=\"_blank\">{file_name}</a></td>")
                 
                 # Coverage bar using Unicode blocks
-                covered_blocks = int(coverage_width * (coverage / 100))
+                covered_blocks = int(coverage_width * (file_coverage / 100))
                 uncovered_blocks = coverage_width - covered_blocks
                 
                 lines.append("<td>")
                 lines.append(f"{'█' * covered_blocks}{'░' * uncovered_blocks}")
                 lines.append("</td>")
                 
-                lines.append(f"<td>{coverage:.2f}%</td>")
-                lines.append(f"<td>{covered}</td>")
-                lines.append(f"<td>{executable}</td>")
+                lines.append(f"<td>{file_coverage:.2f}%</td>")
+                lines.append(f"<td>{file_covered}</td>")
+                lines.append(f"<td>{file_executable}</td>")
                 lines.append("</tr>")
-                
-                # File-level coverage for this target
-                if 'files' in target:
-                    sorted_files = sorted(target['files'], key=lambda f: f.get('name', '').lower())
-                    
-                    for file in sorted_files:
-                        file_name = file.get('name', 'Unknown')
-                        file_path = file.get('path', '')
-                        
-                        # Transform the file path to be relative to the repository root
-                        # Remove the GitHub Actions workspace path prefix or local path prefix
-                        if '/Users/runner/work/iterable-swift-sdk/iterable-swift-sdk/' in file_path:
-                            file_path = file_path.replace('/Users/runner/work/iterable-swift-sdk/iterable-swift-sdk/', '')
-                        else:
-                            # For local paths, find the project root directory name in the path
-                            project_root = 'swift-sdk'
-                            if project_root in file_path:
-                                # Find the exact case of the project root in the path
-                                start_idx = file_path.lower().find(project_root.lower())
-                                if start_idx != -1:
-                                    # Extract the path after project root to preserve case
-                                    path_after_root = file_path[start_idx + len(project_root):]
-                                    # Split by directory separator and remove empty parts
-                                    path_parts = [p for p in path_after_root.split('/') if p]
-                                    # Fix casing for known directories
-                                    path_parts = [
-                                        'Internal' if p.lower() == 'internal' else
-                                        'Core' if p.lower() == 'core' else
-                                        'SDK' if p.lower() == 'sdk' else p 
-                                        for p in path_parts
-                                    ]
-                                    # Join back together
-                                    file_path = '/'.join(path_parts)
-                        
-                        # Additional check for CI paths that might contain the project name
-                        if 'iterable-swift-sdk' in file_path:
-                            file_path = file_path.replace('iterable-swift-sdk/', '')
-                        
-                        # Encode spaces in file path
-                        encoded_file_path = file_path.replace(' ', '%20')
-                        
-                        # Fix path casing for GitHub URL
-                        url_parts = encoded_file_path.split('/')
-                        url_parts = [
-                            'Internal' if p.lower() == 'internal' else
-                            'Core' if p.lower() == 'core' else
-                            'SDK' if p.lower() == 'sdk' else
-                            'ui-components' if p.lower() == 'ui-components' else
-                            'Resources' if p.lower() == 'resources' else
-                            'Dwifft' if p.lower() == 'dwifft' else
-                            'Network' if p.lower() == 'network' else
-                            'Utilities' if p.lower() == 'utilities' else
-                            'Models' if p.lower() == 'models' else
-                            'Protocols' if p.lower() == 'protocols' else
-                            'Keychain' if p.lower() == 'keychain' else
-                            'Request' if p.lower() == 'request' else
-                            p 
-                            for p in url_parts
-                        ]
-                        encoded_file_path = '/'.join(url_parts)
-
-                        # Generate GitHub URL
-                        github_url = f"https://github.com/Iterable/iterable-swift-sdk/blob/{self.commit_sha}/{encoded_file_path}"
-                        
-                        file_coverage = file.get('lineCoverage', 0) * 100
-                        file_covered = file.get('coveredLines', 0)
-                        file_executable = file.get('executableLines', 0)
-                        
-                        # Skip files with no executable lines
-                        if file_executable == 0:
-                            continue
-                        
-                        lines.append("<tr>")
-                        lines.append(f"<td>&nbsp;&nbsp;<a href=\"{github_url}\" target=\"_blank\">{file_name}</a></td>")
-                        
-                        # Coverage bar using Unicode blocks
-                        covered_blocks = int(coverage_width * (file_coverage / 100))
-                        uncovered_blocks = coverage_width - covered_blocks
-                        
-                        lines.append("<td>")
-                        lines.append(f"{'█' * covered_blocks}{'░' * uncovered_blocks}")
-                        lines.append("</td>")
-                        
-                        lines.append(f"<td>{file_coverage:.2f}%</td>")
-                        lines.append(f"<td>{file_covered}</td>")
-                        lines.append(f"<td>{file_executable}</td>")
-                        lines.append("</tr>")
         
-        lines.append("</table>")
+        return "\n".join(lines)
+
+    def _generate_build_performance_html(self, analyzer):
+        """Generate HTML for build performance hotspots"""
+        lines = ["<h2>Build Performance</h2>"]
+        
+        if not analyzer.targets:
+            lines.append("<p>No Swift compile steps found in the build log.</p>")
+            return "\n".join(lines)
+        
+        # Compile time per target
+        lines.append("<table>")
+        lines.append("<tr>")
+        lines.append("<th>Target</th>")
+        lines.append("<th>Compile Time</th>")
+        lines.append("<th>Steps</th>")
+        lines.append("</tr>")
+        for target in analyzer.to_dict()['targets']:
+            lines.append("<tr>")
+            lines.append(f"<td>{target['name']}</td>")
+            lines.append(f"<td>{target['compileSeconds']:.2f}s</td>")
+            lines.append(f"<td>{target['steps']}</td>")
+            lines.append("</tr>")
+        lines.append("</table>")
+        
+        # Slowest files across all targets
+        lines.append(f"<h3>Slowest Files (top {analyzer.top_n})</h3>")
+        lines.append("<table>")
+        lines.append("<tr>")
+        lines.append("<th>File</th>")
+        lines.append("<th>Target</th>")
+        lines.append("<th>Compile Time</th>")
+        lines.append("</tr>")
+        for target, path, seconds, steps in analyzer.top_files():
+            lines.append("<tr>")
+            lines.append(f"<td><code>{path}</code></td>")
+            lines.append(f"<td>{target}</td>")
+            lines.append(f"<td>{seconds:.2f}s</td>")
+            lines.append("</tr>")
+        lines.append("</table>")
+        
+        # Slowest type-check steps reported by -warn-long-*-type-checking
+        type_checks = analyzer.top_type_checks()
+        if type_checks:
+            lines.append(f"<h3>Slowest Type-Check Steps (top {analyzer.top_n})</h3>")
+            lines.append("<table>")
+            lines.append("<tr>")
+            lines.append("<th>Declaration</th>")
+            lines.append("<th>File</th>")
+            lines.append("<th>Target</th>")
+            lines.append("<th>Time</th>")
+            lines.append("</tr>")
+            for entry in type_checks:
+                lines.append("<tr>")
+                lines.append(f"<td>{entry['subject']}</td>")
+                lines.append(f"<td><code>{entry['file']}</code></td>")
+                lines.append(f"<td>{entry['target']}</td>")
+                lines.append(f"<td>{entry['ms']:.0f}ms</td>")
+                lines.append("</tr>")
+            lines.append("</table>")
+        
+        return "\n".join(lines)
+
+    def _generate_timeline_html(self, timeline):
+        """Generate HTML for the test execution timeline"""
+        status_colors = {'Success': '#4caf50', 'Failure': '#e53935', 'Skipped': '#9e9e9e'}
+        lines = []
+        
+        for chapter in timeline['chapters']:
+            lines.append(f"<h2>{chapter['title']}</h2>")
+            if not chapter['tests']:
+                lines.append("<p>No test start times found.</p>")
+                continue
+            
+            # Where the wall-clock time went
+            lines.append("<table>")
+            lines.append("<tr>")
+            lines.append("<th>Wall Time</th>")
+            lines.append("<th>Test Time</th>")
+            lines.append("<th>Workers</th>")
+            lines.append("<th>Utilization</th>")
+            lines.append("<th>Overall Utilization</th>")
+            lines.append("</tr>")
+            lines.append("<tr>")
+            lines.append(f"<td>{chapter['wallTime']:.2f}s</td>")
+            lines.append(f"<td>{chapter['testTime']:.2f}s</td>")
+            lines.append(f"<td>{chapter['workerCount']}</td>")
+            lines.append(f"<td>{chapter['utilization'] * 100:.1f}%</td>")
+            lines.append(f"<td>{chapter['overallUtilization'] * 100:.1f}%</td>")
+            lines.append("</tr>")
+            lines.append("</table>")
+            
+            lines.append("<h3>Idle Time</h3>")
+            lines.append("<table>")
+            lines.append("<tr>")
+            lines.append("<th>Kind</th>")
+            lines.append("<th>Time</th>")
+            lines.append("</tr>")
+            for kind, seconds in sorted(chapter['idleByKind'].items(), key=lambda item: -item[1]):
+                lines.append("<tr>")
+                lines.append(f"<td>{kind}</td>")
+                lines.append(f"<td>{seconds:.2f}s</td>")
+                lines.append("</tr>")
+            lines.append("</table>")
+            
+            # Gantt chart with one row per worker
+            wall = chapter['wallTime'] or 1
+            lines.append("<h3>Timeline</h3>")
+            for worker in chapter['workers']:
+                lines.append(f"<div>Worker {worker['worker'] + 1} ({worker['busy']:.2f}s busy, {worker['idle']:.2f}s idle)</div>")
+                lines.append('<div style="position:relative;height:16px;background:#eee;margin-bottom:4px">')
+                for test in worker['tests']:
+                    left = test['start'] / wall * 100
+                    width = max(test['duration'] / wall * 100, 0.05)
+                    color = status_colors.get(test['status'], '#ffa000')
+                    lines.append(
+                        f'<div title="{test["identifier"]} ({test["duration"]:.2f}s)" '
+                        f'style="position:absolute;left:{left:.3f}%;width:{width:.3f}%;height:100%;background:{color}"></div>'
+                    )
+                lines.append('</div>')
+            
+            critical = chapter['criticalPath']
+            lines.append(f"<h3>Critical Path (worker {critical['worker'] + 1})</h3>")
+            lines.append(f"<p>{critical['testTime']:.2f}s in tests, {critical['overheadTime']:.2f}s overhead</p>")
+            lines.append("<table>")
+            lines.append("<tr>")
+            lines.append("<th>Test</th>")
+            lines.append("<th>Duration</th>")
+            lines.append("</tr>")
+            for test in critical['slowestTests']:
+                lines.append("<tr>")
+                lines.append(f"<td>{test['identifier']}</td>")
+                lines.append(f"<td>{test['duration']:.2f}s</td>")
+                lines.append("</tr>")
+            lines.append("</table>")
+            
+            if chapter['gaps']:
+                lines.append("<h3>Largest Gaps</h3>")
+                lines.append("<table>")
+                lines.append("<tr>")
+                lines.append("<th>Worker</th>")
+                lines.append("<th>Kind</th>")
+                lines.append("<th>Before</th>")
+                lines.append("<th>Duration</th>")
+                lines.append("</tr>")
+                for gap in chapter['gaps']:
+                    lines.append("<tr>")
+                    lines.append(f"<td>{gap['worker'] + 1}</td>")
+                    lines.append(f"<td>{gap['kind']}</td>")
+                    lines.append(f"<td>{gap['before']}</td>")
+                    lines.append(f"<td>{gap['duration']:.2f}s</td>")
+                    lines.append("</tr>")
+                lines.append("</table>")
+        
+        return "\n".join(lines)
+
+    def build_report_data(self, report, options):
+        """Build the compact data sidecar rendered by the virtualized report page"""
+        status_codes = {'Success': 'S', 'Failure': 'F', 'Skipped': 'K', 'Expected Failure': 'E'}
+        testables = []
+        classes = []
+        class_indexes = {}
+        rows = []
+        
+        for chapter in report['chapters']:
+            for section_name, section in chapter['sections'].items():
+                if section_name not in testables:
+                    testables.append(section_name)
+                testable_index = testables.index(section_name)
+                for test in section['details']:
+                    if not isinstance(test, dict):
+                        continue
+                    status = status_codes.get(test.get('testStatus'), 'E')
+                    if not options.get('showPassedTests', True) and status == 'S':
+                        continue
+                    parts = test.get('identifier', '').split('/')
+                    test_class = parts[-2] if len(parts) >= 2 else "Tests"
+                    if test_class not in class_indexes:
+                        class_indexes[test_class] = len(classes)
+                        classes.append(test_class)
+                    row = [testable_index, class_indexes[test_class], test.get('name', 'Unknown Test'),
+                           status, round(test.get('duration', 0) or 0, 3)]
+                    if status == 'F' and test.get('failureSummaries'):
+                        row.append([[failure.get('message', 'Unknown failure'), FailureClusterer.location(failure)]
+                                    for failure in test['failureSummaries']])
+                    rows.append(row)
+        
+        data = {
+            'version': 1,
+            'bundle': self.bundle_path,
+            'testStatus': self._determine_test_status(report),
+            'summaryHtml': self._generate_test_summary_html(report),
+            'tests': {'testables': testables, 'classes': classes, 'rows': rows},
+            'coverage': None
+        }
+        
+        code_coverage = report['codeCoverage']
+        if code_coverage:
+            targets = []
+            for target in sorted(code_coverage.get('targets', []), key=lambda t: t.get('name', '').lower()):
+                if target.get('executableLines', 0) == 0:
+                    continue
+                files = [
+                    [file.get('name', 'Unknown'), self._repository_file_path(file.get('path', '')),
+                     file.get('coveredLines', 0), file.get('executableLines', 0)]
+                    for file in sorted(target.get('files', []), key=lambda f: f.get('name', '').lower())
+                    if file.get('executableLines', 0) > 0
+                ]
+                targets.append({
+                    'name': target.get('name', 'Unknown'),
+                    'covered': target.get('coveredLines', 0),
+                    'executable': target.get('executableLines', 0),
+                    'files': files
+                })
+            data['coverage'] = {
+                'covered': code_coverage.get('coveredLines', 0),
+                'executable': code_coverage.get('executableLines', 0),
+                'urlBase': f"https://github.com/Iterable/iterable-swift-sdk/blob/{self.commit_sha}/" if self.commit_sha else None,
+                'targets': targets
+            }
+        return data
+
+    def _repository_file_path(self, file_path):
+        """Map a coverage file path to its URL-encoded path in the GitHub repository"""
+        # Transform the file path to be relative to the repository root
+        # Remove the GitHub Actions workspace path prefix or local path prefix
+        if '/Users/runner/work/iterable-swift-sdk/iterable-swift-sdk/' in file_path:
+            file_path = file_path.replace('/Users/runner/work/iterable-swift-sdk/iterable-swift-sdk/', '')
+        else:
+            # For local paths, find the project root directory name in the path
+            project_root = 'swift-sdk'
+            if project_root in file_path:
+                # Find the exact case of the project root in the path
+                start_idx = file_path.lower().find(project_root.lower())
+                if start_idx != -1:
+                    # Extract the path after project root to preserve case
+                    path_after_root = file_path[start_idx + len(project_root):]
+                    # Split by directory separator and remove empty parts
+                    path_parts = [p for p in path_after_root.split('/') if p]
+                    # Fix casing for known directories
+                    path_parts = [
+                        'Internal' if p.lower() == 'internal' else
+                        'Core' if p.lower() == 'core' else
+                        'SDK' if p.lower() == 'sdk' else p 
+                        for p in path_parts
+                    ]
+                    # Join back together
+                    file_path = '/'.join(path_parts)
+        
+        # Additional check for CI paths that might contain the project name
+        if 'iterable-swift-sdk' in file_path:
+            file_path = file_path.replace('iterable-swift-sdk/', '')
         
-        return "\n".join(lines)
+        # Encode spaces in file path
+        encoded_file_path = file_path.replace(' ', '%20')
+        
+        # Fix path casing for GitHub URL
+        url_parts = encoded_file_path.split('/')
+        url_parts = [
+            'Internal' if p.lower() == 'internal' else
+            'Core' if p.lower() == 'core' else
+            'SDK' if p.lower() == 'sdk' else
+            'ui-components' if p.lower() == 'ui-components' else
+            'Resources' if p.lower() == 'resources' else
+            'Dwifft' if p.lower() == 'dwifft' else
+            'Network' if p.lower() == 'network' else
+            'Utilities' if p.lower() == 'utilities' else
+            'Models' if p.lower() == 'models' else
+            'Protocols' if p.lower() == 'protocols' else
+            'Keychain' if p.lower() == 'keychain' else
+            'Request' if p.lower() == 'request' else
+            p 
+            for p in url_parts
+        ]
+        encoded_file_path = '/'.join(url_parts)
+        return encoded_file_path
 
-    def _generate_skipped_tests_html(self):
-        """Generate HTML for skipped tests"""
-        if not self.skipped_tests:
+    def _generate_skipped_tests_html(self, report):
+        """Generate HTML for skipped tests with per target and class counts"""
+        if self.skip_index is None:
+            return ""
+        
+        skipped = self.skip_index.summarize(self._iter_report_tests(report))
+        if not skipped['rows']:
             return ""
             
         lines = []
         lines.append("<h3>Skipped Tests</h3>")
+        
+        # Counts per target and class
+        lines.append("<table>")
+        lines.append("<tr>")
+        lines.append("<th>Target</th>")
+        lines.append("<th>Class</th>")
+        lines.append("<th>Skipped</th>")
+        lines.append("</tr>")
+        for target in sorted(skipped['targets']):
+            for test_class, count in sorted(skipped['targets'][target]['classes'].items()):
+                lines.append("<tr>")
+                lines.append(f"<td>{target}</td>")
+                lines.append(f"<td>{test_class}</td>")
+                lines.append(f"<td>{count}</td>")
+                lines.append("</tr>")
+        lines.append("</table>")
+        
         lines.append("<table>")
         
         # Add table headers
         lines.append("<tr>")
         lines.append("<th>Test Name</th>")
+        lines.append("<th>Target</th>")
+        lines.append("<th>Status</th>")
         lines.append("<th>Duration</th>")
         lines.append("</tr>")
         
         # Sort tests alphabetically
-        sorted_tests = sorted(self.skipped_tests)
+        sorted_rows = sorted(skipped['rows'], key=lambda row: (row['target'], row['identifier']))
         
         # Add test rows
-        for test in sorted_tests:
+        for row in sorted_rows:
+            name = f"{row['identifier']} (all tests)" if row['wholeClass'] else row['identifier']
+            duration = f"{row['duration']:.2f}s" if row['duration'] is not None else "-"
             lines.append("<tr>")
-            lines.append(f"<td>{test}</td>")
-            lines.append("<td>0.00s</td>")
+            lines.append(f"<td>{name}</td>")
+            lines.append(f"<td>{row['target']}</td>")
+            lines.append(f"<td>{row['status']}</td>")
+            lines.append(f"<td>{duration}</td>")
             lines.append("</tr>")
         
         lines.append("</table>")
         return "\n".join(lines)
 
+    def _iter_report_tests(self, report):
+        """Yield (target, identifier, status, duration) for every test in a report"""
+        for chapter in report['chapters']:
+            for section_name, section in chapter['sections'].items():
+                for test in section['details']:
+                    if isinstance(test, dict) and 'identifier' in test:
+                        yield section_name, test['identifier'], test.get('testStatus'), test.get('duration')
+
     def _determine_test_status(self, report):
         """Determine the overall test status"""
         # Check if any test failed
@@ -733,15 +2929,47 @@ class Formatter:
         return 'success' if has_tests else 'neutral'
 
 
+def check_xcode_version():
+    """Verify that Xcode 16 or higher is selected, returning the xcodebuild -version output"""
+    try:
+        xcodebuild_output = subprocess.check_output(['xcodebuild', '-version'], universal_newlines=True)
+        xcode_version_match = re.search(r'Xcode (\d+)\.(\d+)', xcodebuild_output)
+        
+        if xcode_version_match:
+            major_version = int(xcode_version_match.group(1))
+            if major_version < 16:
+                print(f"Detected Xcode version: {xcodebuild_output.strip()}")
+                raise ValueError("This script requires Xcode 16 or higher to function properly")
+        else:
+            raise ValueError("Could not determine Xcode version from output")
+        
+        return xcodebuild_output
+    except (subprocess.SubprocessError, FileNotFoundError) as e:
+        raise ValueError(f"Failed to detect Xcode version: {str(e)}")
+
+
 class XCResultProcessor:
-    def __init__(self, xcresult_path, debug=False, test_stats=None, test_plan_path=None, commit_sha=None):
+    def __init__(self, xcresult_path, debug=False, test_stats=None, test_plan_path=None, commit_sha=None, check_xcode=True):
         self.xcresult_path = xcresult_path
         self.debug = debug
         self.show_passed_tests = True
         self.show_code_coverage = True
         self.test_stats = test_stats
         self.test_plan_path = test_plan_path
+        self.test_plan_paths = [test_plan_path] if isinstance(test_plan_path, str) else list(test_plan_path or [])
         self.commit_sha = commit_sha
+        self.show_build_performance = False
+        self.build_log_path = None
+        self.top_n = 20
+        self.jobs = 8
+        self.cluster_failures = False
+        self.cluster_threshold = 50
+        self.show_function_coverage = False
+        self.render_processes = 1
+        self.max_memory = None
+        self.log_links = {}
+        self.log_link_base = None
+        self.skip_index = SkipTrie.from_plans(self.test_plan_paths)
         self.skipped_tests_from_plan = self._load_skipped_tests_from_plan()
         
         # Verify the xcresult bundle exists
@@ -752,41 +2980,30 @@ class XCResultProcessor:
         if not xcresult_path.endswith('.xcresult') or not os.path.isdir(xcresult_path):
             raise ValueError(f"Not a valid xcresult bundle: {xcresult_path}")
         
-        # Check Xcode version - required to be 16 or higher
-        try:
-            xcodebuild_output = subprocess.check_output(['xcodebuild', '-version'], universal_newlines=True)
-            xcode_version_match = re.search(r'Xcode (\d+)\.(\d+)', xcodebuild_output)
-            
-            if xcode_version_match:
-                major_version = int(xcode_version_match.group(1))
-                if major_version < 16:
-                    print(f"Detected Xcode version: {xcodebuild_output.strip()}")
-                    raise ValueError("This script requires Xcode 16 or higher to function properly")
-            else:
-                raise ValueError("Could not determine Xcode version from output")
-                
-        except (subprocess.SubprocessError, FileNotFoundError) as e:
-            raise ValueError(f"Failed to detect Xcode version: {str(e)}")
+        # Check Xcode version - required to be 16 or higher (batch mode probes once up front)
+        if check_xcode:
+            check_xcode_version()
 
     def _load_skipped_tests_from_plan(self):
-        """Load skipped tests from the test plan file"""
-        if not self.test_plan_path or not os.path.exists(self.test_plan_path):
-            return set()
-            
-        try:
-            with open(self.test_plan_path, 'r') as f:
-                test_plan = json.load(f)
-                
-            skipped_tests = set()
-            for test_target in test_plan.get('testTargets', []):
-                if 'skippedTests' in test_target:
-                    for test in test_target['skippedTests']:
-                        test = test.replace('()', '')
-                        skipped_tests.add(test)
-            return skipped_tests
-        except Exception as e:
-            print(f"Error loading test plan: {str(e)}")
-            return set()
+        """Load skipped tests from the test plan files"""
+        return {entry for _, entry in self.skip_index.entries()}
+
+    def _format_options(self):
+        """Build the Formatter options for this processor"""
+        return {
+            'showPassedTests': self.show_passed_tests,
+            'showCodeCoverage': self.show_code_coverage,
+            'showBuildPerformance': self.show_build_performance,
+            'buildLogPath': self.build_log_path,
+            'topN': self.top_n,
+            'clusterFailures': self.cluster_failures,
+            'clusterThreshold': self.cluster_threshold,
+            'showFunctionCoverage': self.show_function_coverage,
+            'renderProcesses': self.render_processes,
+            'maxMemory': self.max_memory,
+            'logLinks': self.log_links,
+            'logLinkBase': self.log_link_base
+        }
 
     def generate_test_report(self):
         """Generate test report HTML without code coverage"""
@@ -794,18 +3011,16 @@ class XCResultProcessor:
             self.xcresult_path, 
             self.test_stats, 
             self.commit_sha,
-            self.skipped_tests_from_plan
+            self.skipped_tests_from_plan,
+            self.skip_index
         )
         
-        report = formatter.format({
-            'showPassedTests': self.show_passed_tests,
-            'showCodeCoverage': self.show_code_coverage
-        })
+        report = formatter.format(self._format_options())
         
-        # Generate skipped tests HTML if we have any
+        # Generate skipped tests HTML if the test plans skip anything
         skipped_tests_html = ""
-        if self.test_stats and self.test_stats.get('skipped_tests', 0) > 0 and self.skipped_tests_from_plan:
-            skipped_tests_html = formatter._generate_skipped_tests_html()
+        if self.skipped_tests_from_plan:
+            skipped_tests_html = report['skippedTests']
         
         # Combine test report parts
         html = f"""<!DOCTYPE html>
@@ -822,6 +3037,8 @@ class XCResultProcessor:
     {report['reportDetail']}
     
     {skipped_tests_html}
+    
+    {report['buildPerformance']}
 </body>
 </html>
 """
@@ -833,13 +3050,11 @@ class XCResultProcessor:
             self.xcresult_path, 
             self.test_stats, 
             self.commit_sha,
-            self.skipped_tests_from_plan
+            self.skipped_tests_from_plan,
+            self.skip_index
         )
         
-        report = formatter.format({
-            'showPassedTests': self.show_passed_tests,
-            'showCodeCoverage': self.show_code_coverage
-        })
+        report = formatter.format(self._format_options())
         
         # Skip if no code coverage data
         if not report['codeCoverage']:
@@ -857,29 +3072,111 @@ class XCResultProcessor:
     <p>Coverage for {self.xcresult_path}</p>
     
     {report['codeCoverage']}
+    
+    {report['functionCoverage']}
+</body>
+</html>
+"""
+        return html
+
+    def extract_logs(self, index_path, logs_dir=None, failed_only=False):
+        """Export per-test console logs into a searchable index, and failed tests' logs into logs_dir"""
+        formatter = Formatter(self.xcresult_path, self.test_stats, self.commit_sha)
+        options = self._format_options()
+        options.update({'showCodeCoverage': False, 'showBuildPerformance': False})
+        with formatter.open_report(options) as report:
+            index = LogIndex(index_path)
+            try:
+                extractor = ConsoleLogExtractor(formatter.parser, index, self.jobs)
+                self.log_links = extractor.extract(report, self.xcresult_path, failed_only, logs_dir)
+            finally:
+                index.close()
+        return extractor
+
+    def generate_function_coverage(self):
+        """Rank the largest uncovered and hottest functions per coverage target
+
+        The xccov report is streamed straight into the analyzer, so neither
+        the test report nor the whole coverage document is loaded.
+        """
+        events = Parser(self.xcresult_path).stream_code_coverage()
+        return FunctionCoverageAnalyzer(self.top_n).analyze_events(events)
+
+    def generate_timeline(self):
+        """Reconstruct the test execution timeline as a JSON-serializable dictionary"""
+        formatter = Formatter(
+            self.xcresult_path,
+            self.test_stats,
+            self.commit_sha,
+            self.skipped_tests_from_plan,
+            self.skip_index
+        )
+        options = self._format_options()
+        options.update({'showCodeCoverage': False, 'showBuildPerformance': False})
+        with formatter.open_report(options) as report:
+            return TestTimeline(formatter.parser, self.jobs, self.top_n).build(report)
+
+    def generate_activity_profile(self, patterns=None):
+        """Profile the activity steps of the selected (UI) tests"""
+        formatter = Formatter(self.xcresult_path, self.test_stats, self.commit_sha)
+        options = self._format_options()
+        options.update({'showCodeCoverage': False, 'showBuildPerformance': False})
+        with formatter.open_report(options) as report:
+            return ActivityProfiler(formatter.parser, self.jobs, self.top_n).profile(report, patterns)
+
+    def generate_timeline_report(self, timeline):
+        """Generate test execution timeline HTML report"""
+        formatter = Formatter(self.xcresult_path, self.test_stats, self.commit_sha)
+        
+        html = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+</head>
+<body>
+    <h1>Test Execution Timeline</h1>
+    <p>Timeline for {self.xcresult_path}</p>
+    
+    {formatter._generate_timeline_html(timeline)}
 </body>
 </html>
 """
         return html
 
+    def generate_report_data(self):
+        """Build the JSON data sidecar for the virtualized report"""
+        formatter = Formatter(
+            self.xcresult_path,
+            self.test_stats,
+            self.commit_sha,
+            self.skipped_tests_from_plan,
+            self.skip_index
+        )
+        options = self._format_options()
+        with formatter.open_report(options) as report:
+            return formatter.build_report_data(report, options)
+
+    def generate_virtual_report(self, data_url):
+        """Generate the constant-size report page that renders a data sidecar on demand"""
+        return VIRTUAL_REPORT_TEMPLATE.replace('__DATA_URL__', json.dumps(data_url))
+
     def generate_html_report(self):
         """Generate a complete HTML report (for backward compatibility)"""
         formatter = Formatter(
             self.xcresult_path, 
             self.test_stats, 
             self.commit_sha,
-            self.skipped_tests_from_plan
+            self.skipped_tests_from_plan,
+            self.skip_index
         )
         
-        report = formatter.format({
-            'showPassedTests': self.show_passed_tests,
-            'showCodeCoverage': self.show_code_coverage
-        })
+        report = formatter.format(self._format_options())
         
-        # Generate skipped tests HTML if we have any
+        # Generate skipped tests HTML if the test plans skip anything
         skipped_tests_html = ""
-        if self.test_stats and self.test_stats.get('skipped_tests', 0) > 0 and self.skipped_tests_from_plan:
-            skipped_tests_html = formatter._generate_skipped_tests_html()
+        if self.skipped_tests_from_plan:
+            skipped_tests_html = report['skippedTests']
         
         # Combine all parts of the report
         html = f"""<!DOCTYPE html>
@@ -897,13 +3194,487 @@ class XCResultProcessor:
     
     {skipped_tests_html}
     
+    {report['buildPerformance']}
+    
     {report['codeCoverage']}
+    
+    {report['functionCoverage']}
 </body>
 </html>
 """
         return html
 
 
+def load_test_plan_skips(test_plan_path):
+    """Load the skippedTests of each test target in a test plan, keyed by target name"""
+    if not test_plan_path or not os.path.exists(test_plan_path):
+        return {}
+        
+    try:
+        test_plan = json_backend.load(test_plan_path)
+            
+        skips = {}
+        for test_target in test_plan.get('testTargets', []):
+            target_name = test_target.get('target', {}).get('name', '')
+            target_skips = skips.setdefault(target_name, set())
+            for test in test_target.get('skippedTests', []):
+                target_skips.add(test.replace('()', ''))
+        return skips
+    except Exception as e:
+        print(f"Error loading test plan: {str(e)}")
+        return {}
+
+
+class RerunPlanner:
+    """Plan a minimal re-run that covers only the failed tests of a bundle"""
+
+    def __init__(self, plan_skips=None, granularity='method', collapse_threshold=0):
+        self.plan_skips = plan_skips or {}
+        self.granularity = granularity
+        self.collapse_threshold = collapse_threshold
+
+    def failed_tests(self, report):
+        """Return {target: {class: [methods]}} for failed tests not skipped by the plan"""
+        failures = {}
+        for chapter in report['chapters']:
+            for section_name, section in chapter['sections'].items():
+                for test in section['details']:
+                    if not isinstance(test, dict) or test.get('testStatus') != 'Failure':
+                        continue
+                    parts = test.get('identifier', '').replace('()', '').split('/')
+                    if len(parts) < 2:
+                        continue
+                    test_class, method = parts[-2], parts[-1]
+                    if self.is_skipped(section_name, test_class, method):
+                        continue
+                    methods = failures.setdefault(section_name, {}).setdefault(test_class, [])
+                    if method not in methods:
+                        methods.append(method)
+        return failures
+
+    def is_skipped(self, target, test_class, method=None):
+        """Check whether the plan skips a class or one of its methods"""
+        target_skips = self.plan_skips.get(target, set())
+        return test_class in target_skips or (method is not None and f"{test_class}/{method}" in target_skips)
+
+    def _selections(self, failures):
+        """Yield (target, class, methods) where methods is None for a whole-class selection"""
+        for target in sorted(failures):
+            for test_class in sorted(failures[target]):
+                methods = sorted(failures[target][test_class])
+                whole_class = self.granularity == 'class' or (
+                    self.collapse_threshold > 0 and len(methods) >= self.collapse_threshold)
+                yield target, test_class, None if whole_class else methods
+
+    def only_testing_args(self, failures):
+        """Build the xcodebuild -only-testing / -skip-testing arguments for a re-run"""
+        args = []
+        for target, test_class, methods in self._selections(failures):
+            if methods is None:
+                args.append(f"-only-testing:{target}/{test_class}")
+                # A whole-class selection must not resurrect tests the plan skips
+                for skipped in sorted(self.plan_skips.get(target, set())):
+                    if skipped.startswith(f"{test_class}/"):
+                        args.append(f"-skip-testing:{target}/{skipped}")
+            else:
+                args.extend(f"-only-testing:{target}/{test_class}/{method}" for method in methods)
+        return args
+
+    def derive_test_plan(self, test_plan, failures):
+        """Derive a test plan that selects only the failed tests"""
+        derived = copy.deepcopy(test_plan)
+        selections = {}
+        for target, test_class, methods in self._selections(failures):
+            entries = selections.setdefault(target, [])
+            if methods is None:
+                entries.append(test_class)
+            else:
+                entries.extend(f"{test_class}/{method}()" for method in methods)
+        
+        for test_target in derived.get('testTargets', []):
+            target_name = test_target.get('target', {}).get('name', '')
+            if target_name in selections:
+                test_target['selectedTests'] = selections[target_name]
+                test_target.pop('enabled', None)
+                # Keep method-level skips so whole-class selections still honor them
+                skipped = [test for test in test_target.get('skippedTests', [])
+                           if '/' in test and test.split('/')[0] in selections[target_name]]
+                if skipped:
+                    test_target['skippedTests'] = skipped
+                else:
+                    test_target.pop('skippedTests', None)
+            else:
+                test_target['enabled'] = False
+        return derived
+
+
+def rerun_failed_main(argv):
+    """Entry point for the rerun-failed subcommand"""
+    parser = argparse.ArgumentParser(
+        prog='process_xcresult.py rerun-failed',
+        description='Emit the minimal xcodebuild test selection that re-runs only the failed tests'
+    )
+    parser.add_argument('--path', required=True, help='Path to .xcresult bundle')
+    parser.add_argument('--test-plan', help='Path to the test plan file (.xctestplan) whose skippedTests are excluded')
+    parser.add_argument('--granularity', choices=['method', 'class'], default='method', help='Re-run failed methods or their whole classes (default: method)')
+    parser.add_argument('--collapse-threshold', type=int, default=0, help='With method granularity, re-run the whole class once this many of its methods failed (default: never)')
+    parser.add_argument('--format', choices=['args', 'xctestplan'], default='args', help='Emit -only-testing arguments or a derived .xctestplan (default: args)')
+    parser.add_argument('--output', help='Write to this file instead of stdout')
+    args = parser.parse_args(argv)
+    
+    if args.format == 'xctestplan' and not args.test_plan:
+        parser.error('--format xctestplan requires --test-plan')
+    
+    formatter = Formatter(args.path)
+    report = formatter.build_report({'showCodeCoverage': False})
+    planner = RerunPlanner(load_test_plan_skips(args.test_plan), args.granularity, args.collapse_threshold)
+    failures = planner.failed_tests(report)
+    
+    failed_count = sum(len(methods) for classes in failures.values() for methods in classes.values())
+    print(f"Found {failed_count} failed tests to re-run", file=sys.stderr)
+    
+    if args.format == 'xctestplan':
+        derived = planner.derive_test_plan(json_backend.load(args.test_plan), failures)
+        if args.output:
+            json_backend.dump(derived, args.output, indent=2)
+        else:
+            sys.stdout.buffer.write(json_backend.dumps(derived, indent=2) + b"\n")
+    else:
+        output = "".join(f"{arg}\n" for arg in planner.only_testing_args(failures))
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output)
+        else:
+            sys.stdout.write(output)
+    
+    if args.output:
+        print(f"Re-run selection saved to {os.path.abspath(args.output)}", file=sys.stderr)
+    return 0
+
+
+class ImpactIndex:
+    """Map source files to the test classes whose coverage runs executed them"""
+
+    VERSION = 1
+    DEFAULT_SOURCE_ROOTS = ['/Users/runner/work/iterable-swift-sdk/iterable-swift-sdk/']
+    DEFAULT_IGNORED = ['*.md', 'docs/*', 'images/*', '.github/*', 'CHANGELOG*', 'LICENSE*']
+    TEST_DIRECTORY = 'tests/'
+
+    def __init__(self, classes=None):
+        self.classes = classes or {}  # 'target/Class' -> sorted list of files
+        self._rebuild_files()
+
+    @classmethod
+    def load(cls, path):
+        """Load a persisted index (an empty index if the file does not exist)"""
+        if not path or not os.path.exists(path):
+            return cls()
+        data = json_backend.load(path)
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"Unsupported impact index version in {path}: {data.get('version')}")
+        return cls(data.get('classes', {}))
+
+    def save(self, path):
+        """Persist the index with both class -> files and file -> classes maps"""
+        json_backend.dump({'version': self.VERSION, 'classes': self.classes, 'files': self.files}, path, indent=1, sort_keys=True)
+
+    def _rebuild_files(self):
+        """Derive the file -> classes lookup from the class -> files map"""
+        self.files = {}
+        for test_class, files in self.classes.items():
+            for file_path in files:
+                self.files.setdefault(file_path, []).append(test_class)
+        for test_classes in self.files.values():
+            test_classes.sort()
+
+    def add_bundle(self, bundle_path, source_roots=None):
+        """Index a per-class coverage run or a merged shard bundle
+
+        Every file with covered lines is attributed to every test class the
+        bundle ran. For per-class runs this is exact; for shards it is a safe
+        superset. Classes indexed again replace their previous entries.
+        """
+        formatter = Formatter(bundle_path)
+        report = formatter.build_report({'showCodeCoverage': True})
+        test_classes = set()
+        for chapter in report['chapters']:
+            for section_name, section in chapter['sections'].items():
+                for test in section['details']:
+                    parts = test.get('identifier', '').split('/') if isinstance(test, dict) else []
+                    if len(parts) >= 2:
+                        test_classes.add(f"{section_name}/{parts[-2]}")
+        
+        covered_files = set()
+        for target in (report['codeCoverage'] or {}).get('targets', []):
+            for file in target.get('files', []):
+                if file.get('coveredLines', 0) > 0 and file.get('path'):
+                    covered_files.add(self.relative_path(file['path'], source_roots))
+        
+        for test_class in test_classes:
+            self.classes[test_class] = sorted(covered_files)
+        self._rebuild_files()
+        return test_classes, covered_files
+
+    def relative_path(self, path, source_roots=None):
+        """Make a coverage path relative to the repository root"""
+        for root in (source_roots or []) + self.DEFAULT_SOURCE_ROOTS + [os.getcwd() + os.sep]:
+            if path.startswith(root):
+                return path[len(root):]
+        return path
+
+    def select(self, changed_files, ignored_patterns=None):
+        """Select the test classes impacted by changed files
+
+        Returns (classes, reason); classes is None when the full plan has to
+        run because a changed file is not covered by the index.
+        """
+        ignored_patterns = self.DEFAULT_IGNORED if ignored_patterns is None else ignored_patterns
+        known_classes = {test_class.split('/', 1)[-1]: test_class for test_class in self.classes}
+        selected = set()
+        for changed_file in changed_files:
+            changed_file = changed_file.strip()
+            if not changed_file or any(fnmatch.fnmatchcase(changed_file, pattern) for pattern in ignored_patterns):
+                continue
+            if changed_file in self.files:
+                selected.update(self.files[changed_file])
+                continue
+            # A changed test file selects its own class (files are named after their class)
+            class_name = Path(changed_file).stem
+            if changed_file.startswith(self.TEST_DIRECTORY) and class_name in known_classes:
+                selected.add(known_classes[class_name])
+                continue
+            return None, f"{changed_file} is not in the impact index"
+        return sorted(selected), None
+
+
+def impact_main(argv):
+    """Entry point for the impact subcommand"""
+    parser = argparse.ArgumentParser(
+        prog='process_xcresult.py impact',
+        description='Build a file -> test class index from coverage runs and select tests for changed files'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    index_parser = commands.add_parser('index', help='Add per-class coverage runs (or merged shard bundles) to the index')
+    index_parser.add_argument('--index', required=True, help='Path to the impact index JSON (updated in place)')
+    index_parser.add_argument('--source-root', action='append', help='Path prefix to strip from coverage file paths (repeatable)')
+    index_parser.add_argument('bundles', nargs='+', help='Paths to .xcresult bundles recorded with code coverage')
+    
+    select_parser = commands.add_parser('select', help='Select the test classes impacted by changed files')
+    select_parser.add_argument('--index', required=True, help='Path to the impact index JSON')
+    select_parser.add_argument('--changed', nargs='*', default=[], help='Changed files relative to the repository root')
+    select_parser.add_argument('--changed-from', help="Read changed files from this file ('-' for stdin), e.g. git diff --name-only output")
+    select_parser.add_argument('--ignore', action='append', help='Glob of changed files that never impact tests (repeatable, replaces the defaults)')
+    select_parser.add_argument('--test-plan', help='Path to the test plan file (.xctestplan) whose skippedTests are excluded')
+    select_parser.add_argument('--format', choices=['args', 'json'], default='args', help='Emit -only-testing arguments (empty means run the full plan) or a JSON decision (default: args)')
+    args = parser.parse_args(argv)
+    
+    if args.command == 'index':
+        index = ImpactIndex.load(args.index)
+        for bundle in args.bundles:
+            test_classes, covered_files = index.add_bundle(bundle, args.source_root)
+            print(f"Indexed {len(test_classes)} test classes covering {len(covered_files)} files from {bundle}")
+        index.save(args.index)
+        print(f"Impact index with {len(index.classes)} classes and {len(index.files)} files saved to {os.path.abspath(args.index)}")
+        return 0
+    
+    changed_files = list(args.changed)
+    if args.changed_from:
+        if args.changed_from == '-':
+            changed_files.extend(sys.stdin.read().splitlines())
+        else:
+            with open(args.changed_from, 'r') as f:
+                changed_files.extend(f.read().splitlines())
+    
+    index = ImpactIndex.load(args.index)
+    if not index.classes:
+        selected, reason = None, "the impact index is empty"
+    else:
+        selected, reason = index.select(changed_files, args.ignore)
+    
+    planner = RerunPlanner(load_test_plan_skips(args.test_plan), granularity='class')
+    selection = {}
+    for test_class in selected or []:
+        target, class_name = test_class.split('/', 1)
+        if not planner.is_skipped(target, class_name):
+            selection.setdefault(target, {})[class_name] = []
+    if selected is not None and not selection:
+        # Running nothing is never the safe choice, so an empty selection means the full plan
+        selected, reason = None, "no indexed test class is impacted"
+    
+    if args.format == 'json':
+        classes = [f"{target}/{class_name}" for target, classes in sorted(selection.items()) for class_name in sorted(classes)]
+        print(json.dumps({'fullRun': selected is None, 'reason': reason, 'classes': classes}, indent=2))
+        return 0
+    
+    if selected is None:
+        print(f"Running the full test plan: {reason}", file=sys.stderr)
+        return 0
+    selected_count = sum(len(classes) for classes in selection.values())
+    print(f"Selected {selected_count} of {len(index.classes)} test classes", file=sys.stderr)
+    for arg in planner.only_testing_args(selection):
+        print(arg)
+    return 0
+
+
+class RunComparison:
+    """Compare test status and durations between a base run and a head run"""
+
+    def __init__(self, relative_threshold=0.5, absolute_threshold=0.1, top_n=20):
+        self.relative_threshold = relative_threshold
+        self.absolute_threshold = absolute_threshold
+        self.top_n = top_n
+
+    @staticmethod
+    def load_records(bundle_path):
+        """Index the tests of a bundle by 'testable/identifier'"""
+        report = Formatter(bundle_path).build_report({'showCodeCoverage': False})
+        records = {}
+        for chapter in report['chapters']:
+            for section_name, section in chapter['sections'].items():
+                for test in section['details']:
+                    if isinstance(test, dict) and 'identifier' in test:
+                        # Later repetitions of a test supersede earlier ones
+                        records[f"{section_name}/{test['identifier']}"] = {
+                            'status': test.get('testStatus', 'Unknown'),
+                            'duration': test.get('duration', 0) or 0
+                        }
+        return records
+
+    def compare(self, base_path, head_path):
+        """Parse both bundles concurrently and join their tests by identifier"""
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            base_future = executor.submit(self.load_records, base_path)
+            head_future = executor.submit(self.load_records, head_path)
+            base, head = base_future.result(), head_future.result()
+        
+        result = {
+            'base': base_path,
+            'head': head_path,
+            'baseTests': len(base),
+            'headTests': len(head),
+            'newlyFailing': [],
+            'fixed': [],
+            'added': [],
+            'removed': sorted(identifier for identifier in base if identifier not in head),
+            'durationRegressions': []
+        }
+        for identifier, head_record in head.items():
+            base_record = base.get(identifier)
+            if base_record is None:
+                result['added'].append(identifier)
+                continue
+            if head_record['status'] == 'Failure' and base_record['status'] != 'Failure':
+                result['newlyFailing'].append(identifier)
+            elif base_record['status'] == 'Failure' and head_record['status'] != 'Failure':
+                result['fixed'].append(identifier)
+            elif head_record['status'] == base_record['status'] == 'Success':
+                delta = head_record['duration'] - base_record['duration']
+                relative = delta / base_record['duration'] if base_record['duration'] > 0 else float('inf')
+                if delta >= self.absolute_threshold and relative >= self.relative_threshold:
+                    result['durationRegressions'].append({
+                        'identifier': identifier,
+                        'baseDuration': base_record['duration'],
+                        'headDuration': head_record['duration'],
+                        'delta': delta
+                    })
+        for key in ('newlyFailing', 'fixed', 'added'):
+            result[key].sort()
+        result['durationRegressions'].sort(key=lambda regression: -regression['delta'])
+        result['baseDuration'] = sum(record['duration'] for record in base.values())
+        result['headDuration'] = sum(record['duration'] for record in head.values())
+        return result
+
+    def to_html(self, result):
+        """Render a compact comparison suitable for a pull request comment"""
+        lines = ["<h2>Test Run Comparison</h2>"]
+        lines.append("<table>")
+        lines.append("<tr>")
+        for header in ('Newly Failing', 'Fixed', 'Added', 'Removed', 'Slower', 'Duration'):
+            lines.append(f"<th>{header}</th>")
+        lines.append("</tr>")
+        lines.append("<tr>")
+        lines.append(f"<td>{len(result['newlyFailing'])}</td>")
+        lines.append(f"<td>{len(result['fixed'])}</td>")
+        lines.append(f"<td>{len(result['added'])}</td>")
+        lines.append(f"<td>{len(result['removed'])}</td>")
+        lines.append(f"<td>{len(result['durationRegressions'])}</td>")
+        lines.append(f"<td>{result['baseDuration']:.2f}s &rarr; {result['headDuration']:.2f}s</td>")
+        lines.append("</tr>")
+        lines.append("</table>")
+        
+        for key, title in (('newlyFailing', 'Newly Failing'), ('fixed', 'Fixed'),
+                           ('added', 'Added'), ('removed', 'Removed')):
+            if result[key]:
+                lines.append(f"<details><summary>{title} ({len(result[key])})</summary>")
+                lines.append("<ul>")
+                for identifier in result[key][:self.top_n]:
+                    lines.append(f"<li><code>{identifier}</code></li>")
+                if len(result[key]) > self.top_n:
+                    lines.append(f"<li>&hellip; and {len(result[key]) - self.top_n} more</li>")
+                lines.append("</ul>")
+                lines.append("</details>")
+        
+        if result['durationRegressions']:
+            lines.append(f"<details><summary>Slower Tests ({len(result['durationRegressions'])})</summary>")
+            lines.append("<table>")
+            lines.append("<tr>")
+            lines.append("<th>Test</th>")
+            lines.append("<th>Base</th>")
+            lines.append("<th>Head</th>")
+            lines.append("<th>Change</th>")
+            lines.append("</tr>")
+            for regression in result['durationRegressions'][:self.top_n]:
+                lines.append("<tr>")
+                lines.append(f"<td><code>{regression['identifier']}</code></td>")
+                lines.append(f"<td>{regression['baseDuration']:.2f}s</td>")
+                lines.append(f"<td>{regression['headDuration']:.2f}s</td>")
+                lines.append(f"<td>+{regression['delta']:.2f}s</td>")
+                lines.append("</tr>")
+            lines.append("</table>")
+            if len(result['durationRegressions']) > self.top_n:
+                lines.append(f"<p>&hellip; and {len(result['durationRegressions']) - self.top_n} more</p>")
+            lines.append("</details>")
+        
+        return "\n".join(lines)
+
+
+def compare_main(argv):
+    """Entry point for the compare subcommand"""
+    parser = argparse.ArgumentParser(
+        prog='process_xcresult.py compare',
+        description='Compare test status and durations between a base and a head .xcresult bundle'
+    )
+    parser.add_argument('base', help='Path to the base-branch .xcresult bundle')
+    parser.add_argument('head', help='Path to the pull request .xcresult bundle')
+    parser.add_argument('--output', help='Path to output the comparison HTML')
+    parser.add_argument('--json', help='Path to output the comparison as JSON')
+    parser.add_argument('--relative-threshold', type=float, default=0.5, help='Minimum relative slowdown to report, e.g. 0.5 for +50%% (default: 0.5)')
+    parser.add_argument('--absolute-threshold', type=float, default=0.1, help='Minimum absolute slowdown in seconds to report (default: 0.1)')
+    parser.add_argument('--top-n', type=int, default=20, help='Maximum entries listed per category (default: 20)')
+    args = parser.parse_args(argv)
+    
+    for bundle in (args.base, args.head):
+        if not os.path.isdir(bundle):
+            parser.error(f"The xcresult bundle at {bundle} does not exist")
+    
+    comparison = RunComparison(args.relative_threshold, args.absolute_threshold, args.top_n)
+    result = comparison.compare(args.base, args.head)
+    print(f"Compared {result['baseTests']} base tests with {result['headTests']} head tests: "
+          f"{len(result['newlyFailing'])} newly failing, {len(result['fixed'])} fixed, "
+          f"{len(result['added'])} added, {len(result['removed'])} removed, "
+          f"{len(result['durationRegressions'])} slower")
+    
+    if args.json:
+        json_backend.dump(result, args.json, indent=2)
+        print(f"Comparison JSON saved to {os.path.abspath(args.json)}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(comparison.to_html(result))
+        print(f"Comparison report saved to {os.path.abspath(args.output)}")
+    return 0
+
+
 def generate_summary_json(xcresult_path, output_path, processor=None):
     """Generate JSON summary of test results"""
     try:
@@ -911,14 +3682,14 @@ def generate_summary_json(xcresult_path, output_path, processor=None):
         
         result = subprocess.run(
             ['xcrun', 'xcresulttool', 'get', '--legacy', '--format', 'json', '--path', xcresult_path],
-            capture_output=True, text=True, check=True
+            capture_output=True, check=True
         )
         
-        xcresult_json = json.loads(result.stdout)
+        xcresult_json = json_backend.loads(result.stdout)
         
         passed_tests = 0
         failed_tests = 0
-        skipped_tests = len(processor.skipped_tests_from_plan) if processor else 0
+        reported_tests = []
         
         if 'actions' in xcresult_json:
             for action in xcresult_json.get('actions', {}).get('_values', []):
@@ -927,9 +3698,9 @@ def generate_summary_json(xcresult_path, output_path, processor=None):
                     
                     test_result = subprocess.run(
                         ['xcrun', 'xcresulttool', 'get', '--legacy', '--format', 'json', '--path', xcresult_path, '--id', test_ref_id],
-                        capture_output=True, text=True, check=True
+                        capture_output=True, check=True
                     )
-                    test_json = json.loads(test_result.stdout)
+                    test_json = json_backend.loads(test_result.stdout)
                     
                     if 'summaries' in test_json:
                         for summary in test_json['summaries'].get('_values', []):
@@ -939,6 +3710,13 @@ def generate_summary_json(xcresult_path, output_path, processor=None):
                                         counts = count_tests_recursively(testable['tests'])
                                         passed_tests += counts['passed']
                                         failed_tests += counts['failed']
+                                        target = testable.get('name', {}).get('_value', '')
+                                        reported_tests.extend(
+                                            (target,) + test for test in iter_tests_recursively(testable['tests']))
+        
+        # Classify reported tests against the test plan skips
+        skipped = processor.skip_index.summarize(reported_tests) if processor else None
+        skipped_tests = skipped['count'] if skipped else 0
         
         total_tests = passed_tests + failed_tests + skipped_tests
         
@@ -954,11 +3732,15 @@ def generate_summary_json(xcresult_path, output_path, processor=None):
             'skipped_tests': skipped_tests,
             'success_rate': round(success_rate, 1)
         }
+        if skipped:
+            summary['skipped_by_target'] = {
+                target: {'skipped': counts['skipped'], 'classes': counts['classes']}
+                for target, counts in sorted(skipped['targets'].items())
+            }
         
         print(f"Final test summary: {summary}")
         
-        with open(output_path, 'w') as f:
-            json.dump(summary, f)
+        json_backend.dump(summary, output_path)
         
         return summary
     except Exception as e:
@@ -990,7 +3772,326 @@ def count_tests_recursively(tests_array):
     
     return counts
 
+def iter_tests_recursively(tests_array):
+    """Yield (identifier, status, duration) for every leaf test in the test hierarchy"""
+    if not tests_array or '_values' not in tests_array:
+        return
+    
+    for test in tests_array.get('_values', []):
+        if 'subtests' in test:
+            yield from iter_tests_recursively(test['subtests'])
+        elif 'identifier' in test:
+            duration = test.get('duration', {}).get('_value')
+            yield (
+                test['identifier'].get('_value', ''),
+                test.get('testStatus', {}).get('_value', ''),
+                float(duration) if duration is not None else None
+            )
+
+class BatchProcessor:
+    """Process many xcresult bundles in a process pool and index the results"""
+
+    def __init__(self, output_dir, options=None, jobs=None):
+        self.output_dir = output_dir
+        self.options = options or {}
+        self.jobs = jobs or os.cpu_count() or 1
+
+    @staticmethod
+    def expand(specs):
+        """Expand BUNDLE[:PLAN] arguments, where BUNDLE may be a glob, into (bundle, plan) pairs"""
+        bundles = []
+        for spec in specs:
+            path, plan = spec, None
+            head, sep, tail = spec.rpartition(':')
+            if sep and tail.endswith('.xctestplan'):
+                path, plan = head, tail
+            matches = sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+            if not matches:
+                print(f"No bundles match {path}")
+            bundles.extend((match.rstrip('/'), plan) for match in matches)
+        return bundles
+
+    def jobs_for(self, bundles):
+        """Give every bundle a unique report directory under the output directory"""
+        jobs = []
+        used = set()
+        for bundle, plan in bundles:
+            base = os.path.splitext(os.path.basename(bundle))[0] or 'bundle'
+            name, index = base, 2
+            while name in used:
+                name, index = f"{base}-{index}", index + 1
+            used.add(name)
+            jobs.append({
+                'name': name,
+                'bundle': bundle,
+                'testPlan': plan,
+                'outputDir': os.path.join(self.output_dir, name),
+                'options': self.options
+            })
+        return jobs
+
+    @staticmethod
+    def process_bundle(job):
+        """Write the report and summary of one bundle (runs in a worker process)"""
+        options = job['options']
+        result = {
+            'name': job['name'],
+            'bundle': job['bundle'],
+            'testPlan': job['testPlan'],
+            'report': None,
+            'summary': None,
+            'error': None
+        }
+        try:
+            json_backend.select(options.get('jsonBackend', 'auto'))
+            processor = XCResultProcessor(
+                job['bundle'],
+                test_plan_path=job['testPlan'],
+                commit_sha=options.get('commitSha'),
+                check_xcode=False
+            )
+            os.makedirs(job['outputDir'], exist_ok=True)
+            processor.test_stats = generate_summary_json(
+                job['bundle'], os.path.join(job['outputDir'], 'summary.json'), processor)
+            processor.show_build_performance = options.get('showBuildPerformance', False)
+            processor.show_function_coverage = options.get('showFunctionCoverage', False)
+            processor.top_n = options.get('topN', 20)
+            processor.jobs = options.get('threads', 8)
+            
+            report_path = os.path.join(job['outputDir'], 'report.html')
+            with open(report_path, 'w') as f:
+                f.write(processor.generate_html_report())
+            result['report'] = os.path.join(job['name'], 'report.html').replace(os.sep, '/')
+            result['summary'] = processor.test_stats
+        except Exception as e:
+            result['error'] = str(e)
+        return result
+
+    def run(self, bundles):
+        """Process all bundles, returning their results in input order"""
+        jobs = self.jobs_for(bundles)
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.jobs <= 1 or len(jobs) <= 1:
+            return [self.process_bundle(job) for job in jobs]
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(jobs))) as executor:
+            return list(executor.map(self.process_bundle, jobs))
+
+    @staticmethod
+    def combined_summary(results):
+        """Sum the per-bundle summaries into one summary with a per-bundle breakdown"""
+        totals = {'total_tests': 0, 'passed_tests': 0, 'failed_tests': 0, 'skipped_tests': 0}
+        for result in results:
+            for key in totals:
+                totals[key] += (result['summary'] or {}).get(key, 0)
+        
+        denominator = totals['passed_tests'] + totals['failed_tests']
+        totals['success_rate'] = round(totals['passed_tests'] / denominator * 100, 1) if denominator else 0
+        totals['failed_bundles'] = sum(1 for result in results if result['error'])
+        totals['bundles'] = results
+        return totals
+
+    def to_html(self, summary):
+        """Render an index page linking every bundle report"""
+        lines = ["<h2>Bundles</h2>"]
+        lines.append("<table>")
+        lines.append("<tr>")
+        for header in ('Bundle', 'Test Plan', 'Total', 'Passed', 'Failed', 'Skipped', 'Success Rate'):
+            lines.append(f"<th>{header}</th>")
+        lines.append("</tr>")
+        for result in summary['bundles']:
+            lines.append("<tr>")
+            if result['report']:
+                lines.append(f"<td><a href=\"{result['report']}\">{result['name']}</a></td>")
+            else:
+                lines.append(f"<td>{result['name']}</td>")
+            lines.append(f"<td>{os.path.basename(result['testPlan']) if result['testPlan'] else '-'}</td>")
+            if result['error']:
+                lines.append(f"<td colspan='5'>Error: {result['error']}</td>")
+            else:
+                stats = result['summary'] or {}
+                lines.append(f"<td>{stats.get('total_tests', 0)}</td>")
+                lines.append(f"<td>{stats.get('passed_tests', 0)}</td>")
+                lines.append(f"<td>{stats.get('failed_tests', 0)}</td>")
+                lines.append(f"<td>{stats.get('skipped_tests', 0)}</td>")
+                lines.append(f"<td>{stats.get('success_rate', 0)}%</td>")
+            lines.append("</tr>")
+        lines.append("<tr>")
+        lines.append("<th>Total</th>")
+        lines.append("<th></th>")
+        for key in ('total_tests', 'passed_tests', 'failed_tests', 'skipped_tests'):
+            lines.append(f"<th>{summary[key]}</th>")
+        lines.append(f"<th>{summary['success_rate']}%</th>")
+        lines.append("</tr>")
+        lines.append("</table>")
+        table = "\n".join(lines)
+        
+        return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+</head>
+<body>
+    <h1>Test Results</h1>
+    <p>{len(summary['bundles'])} bundles, {summary['failed_bundles']} could not be processed</p>
+    
+    {table}
+</body>
+</html>
+"""
+
+
+def batch_main(argv):
+    """Entry point for the batch subcommand"""
+    parser = argparse.ArgumentParser(
+        prog='process_xcresult.py batch',
+        description='Process many xcresult bundles concurrently and write per-bundle reports, an index page and a combined summary'
+    )
+    parser.add_argument('bundles', nargs='+', help='Bundle paths or globs, each optionally followed by :path/to/plan.xctestplan')
+    parser.add_argument('--output-dir', required=True, help='Directory for the per-bundle reports, index.html and summary.json')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='Number of bundles processed in parallel (default: CPU count)')
+    parser.add_argument('--jobs', type=int, default=8, help='Number of concurrent xcresulttool fetches per bundle (default: 8)')
+    parser.add_argument('--commit-sha', help='Git commit SHA for generating GitHub URLs')
+    parser.add_argument('--build-performance', action='store_true', help='Add a build performance section to each report')
+    parser.add_argument('--function-coverage', action='store_true', help='Add function coverage hotspots to each report')
+    parser.add_argument('--top-n', type=int, default=20, help='Number of entries to show in top-N tables (default: 20)')
+    parser.add_argument('--json-backend', choices=JSONBackend.NAMES, default='auto', help='JSON library used for parsing and JSON outputs (default: auto, orjson when installed)')
+    args = parser.parse_args(argv)
+    
+    try:
+        json_backend.select(args.json_backend)
+        check_xcode_version()
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 1
+    
+    bundles = BatchProcessor.expand(args.bundles)
+    if not bundles:
+        print("No bundles to process")
+        return 1
+    
+    batch = BatchProcessor(args.output_dir, {
+        'commitSha': args.commit_sha,
+        'showBuildPerformance': args.build_performance,
+        'showFunctionCoverage': args.function_coverage,
+        'topN': args.top_n,
+        'threads': args.jobs,
+        'jsonBackend': args.json_backend
+    }, args.processes)
+    summary = batch.combined_summary(batch.run(bundles))
+    
+    json_backend.dump(summary, os.path.join(args.output_dir, 'summary.json'), indent=2)
+    index_path = os.path.abspath(os.path.join(args.output_dir, 'index.html'))
+    with open(index_path, 'w') as f:
+        f.write(batch.to_html(summary))
+    
+    for result in summary['bundles']:
+        if result['error']:
+            print(f"Error processing {result['bundle']}: {result['error']}")
+    print(f"Processed {len(bundles)} bundles: {summary['passed_tests']} passed, {summary['failed_tests']} failed, "
+          f"{summary['skipped_tests']} skipped; index saved to {index_path}")
+    return 1 if summary['failed_bundles'] else 0
+
+
+def grep_main(argv):
+    """Entry point for the grep subcommand"""
+    parser = argparse.ArgumentParser(
+        prog='process_xcresult.py grep',
+        description='Search the console logs of every run in a log index built with --extract-logs'
+    )
+    parser.add_argument('pattern', help='Text to find, matched where it starts at a word boundary (or a regex with --regex)')
+    parser.add_argument('--index', required=True, help='Path to the log index')
+    parser.add_argument('-E', '--regex', action='store_true', help='Treat the pattern as a regular expression (scans every log)')
+    parser.add_argument('-i', '--ignore-case', action='store_true', help='Match case-insensitively')
+    parser.add_argument('--test', action='append', help="Glob over 'testable/Class/test()' restricting the logs searched (repeatable)")
+    parser.add_argument('--bundle', action='append', help='Glob over bundle paths restricting the runs searched (repeatable)')
+    parser.add_argument('--failed', action='store_true', help='Only search the logs of failed tests')
+    parser.add_argument('--max-count', type=int, default=0, help='Stop after this many matching lines (default: no limit)')
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists(args.index):
+        parser.error(f"The log index at {args.index} does not exist")
+    
+    index = LogIndex(args.index)
+    matches = 0
+    logs = set()
+    try:
+        for bundle, test, status, line_number, line in index.search(
+                args.pattern, args.regex, args.ignore_case, args.test, args.bundle):
+            if args.failed and status != 'Failure':
+                continue
+            print(f"{os.path.basename(bundle)}:{test}:{line_number}: {line}")
+            matches += 1
+            logs.add((bundle, test))
+            if args.max_count and matches >= args.max_count:
+                break
+    finally:
+        index.close()
+    
+    print(f"{matches} matching lines in {len(logs)} test logs", file=sys.stderr)
+    return 0 if matches else 1
+
+
+def bench_json_main(argv):
+    """Time JSON decoding of a coverage report with every available backend"""
+    parser = argparse.ArgumentParser(
+        prog='process_xcresult.py bench-json',
+        description='Benchmark decoding of the xccov coverage report with the stdlib and orjson backends'
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--path', help='Path to .xcresult bundle whose coverage report is decoded')
+    source.add_argument('--file', help='Path to a saved JSON document to decode instead')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed decodes per backend (default: 5)')
+    args = parser.parse_args(argv)
+    
+    if args.path:
+        data = Parser(args.path).export_code_coverage()
+        if not data:
+            print(f"No code coverage report found in {args.path}", file=sys.stderr)
+            return 1
+    else:
+        with open(args.file, 'rb') as f:
+            data = f.read()
+    
+    # 'json (str)' is the old text-mode pipeline: decode to str, then parse
+    cases = [
+        ('json (str)', lambda: json.loads(data.decode('utf-8'))),
+        ('json (bytes)', lambda: json.loads(data))
+    ]
+    if orjson is not None:
+        cases.append(('orjson (bytes)', lambda: orjson.loads(data)))
+    else:
+        print("orjson is not installed; only the stdlib backend is measured. Run: pip install orjson")
+    
+    print(f"Decoding {len(data) / 1024 / 1024:.2f} MiB, best of {args.repeat}")
+    baseline = None
+    for label, decode in cases:
+        timings = []
+        for _ in range(max(args.repeat, 1)):
+            start = time.perf_counter()
+            decode()
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        baseline = baseline or best
+        print(f"{label:<16} {best * 1000:9.2f}ms  {baseline / best:5.2f}x")
+    return 0
+
+
+SUBCOMMANDS = {
+    'rerun-failed': rerun_failed_main,
+    'impact': impact_main,
+    'compare': compare_main,
+    'bench-json': bench_json_main,
+    'batch': batch_main,
+    'grep': grep_main,
+}
+
+
 def main():
+    # Subcommands take their own arguments; anything else is the classic report mode
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        sys.exit(SUBCOMMANDS[sys.argv[1]](sys.argv[2:]))
+    
     parser = argparse.ArgumentParser(description='Process Xcode test results')
     parser.add_argument('--path', required=True, help='Path to .xcresult bundle')
     parser.add_argument('--output', required=False, help='Path to output HTML report (combined report, for backward compatibility)')
@@ -999,12 +4100,38 @@ def main():
     parser.add_argument('--open', action='store_true', help='Open the report in a web browser after generation')
     parser.add_argument('--open-in-browser', action='store_true', help='Open the report in a web browser after generation')
     parser.add_argument('--summary-json', help='Path to output summary statistics as JSON')
-    parser.add_argument('--test-plan', help='Path to the test plan file (.xctestplan)')
+    parser.add_argument('--test-plan', action='append', help='Path to a test plan file (.xctestplan) whose skippedTests are reported (repeatable)')
     parser.add_argument('--debug', action='store_true', help='Show debug information')
     parser.add_argument('--commit-sha', help='Git commit SHA for generating GitHub URLs')
+    parser.add_argument('--build-performance', action='store_true', help='Add a build performance section with the slowest Swift files and type-check steps')
+    parser.add_argument('--build-log', help='Path to a recorded build log JSON to analyze instead of the one in the bundle (implies --build-performance)')
+    parser.add_argument('--top-n', type=int, default=20, help='Number of entries to show in top-N tables (default: 20)')
+    parser.add_argument('--cluster-failures', action='store_true', help='Always group failures by normalized message and location')
+    parser.add_argument('--cluster-threshold', type=int, default=50, help='Group failures automatically once there are at least this many (default: 50, 0 disables)')
+    parser.add_argument('--function-coverage', action='store_true', help='Add the largest uncovered and hottest functions per target to the coverage report')
+    parser.add_argument('--function-coverage-json', help='Path to output function coverage hotspots as JSON')
+    parser.add_argument('--data-output', help='Path to output the report data as a JSON sidecar (gzip-compressed if it ends in .gz)')
+    parser.add_argument('--virtual-output', help='Path to output a small virtualized report page that loads the --data-output sidecar')
+    parser.add_argument('--timeline-output', help='Path to output the test execution timeline HTML')
+    parser.add_argument('--timeline-json', help='Path to output the test execution timeline as JSON')
+    parser.add_argument('--jobs', type=int, default=8, help='Number of concurrent xcresulttool fetches (default: 8)')
+    parser.add_argument('--render-processes', type=int, default=os.cpu_count() or 1, help='Processes rendering report sections of large runs (default: CPU count)')
+    parser.add_argument('--json-backend', choices=JSONBackend.NAMES, default='auto', help='JSON library used for parsing and JSON outputs (default: auto, orjson when installed)')
+    parser.add_argument('--max-memory', type=parse_size, help='Approximate memory budget for test records and coverage, e.g. 512M; the rest is spilled to a temporary on-disk database')
+    parser.add_argument('--extract-logs', help='Path to a log index that per-test console logs are added to (searchable with the grep subcommand)')
+    parser.add_argument('--logs-dir', help='Directory for the console logs of failed tests, linked from their report rows (requires --extract-logs)')
+    parser.add_argument('--log-tests', choices=['all', 'failed'], default='all', help='Tests whose logs are extracted (default: all)')
+    parser.add_argument('--activity-profile', help='Path to output a JSON profile of UI test activity steps')
+    parser.add_argument('--activity-folded', help='Path to output activity self times as folded stacks (flame graph input)')
+    parser.add_argument('--activity-tests', action='append', help="Glob over 'testable/Class/test()' selecting tests to profile (repeatable, default: all)")
     
     args = parser.parse_args()
     
+    try:
+        json_backend.select(args.json_backend)
+    except ValueError as e:
+        parser.error(str(e))
+    
     try:
         # Create processor first to get skipped tests info
         processor = XCResultProcessor(
@@ -1030,21 +4157,55 @@ def main():
         # Always show passed tests and code coverage
         processor.show_passed_tests = True
         processor.show_code_coverage = True
+        processor.show_build_performance = args.build_performance or args.build_log is not None
+        processor.build_log_path = args.build_log
+        processor.top_n = args.top_n
+        processor.jobs = args.jobs
+        processor.cluster_failures = args.cluster_failures
+        processor.cluster_threshold = args.cluster_threshold
+        processor.show_function_coverage = args.function_coverage
+        processor.render_processes = args.render_processes
+        processor.max_memory = args.max_memory
+        
+        # Extract console logs first so that the reports can link to them
+        if args.logs_dir and not args.extract_logs:
+            print("--logs-dir requires --extract-logs")
+            sys.exit(1)
+        if args.extract_logs:
+            extractor = processor.extract_logs(
+                os.path.abspath(args.extract_logs),
+                os.path.abspath(args.logs_dir) if args.logs_dir else None,
+                args.log_tests == 'failed'
+            )
+            print(f"Indexed {extractor.logs_exported} console logs ({extractor.bytes_exported} bytes) "
+                  f"in {os.path.abspath(args.extract_logs)}")
         
         # Determine which reports to generate
         generate_combined = args.output is not None
         generate_test = args.test_output is not None
         generate_coverage = args.coverage_output is not None
+        generate_timeline = args.timeline_output is not None or args.timeline_json is not None
+        generate_activity_profile = args.activity_profile is not None or args.activity_folded is not None
+        generate_data = args.data_output is not None
+        generate_function_coverage = args.function_coverage_json is not None
+        
+        if args.virtual_output and not generate_data:
+            print("--virtual-output requires --data-output")
+            sys.exit(1)
         
         # If no specific outputs are requested, default to combined report
-        if not generate_combined and not generate_test and not generate_coverage:
-            print("No output paths specified. Please specify at least one of --output, --test-output, or --coverage-output")
+        if not any([generate_combined, generate_test, generate_coverage, generate_timeline,
+                    generate_activity_profile, generate_data, generate_function_coverage, args.extract_logs]):
+            print("No output paths specified. Please specify at least one of --output, --test-output, --coverage-output, "
+                  "--data-output, --function-coverage-json, --timeline-output, --timeline-json, --activity-profile, "
+                  "--activity-folded or --extract-logs")
             sys.exit(1)
         
         # Generate combined report if requested (backward compatibility)
         if generate_combined:
-            html_report = processor.generate_html_report()
             output_path = os.path.abspath(args.output)
+            processor.log_link_base = os.path.dirname(output_path)
+            html_report = processor.generate_html_report()
             
             with open(output_path, 'w') as f:
                 f.write(html_report)
@@ -1058,8 +4219,9 @@ def main():
         
         # Generate test report if requested
         if generate_test:
-            test_report = processor.generate_test_report()
             test_output_path = os.path.abspath(args.test_output)
+            processor.log_link_base = os.path.dirname(test_output_path)
+            test_report = processor.generate_test_report()
             
             with open(test_output_path, 'w') as f:
                 f.write(test_report)
@@ -1089,6 +4251,60 @@ def main():
             else:
                 print("No code coverage data found. Coverage report not generated.")
         
+        # Generate function coverage hotspots JSON if requested
+        if generate_function_coverage:
+            function_coverage_path = os.path.abspath(args.function_coverage_json)
+            function_coverage = processor.generate_function_coverage()
+            json_backend.dump(function_coverage.to_dict(), function_coverage_path, indent=2)
+            print(f"Function coverage hotspots of {function_coverage.functions_seen} functions saved to {function_coverage_path}")
+        
+        # Generate the data sidecar and virtualized page if requested
+        if generate_data:
+            data_output_path = os.path.abspath(args.data_output)
+            report_data = processor.generate_report_data()
+            json_backend.dump(report_data, data_output_path)
+            print(f"Report data successfully generated and saved to {data_output_path}")
+            
+            if args.virtual_output:
+                virtual_output_path = os.path.abspath(args.virtual_output)
+                data_url = os.path.relpath(data_output_path, os.path.dirname(virtual_output_path)).replace(os.sep, '/')
+                with open(virtual_output_path, 'w') as f:
+                    f.write(processor.generate_virtual_report(data_url))
+                print(f"Virtualized report successfully generated and saved to {virtual_output_path}")
+                
+                if (args.open or args.open_in_browser) and not generate_combined and not generate_test and not generate_coverage:
+                    webbrowser.open('file://' + virtual_output_path)
+                    print(f"Opening virtualized report in default web browser...")
+        
+        # Generate timeline outputs if requested
+        if generate_timeline:
+            timeline = processor.generate_timeline()
+            
+            if args.timeline_json:
+                timeline_json_path = os.path.abspath(args.timeline_json)
+                json_backend.dump(timeline, timeline_json_path, indent=2)
+                print(f"Timeline JSON successfully generated and saved to {timeline_json_path}")
+            
+            if args.timeline_output:
+                timeline_output_path = os.path.abspath(args.timeline_output)
+                with open(timeline_output_path, 'w') as f:
+                    f.write(processor.generate_timeline_report(timeline))
+                print(f"Timeline report successfully generated and saved to {timeline_output_path}")
+        
+        # Generate activity profile outputs if requested
+        if generate_activity_profile:
+            profiler = processor.generate_activity_profile(args.activity_tests)
+            
+            if args.activity_profile:
+                activity_profile_path = os.path.abspath(args.activity_profile)
+                json_backend.dump(profiler.to_dict(), activity_profile_path, indent=2)
+                print(f"Activity profile of {profiler.tests_profiled} tests saved to {activity_profile_path}")
+            
+            if args.activity_folded:
+                activity_folded_path = os.path.abspath(args.activity_folded)
+                profiler.write_folded(activity_folded_path)
+                print(f"Activity folded stacks saved to {activity_folded_path}")
+        
     except Exception as e:
         print(f"Error: {str(e)}")
         if args.debug:
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Tests for process_xcresult.py against small recorded fixtures"""
+
+import io
+import json
+import os
+import sys
+import unittest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(SCRIPTS_DIR, 'tests', 'fixtures')
+sys.path.insert(0, SCRIPTS_DIR)
+
+import process_xcresult  # noqa: E402
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURES_DIR, name)
+
+
+class BuildLogAnalyzerTests(unittest.TestCase):
+    """fixtures/build_log.json is a trimmed xcresulttool ActivityLogSection tree"""
+
+    def analyze(self, top_n=3):
+        analyzer = process_xcresult.BuildLogAnalyzer(process_xcresult.Parser('unused.xcresult'), top_n)
+        analyzer.analyze_file(fixture_path('build_log.json'))
+        return analyzer
+
+    def test_per_file_totals(self):
+        analyzer = self.analyze(top_n=20)
+        self.assertEqual(analyzer.files, {
+            ('IterableSDK', 'swift-sdk/Internal/InAppManager.swift'): [6.0, 2],
+            ('IterableSDK', 'IterableAPI.swift'): [2.0, 1],
+            # Nested under a section that is not itself a compile step
+            ('IterableSDK', 'swift-sdk/Internal/Models.swift'): [3.0, 1],
+            ('IterableAppExtensions', 'notification-extension/IterableExtensions.swift'): [2.5, 1],
+            # Compile steps outside any "Build target" section
+            ('Other', 'Stray.swift'): [0.5, 1],
+        })
+
+    def test_per_target_totals(self):
+        analyzer = self.analyze()
+        self.assertEqual(analyzer.targets, {
+            'IterableSDK': [11.0, 4],
+            'IterableAppExtensions': [2.5, 1],
+            'Other': [0.5, 1],
+        })
+        self.assertEqual(analyzer.total_duration, 30.0)
+        self.assertEqual(analyzer.sections_seen, 11)
+
+    def test_top_files_keeps_slowest(self):
+        self.assertEqual(self.analyze().top_files(), [
+            ('IterableSDK', 'swift-sdk/Internal/InAppManager.swift', 6.0, 2),
+            ('IterableSDK', 'swift-sdk/Internal/Models.swift', 3.0, 1),
+            ('IterableAppExtensions', 'notification-extension/IterableExtensions.swift', 2.5, 1),
+        ])
+
+    def test_top_type_checks_keeps_slowest(self):
+        self.assertEqual(self.analyze().top_type_checks(), [
+            {'subject': "global function 'attachment(for:)'",
+             'file': 'notification-extension/IterableExtensions.swift',
+             'target': 'IterableAppExtensions', 'ms': 400.0},
+            {'subject': "instance method 'scheduleSync()'",
+             'file': 'swift-sdk/Internal/InAppManager.swift',
+             'target': 'IterableSDK', 'ms': 250.0},
+            {'subject': "static method 'initialize(apiKey:config:)'",
+             'file': 'IterableAPI.swift',
+             'target': 'IterableSDK', 'ms': 120.0},
+        ])
+
+    def test_type_check_heap_is_bounded(self):
+        analyzer = self.analyze(top_n=2)
+        self.assertEqual(len(analyzer._type_checks), 2)
+        self.assertEqual([entry['ms'] for entry in analyzer.top_type_checks()], [400.0, 250.0])
+
+
+class FunctionCoverageAnalyzerTests(unittest.TestCase):
+    """fixtures/xccov_report.json is a trimmed `xccov view --report --functions-for-file --json` report"""
+
+    def setUp(self):
+        with open(fixture_path('xccov_report.json'), 'rb') as f:
+            self.doc_bytes = f.read()
+
+    def test_streamed_ranking_matches_loaded_ranking(self):
+        # top_n=2 evicts entries and keeps one of two tied execution counts
+        for top_n in (1, 2, 3, 20):
+            with self.subTest(top_n=top_n):
+                loaded = process_xcresult.FunctionCoverageAnalyzer(top_n).analyze(json.loads(self.doc_bytes))
+                # Small chunks split tokens across reads
+                streamed = process_xcresult.FunctionCoverageAnalyzer(top_n).analyze_events(
+                    process_xcresult.iter_json_events(io.BytesIO(self.doc_bytes), chunk_size=7))
+                self.assertEqual(loaded.to_dict(), streamed.to_dict())
+
+    def test_ranking(self):
+        analyzer = process_xcresult.FunctionCoverageAnalyzer(3).analyze_events(
+            process_xcresult.iter_json_events(io.BytesIO(self.doc_bytes)))
+        self.assertEqual(analyzer.functions_seen, 12)
+        self.assertEqual(
+            [entry['name'] for entry in analyzer.ranked('IterableSDK.framework', 'uncovered')],
+            ['InAppManager.handleClick(clickedUrl:forMessage:location:)', 'InAppManager.scheduleSync()',
+             'CommerceItem.toDictionary()'])
+        self.assertEqual(
+            [entry['executionCount'] for entry in analyzer.ranked('IterableSDK.framework', 'hottest')],
+            [240, 57, 57])
+        self.assertEqual(
+            [entry['name'] for entry in analyzer.ranked('notification-extension.appex', 'hottest')],
+            ['ITBNotificationServiceExtension.didReceive(_:withContentHandler:)'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,871 @@
+#!/usr/bin/env python3
+
+"""
+Local APNs Stand-in Server
+
+A small HTTP/2-over-TLS server that behaves like the APNs provider API
+(POST /3/device/{token}), for exercising test_push.py offline: throughput
+benchmarks, retry/backoff and invalid-token handling without touching
+Apple's servers.
+
+Features:
+    - Client-certificate and provider-token (JWT, ES256) authentication
+    - APNs request validation and error reasons (BadDeviceToken, MissingTopic, PayloadTooLarge, ...)
+    - Configurable response latency distributions
+    - Error injection (400/403/410/429/500/503) and GOAWAY after N requests
+    - SETTINGS_MAX_CONCURRENT_STREAMS limit
+    - Recording of received payloads as JSON lines
+
+Usage:
+    python apns_stub.py certs --dir stub-certs
+    python apns_stub.py serve --certs stub-certs --port 2197 --latency lognormal:5:0.5 --inject 429=0.02
+    python test_push.py --base-url https://127.0.0.1:2197 --ca-cert stub-certs/ca.pem --cert stub-certs/client.pem ...
+    python apns_stub.py benchmark --pushes 20000 --workers 64
+
+Requirements:
+    pip install -r requirements.txt
+"""
+
+import argparse
+import base64
+import binascii
+import datetime
+import heapq
+import ipaddress
+import json
+import math
+import multiprocessing
+import random
+import re
+import select
+import socket
+import ssl
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, List, Tuple
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+    import h2.settings
+    from h2.errors import ErrorCodes
+    from hyperframe.frame import GoAwayFrame
+    from cryptography import x509
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+    from cryptography.hazmat.primitives.serialization import pkcs12
+    from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+except ImportError as e:
+    missing = str(e).split("'")[1] if "'" in str(e) else str(e)
+    print(f"❌ Error: {missing} not installed. Run: pip install -r requirements.txt")
+    sys.exit(1)
+
+
+DEFAULT_TOPIC = "com.sumeru.IterableSDK-Integration-Tester"
+
+# Default reason for each injectable status, as APNs reports them
+INJECTED_REASONS = {
+    400: "BadDeviceToken",
+    403: "InvalidProviderToken",
+    410: "Unregistered",
+    429: "TooManyRequests",
+    500: "InternalServerError",
+    503: "ServiceUnavailable"
+}
+
+PUSH_TYPES = ("alert", "background", "location", "voip", "complication", "fileprovider",
+              "mdm", "liveactivity", "pushtotalk")
+
+TOKEN_PATTERN = re.compile(r'^(?:[0-9a-fA-F]{64}|[0-9a-fA-F]{128}|[0-9a-fA-F]{160})$')
+
+
+def generate_certificates(directory: str, topic: str = DEFAULT_TOPIC) -> Dict[str, str]:
+    """
+    Create a throwaway CA plus server and APNs-style client certificates.
+
+    The client certificate carries the topic in its UID, like the push
+    certificates Apple issues, and is written both as a combined PEM
+    (certificate + key) and as a password-less P12.
+
+    Args:
+        directory: Output directory (created if missing)
+        topic: Bundle ID the client certificate may push to
+
+    Returns:
+        Paths keyed by ca, server, server_key, client and client_p12
+    """
+    out = Path(directory)
+    out.mkdir(parents=True, exist_ok=True)
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    def key_pem(key) -> bytes:
+        return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                 serialization.NoEncryption())
+
+    def cert_pem(cert) -> bytes:
+        return cert.public_bytes(serialization.Encoding.PEM)
+
+    ca_key = ec.generate_private_key(ec.SECP256R1())
+    ca_name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "APNs Stub Test CA")])
+    ca_cert = (
+        x509.CertificateBuilder()
+        .subject_name(ca_name)
+        .issuer_name(ca_name)
+        .public_key(ca_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=3650))
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .add_extension(x509.KeyUsage(digital_signature=True, content_commitment=False, key_encipherment=False,
+                                     data_encipherment=False, key_agreement=False, key_cert_sign=True,
+                                     crl_sign=True, encipher_only=False, decipher_only=False), critical=True)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(ca_key.public_key()), critical=False)
+        .sign(ca_key, hashes.SHA256())
+    )
+
+    def leaf(name: x509.Name, usage, san=None):
+        key = ec.generate_private_key(ec.SECP256R1())
+        builder = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(ca_name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=825))
+            .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+            .add_extension(x509.ExtendedKeyUsage([usage]), critical=False)
+            .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()), critical=False)
+        )
+        if san:
+            builder = builder.add_extension(x509.SubjectAlternativeName(san), critical=False)
+        return key, builder.sign(ca_key, hashes.SHA256())
+
+    server_key, server_cert = leaf(
+        x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")]),
+        ExtendedKeyUsageOID.SERVER_AUTH,
+        [x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+         x509.IPAddress(ipaddress.ip_address("::1"))])
+    client_key, client_cert = leaf(
+        x509.Name([x509.NameAttribute(NameOID.USER_ID, topic),
+                   x509.NameAttribute(NameOID.COMMON_NAME, f"Apple Push Services: {topic}"[:64])]),
+        ExtendedKeyUsageOID.CLIENT_AUTH)
+
+    paths = {
+        "ca": out / "ca.pem",
+        "server": out / "server.pem",
+        "server_key": out / "server-key.pem",
+        "client": out / "client.pem",
+        "client_p12": out / "client.p12"
+    }
+    paths["ca"].write_bytes(cert_pem(ca_cert))
+    paths["server"].write_bytes(cert_pem(server_cert))
+    paths["server_key"].write_bytes(key_pem(server_key))
+    paths["client"].write_bytes(cert_pem(client_cert) + key_pem(client_key))
+    paths["client_p12"].write_bytes(pkcs12.serialize_key_and_certificates(
+        b"apns-stub", client_key, client_cert, None, serialization.NoEncryption()))
+    return {name: str(path) for name, path in paths.items()}
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a response latency distribution (milliseconds) into a sampler returning seconds.
+
+    Formats: MS, constant:MS, uniform:LOW:HIGH, normal:MEAN:STDDEV,
+    lognormal:MEDIAN:SIGMA, exponential:MEAN
+    """
+    name, _, rest = spec.partition(":")
+    try:
+        if not rest:
+            value = float(name) / 1000
+            return lambda rng: value
+        params = [float(part) for part in rest.split(":")]
+        if name == "constant" and len(params) == 1:
+            value = params[0] / 1000
+            return lambda rng: value
+        if name == "uniform" and len(params) == 2:
+            low, high = params
+            return lambda rng: rng.uniform(low, high) / 1000
+        if name == "normal" and len(params) == 2:
+            mean, stddev = params
+            return lambda rng: max(0.0, rng.gauss(mean, stddev)) / 1000
+        if name == "lognormal" and len(params) == 2:
+            mu, sigma = math.log(params[0]), params[1]
+            return lambda rng: rng.lognormvariate(mu, sigma) / 1000
+        if name == "exponential" and len(params) == 1:
+            mean = params[0]
+            return lambda rng: rng.expovariate(1 / mean) / 1000 if mean > 0 else 0.0
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"invalid latency distribution: {spec}")
+
+
+def parse_injection(spec: str) -> Tuple[int, str, float]:
+    """Parse STATUS[:REASON]=RATE, e.g. 429=0.05 or 400:BadTopic=0.01."""
+    match = re.match(r'^(\d{3})(?::(\w+))?=([0-9.]+)$', spec)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid injection (expected STATUS[:REASON]=RATE): {spec}")
+    status, reason, rate = int(match.group(1)), match.group(2), float(match.group(3))
+    if not reason:
+        if status not in INJECTED_REASONS:
+            raise argparse.ArgumentTypeError(f"no default reason for status {status}; use {status}:REASON=RATE")
+        reason = INJECTED_REASONS[status]
+    return status, reason, rate
+
+
+def load_jwt_key(spec: str):
+    """Parse KEY_ID=PATH (a .p8 signing key or a PEM public key) into (key_id, public_key)."""
+    key_id, _, path = spec.partition("=")
+    if not path:
+        raise argparse.ArgumentTypeError(f"invalid JWT key (expected KEY_ID=PATH): {spec}")
+    data = Path(path).read_bytes()
+    try:
+        key = serialization.load_pem_private_key(data, password=None).public_key()
+    except ValueError:
+        key = serialization.load_pem_public_key(data)
+    return key_id, key
+
+
+def _b64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+class APNsStub:
+    """APNs provider API stand-in serving HTTP/2 over TLS on a background thread."""
+
+    MAX_PAYLOAD_SIZE = 4096
+
+    def __init__(self, certfile: str, keyfile: str, ca_file: Optional[str] = None,
+                 require_client_cert: bool = False, host: str = "127.0.0.1", port: int = 0,
+                 latency: Optional[Callable[[random.Random], float]] = None,
+                 inject: Optional[List[Tuple[int, str, float]]] = None,
+                 goaway_after: Optional[int] = None, max_streams: int = 1000,
+                 unregistered: Optional[set] = None, topics: Optional[List[str]] = None,
+                 jwt_keys: Optional[Dict[str, Any]] = None, record_path: Optional[str] = None,
+                 keep_records: bool = False, seed: Optional[int] = None, reuse_port: bool = False):
+        """
+        Configure the stub.
+
+        Args:
+            certfile: Server certificate (PEM)
+            keyfile: Server private key (PEM)
+            ca_file: CA that client certificates must chain to (None disables certificate auth)
+            require_client_cert: Reject TLS handshakes without a client certificate
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free one)
+            latency: Response delay sampler (see parse_latency; default: respond immediately)
+            inject: (status, reason, rate) errors returned for a random share of valid requests
+            goaway_after: Send GOAWAY after this many requests on each connection
+            max_streams: SETTINGS_MAX_CONCURRENT_STREAMS advertised to clients
+            unregistered: Tokens answered with 410 Unregistered
+            topics: Accepted apns-topic values (default: the client certificate's UID, or any)
+            jwt_keys: Provider-token public keys by key ID (None accepts any well-formed token)
+            record_path: Append every request as a JSON line to this file
+            keep_records: Also keep the requests in `records`
+            seed: Seed for latency and error injection
+            reuse_port: Bind with SO_REUSEPORT so several stub processes can share the port
+        """
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self.ca_file = ca_file
+        self.require_client_cert = require_client_cert
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.inject = inject or []
+        self.goaway_after = goaway_after
+        self.max_streams = max_streams
+        self.unregistered = unregistered or set()
+        self.topics = set(topics) if topics else None
+        self.jwt_keys = jwt_keys
+        self.keep_records = keep_records
+        self.records: List[Dict[str, Any]] = []
+        self.stats: Dict[str, int] = {}
+        self.seed = seed
+        self.reuse_port = reuse_port
+        self._record_file = open(record_path, "a", buffering=1) if record_path else None
+        self._lock = threading.Lock()
+        self._connections = 0
+        self._sockets = set()
+        self._listener = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+    @property
+    def url(self) -> str:
+        host = f"[{self.host}]" if ":" in self.host else self.host
+        return f"https://{host}:{self.port}"
+
+    def _ssl_context(self) -> ssl.SSLContext:
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(self.certfile, self.keyfile)
+        context.set_alpn_protocols(["h2"])
+        if self.ca_file:
+            context.load_verify_locations(self.ca_file)
+            context.verify_mode = ssl.CERT_REQUIRED if self.require_client_cert else ssl.CERT_OPTIONAL
+        return context
+
+    def start(self) -> "APNsStub":
+        """Bind and serve on a background thread; returns self once listening."""
+        self._context = self._ssl_context()
+        self._listener = socket.create_server((self.host, self.port), backlog=128, reuse_port=self.reuse_port)
+        self._listener.settimeout(0.2)
+        self.port = self._listener.getsockname()[1]
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop accepting, drop open connections and close the record file."""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+        with self._lock:
+            for sock in list(self._sockets):
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+            if self._record_file:
+                self._record_file.close()
+                self._record_file = None
+
+    def _accept_loop(self):
+        while not self._stopping.is_set():
+            try:
+                sock, _ = self._listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._connections += 1
+                rng = random.Random(None if self.seed is None else self.seed + self._connections)
+            threading.Thread(target=self._serve_connection, args=(sock, rng), daemon=True).start()
+        self._listener.close()
+
+    def _serve_connection(self, raw_sock: socket.socket, rng: random.Random):
+        try:
+            sock = self._context.wrap_socket(raw_sock, server_side=True)
+        except (ssl.SSLError, OSError):
+            self._count("tls_failed")
+            raw_sock.close()
+            return
+        with self._lock:
+            self._sockets.add(sock)
+        try:
+            if sock.selected_alpn_protocol() != "h2":
+                # APNs only speaks HTTP/2
+                self._count("not_h2")
+                return
+            _StubConnection(self, sock, rng).run()
+        except (ssl.SSLError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._sockets.discard(sock)
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _check_provider_token(self, authorization: str) -> Optional[str]:
+        """Validate an "authorization: bearer <JWT>" header; returns an error reason or None."""
+        scheme, _, token = authorization.partition(" ")
+        parts = token.split(".")
+        if scheme.lower() != "bearer" or len(parts) != 3:
+            return "InvalidProviderToken"
+        try:
+            header = json.loads(_b64url_decode(parts[0]))
+            claims = json.loads(_b64url_decode(parts[1]))
+            signature = _b64url_decode(parts[2])
+        except (ValueError, binascii.Error):
+            return "InvalidProviderToken"
+        if (header.get("alg") != "ES256" or not header.get("kid") or not claims.get("iss")
+                or not isinstance(claims.get("iat"), int)):
+            return "InvalidProviderToken"
+        if time.time() - claims["iat"] > 3600:
+            return "ExpiredProviderToken"
+        if self.jwt_keys is not None:
+            key = self.jwt_keys.get(header["kid"])
+            if key is None or len(signature) != 64:
+                return "InvalidProviderToken"
+            der = encode_dss_signature(int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big"))
+            try:
+                key.verify(der, f"{parts[0]}.{parts[1]}".encode("ascii"), ec.ECDSA(hashes.SHA256()))
+            except InvalidSignature:
+                return "InvalidProviderToken"
+        return None
+
+    def handle_request(self, headers: Dict[str, str], body: bytes, peer_cert: Optional[dict],
+                       rng: random.Random) -> Tuple[int, Optional[str], str, Dict[str, Any]]:
+        """
+        Apply APNs request semantics.
+
+        Returns:
+            (status, reason, apns_id, extra response fields)
+        """
+        status, reason, extra = 200, None, {}
+        apns_id = headers.get("apns-id")
+        path = headers.get(":path", "")
+        token = path[len("/3/device/"):] if path.startswith("/3/device/") else None
+        topic = headers.get("apns-topic")
+
+        if apns_id is not None:
+            try:
+                apns_id = str(uuid.UUID(apns_id))
+            except ValueError:
+                status, reason, apns_id = 400, "BadMessageId", None
+        apns_id = apns_id or str(uuid.uuid4())
+
+        cert_topics = set()
+        if peer_cert:
+            for rdn in peer_cert.get("subject", ()):
+                for name, value in rdn:
+                    if name == "userId":
+                        cert_topics.add(value)
+        allowed_topics = self.topics or cert_topics
+        # Verify the provider token (an ECDSA signature check) once per request
+        token_error = None
+        if status == 200 and "authorization" in headers:
+            token_error = self._check_provider_token(headers["authorization"])
+
+        if status != 200:
+            pass
+        elif headers.get(":method") != "POST":
+            status, reason = 405, "MethodNotAllowed"
+        elif token is None:
+            status, reason = 404, "BadPath"
+        elif token_error:
+            status, reason = 403, token_error
+        elif "authorization" not in headers and not peer_cert:
+            status, reason = 403, "MissingProviderToken"
+        elif not TOKEN_PATTERN.match(token):
+            status, reason = 400, "BadDeviceToken"
+        elif not topic:
+            status, reason = 400, "MissingTopic"
+        elif allowed_topics and topic not in allowed_topics:
+            status, reason = 400, "TopicDisallowed" if cert_topics and not self.topics else "BadTopic"
+        elif headers.get("apns-priority", "10") not in ("1", "5", "10"):
+            status, reason = 400, "BadPriority"
+        elif not headers.get("apns-expiration", "0").isdigit():
+            status, reason = 400, "BadExpirationDate"
+        elif headers.get("apns-push-type", "alert") not in PUSH_TYPES:
+            status, reason = 400, "InvalidPushType"
+        elif len(headers.get("apns-collapse-id", "").encode("utf-8")) > 64:
+            status, reason = 400, "BadCollapseId"
+        elif not body:
+            status, reason = 400, "PayloadEmpty"
+        elif len(body) > self.MAX_PAYLOAD_SIZE:
+            status, reason = 413, "PayloadTooLarge"
+        elif token in self.unregistered:
+            status, reason = 410, "Unregistered"
+        else:
+            for injected_status, injected_reason, rate in self.inject:
+                if rng.random() < rate:
+                    status, reason = injected_status, injected_reason
+                    break
+        if status == 410:
+            extra["timestamp"] = int(time.time() * 1000)
+
+        self._count(str(status))
+        if self._record_file or self.keep_records:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = body.decode("utf-8", "replace")
+            record = {
+                "time": time.time(),
+                "token": token,
+                "topic": topic,
+                "apns_id": apns_id,
+                "priority": headers.get("apns-priority"),
+                "push_type": headers.get("apns-push-type"),
+                "status": status,
+                "reason": reason,
+                "payload": payload
+            }
+            with self._lock:
+                if self.keep_records:
+                    self.records.append(record)
+                if self._record_file:
+                    self._record_file.write(json.dumps(record) + "\n")
+        return status, reason, apns_id, extra
+
+
+class _StubConnection:
+    """One client connection: an h2 state machine plus a timer heap of delayed responses."""
+
+    CONNECTION_WINDOW = 16 * 1024 * 1024
+
+    def __init__(self, stub: APNsStub, sock: ssl.SSLSocket, rng: random.Random):
+        self.stub = stub
+        self.sock = sock
+        self.rng = rng
+        self.peer_cert = sock.getpeercert() or None
+        self.conn = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        self.conn.local_settings = h2.settings.Settings(
+            client=False, initial_values={h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: stub.max_streams})
+        self.requests: Dict[int, Tuple[Dict[str, str], bytearray]] = {}
+        self.pending: List[Tuple[float, int, int, int, Optional[str], str, Dict[str, Any]]] = []
+        self.handled = 0
+        self.last_stream_id = None  # Set once GOAWAY is due; later streams are refused
+        self.closed = False
+
+    def run(self):
+        self.conn.initiate_connection()
+        # Like production servers, open a large connection-level receive window up front
+        self.conn.increment_flow_control_window(self.CONNECTION_WINDOW - 65535)
+        self._flush()
+        while not self.closed and not self.stub._stopping.is_set():
+            self._send_due_responses()
+            if self.last_stream_id is not None and self._drained():
+                return
+
+            if not self.sock.pending():
+                timeout = max(0.0, self.pending[0][0] - time.monotonic()) if self.pending else 0.5
+                readable, _, _ = select.select([self.sock], [], [], timeout)
+                if not readable:
+                    continue
+            data = self.sock.recv(65536)
+            if not data:
+                return
+            try:
+                events = self.conn.receive_data(data)
+            except h2.exceptions.ProtocolError:
+                # h2 queued a GOAWAY (e.g. too many concurrent streams)
+                self.stub._count("protocol_error")
+                self._flush()
+                return
+            for event in events:
+                self._handle_event(event)
+            self._flush()
+
+    def _drained(self) -> bool:
+        return not self.pending and not any(stream_id <= self.last_stream_id for stream_id in self.requests)
+
+    def _handle_event(self, event):
+        if isinstance(event, h2.events.RequestReceived):
+            if self.last_stream_id is not None and event.stream_id > self.last_stream_id:
+                self.conn.reset_stream(event.stream_id, ErrorCodes.REFUSED_STREAM)
+                return
+            self.requests[event.stream_id] = (dict(event.headers), bytearray())
+        elif isinstance(event, h2.events.DataReceived):
+            self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            if event.stream_id in self.requests:
+                self.requests[event.stream_id][1].extend(event.data)
+        elif isinstance(event, h2.events.StreamEnded):
+            if event.stream_id not in self.requests:
+                return
+            headers, body = self.requests.pop(event.stream_id)
+            status, reason, apns_id, extra = self.stub.handle_request(headers, bytes(body), self.peer_cert, self.rng)
+            delay = self.stub.latency(self.rng) if self.stub.latency else 0.0
+            heapq.heappush(self.pending, (time.monotonic() + delay, event.stream_id, event.stream_id,
+                                          status, reason, apns_id, extra))
+            self.handled += 1
+            if self.stub.goaway_after and self.last_stream_id is None and self.handled >= self.stub.goaway_after:
+                self._send_goaway(event.stream_id)
+        elif isinstance(event, h2.events.StreamReset):
+            self.requests.pop(event.stream_id, None)
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            self.closed = True
+
+    def _send_goaway(self, last_stream_id: int):
+        """
+        Graceful GOAWAY: streams up to last_stream_id are still answered.
+
+        h2 refuses to send anything after its own close_connection(), so the
+        frame is written directly and the connection closes once drained.
+        """
+        self._flush()
+        self.sock.sendall(GoAwayFrame(stream_id=0, last_stream_id=last_stream_id, error_code=0).serialize())
+        self.last_stream_id = last_stream_id
+        self.stub._count("goaway")
+
+    def _send_due_responses(self):
+        now = time.monotonic()
+        sent = False
+        while self.pending and self.pending[0][0] <= now:
+            _, _, stream_id, status, reason, apns_id, extra = heapq.heappop(self.pending)
+            response_headers = [(":status", str(status)), ("apns-id", apns_id)]
+            body = b""
+            if reason:
+                error = {"reason": reason}
+                error.update(extra)
+                body = json.dumps(error).encode("utf-8")
+                response_headers += [("content-type", "application/json"), ("content-length", str(len(body)))]
+            try:
+                self.conn.send_headers(stream_id, response_headers, end_stream=not body)
+                if body:
+                    self.conn.send_data(stream_id, body, end_stream=True)
+            except (h2.exceptions.StreamClosedError, h2.exceptions.ProtocolError):
+                # Client reset the stream while we were "processing" it
+                continue
+            sent = True
+        if sent:
+            self._flush()
+
+    def _flush(self):
+        data = self.conn.data_to_send()
+        if data:
+            self.sock.sendall(data)
+
+
+def _stub_from_args(args, certs: Dict[str, str], **overrides) -> APNsStub:
+    options = dict(
+        certfile=certs["server"],
+        keyfile=certs["server_key"],
+        ca_file=certs.get("ca"),
+        require_client_cert=getattr(args, "require_client_cert", False),
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        inject=args.inject,
+        goaway_after=args.goaway_after,
+        max_streams=args.max_streams,
+        seed=args.seed
+    )
+    options.update(overrides)
+    return APNsStub(**options)
+
+
+def _certificates_in(directory: str) -> Dict[str, str]:
+    """Use the certificates in `directory`, generating them on first use."""
+    paths = {
+        "ca": Path(directory) / "ca.pem",
+        "server": Path(directory) / "server.pem",
+        "server_key": Path(directory) / "server-key.pem",
+        "client": Path(directory) / "client.pem",
+        "client_p12": Path(directory) / "client.p12"
+    }
+    if not all(path.exists() for path in paths.values()):
+        print(f"🔐 Generating stub certificates in {directory}")
+        return generate_certificates(directory)
+    return {name: str(path) for name, path in paths.items()}
+
+
+def _print_stats(stats: Dict[str, int]):
+    if stats:
+        print("📊 " + ", ".join(f"{key}: {value}" for key, value in sorted(stats.items())))
+
+
+def certs_main(args):
+    paths = generate_certificates(args.dir, args.topic)
+    for name, path in paths.items():
+        print(f"🔐 {name}: {path}")
+
+
+def serve_main(args):
+    certs = _certificates_in(args.certs)
+    unregistered = set()
+    if args.unregistered:
+        with open(args.unregistered) as f:
+            unregistered = {line.strip() for line in f if line.strip()}
+    stub = _stub_from_args(
+        args, certs,
+        unregistered=unregistered,
+        topics=args.topic,
+        jwt_keys=dict(args.jwt_key) if args.jwt_key else None,
+        record_path=args.record,
+        ca_file=None if args.no_client_certs else certs["ca"]
+    ).start()
+    print(f"🧪 APNs stub listening on {stub.url}")
+    print(f"   python test_push.py --base-url {stub.url} --ca-cert {certs['ca']} --cert {certs['client']} ...")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        stub.stop()
+        _print_stats(stub.stats)
+
+
+def _serve_in_process(options: Dict[str, Any], ready):
+    latency = options.pop("latency_spec")
+    options["latency"] = parse_latency(latency) if latency else None
+    stub = APNsStub(**options).start()
+    ready.put(stub.port)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+
+def benchmark_main(args):
+    """Push to random tokens through test_push.APNsPushSender against stubs in separate processes."""
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from test_push import APNsPushSender, LatencyRecorder, PayloadTemplate, RateLimiter, RetryPolicy, send_sharded
+
+    certs = _certificates_in(args.certs or tempfile.mkdtemp(prefix="apns-stub-"))
+    stub_processes = args.stub_processes or args.processes
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    servers = []
+    port = args.port
+    for index in range(stub_processes):
+        server = context.Process(target=_serve_in_process, daemon=True, args=(dict(
+            certfile=certs["server"], keyfile=certs["server_key"], ca_file=certs["ca"],
+            host=args.host, port=port, latency_spec=args.latency_spec, inject=args.inject,
+            goaway_after=args.goaway_after, max_streams=args.max_streams,
+            seed=None if args.seed is None else args.seed + index, reuse_port=stub_processes > 1), ready))
+        server.start()
+        servers.append(server)
+        # Later stub processes share the first one's port
+        port = ready.get(timeout=30)
+    try:
+        rng = random.Random(args.seed)
+        tokens = (f"{rng.getrandbits(256):064x}" for _ in range(args.pushes))
+        latency = LatencyRecorder()
+        base_url = f"https://{args.host}:{port}"
+        template = PayloadTemplate({"aps": {"alert": {"title": "Test Push", "body": "Benchmark push"},
+                                            "sound": "default"},
+                                    "itbl": {"messageId": "{{messageId}}"}})
+        if args.processes > 1:
+            with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as token_file:
+                for token in tokens:
+                    token_file.write(token + "\n")
+            try:
+                summary = send_sharded(
+                    token_file.name, template, args.processes,
+                    sender_options={"cert_path": certs["client"], "quiet": True, "base_url": base_url,
+                                    "ca_cert": certs["ca"]},
+                    retry_options={"max_retries": args.max_retries, "base_delay": 0.05, "max_delay": 2.0},
+                    limiter_options={"rate": args.rate} if args.rate else None,
+                    send_options={"bundle_id": DEFAULT_TOPIC, "workers": args.workers,
+                                  "queue_size": args.workers * 4},
+                    latency=latency
+                )
+            finally:
+                Path(token_file.name).unlink()
+        else:
+            sender = APNsPushSender(
+                cert_path=certs["client"],
+                rate_limiter=RateLimiter(rate=args.rate) if args.rate else None,
+                retry_policy=RetryPolicy(args.max_retries, 0.05, 2.0),
+                quiet=True,
+                latency=latency,
+                base_url=base_url,
+                ca_cert=certs["ca"]
+            )
+            try:
+                summary = sender.send_bulk(tokens, template, DEFAULT_TOPIC, workers=args.workers,
+                                           queue_size=args.workers * 4)
+            finally:
+                sender.close()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.join()
+
+    print(f"📊 {summary['sent']}/{summary['total']} pushes in {summary['elapsed']:.2f}s "
+          f"= {summary['rate']:.0f} pushes/s ({args.processes} x {args.workers} workers, "
+          f"{stub_processes} stub processes), {summary['failed']} failed, "
+          f"{summary['retries']} retries, {summary['throttled']} throttled")
+    print(latency.format_summary())
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "latency": latency.to_dict(), "options": {
+                "pushes": args.pushes, "processes": args.processes, "stub_processes": stub_processes,
+                "workers": args.workers, "latency": args.latency_spec,
+                "inject": args.inject, "goaway_after": args.goaway_after, "seed": args.seed}}, f, indent=2)
+        print(f"💾 Benchmark results written to {args.json}")
+
+
+def main():
+    """Main script entry point."""
+    parser = argparse.ArgumentParser(
+        description="Local APNs stand-in server for offline push tests and benchmarks",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Serve with ~5ms median latency, 2% throttling and a GOAWAY every 1000 requests
+  python apns_stub.py serve --port 2197 --latency lognormal:5:0.5 --inject 429=0.02 --goaway-after 1000
+
+  # Send a push to it
+  python test_push.py --base-url https://127.0.0.1:2197 --ca-cert stub-certs/ca.pem \\
+      --cert stub-certs/client.pem --token $(python -c "print('ab' * 32)") --message "Hello"
+
+  # Throughput benchmark (stub runs in a separate process)
+  python apns_stub.py benchmark --pushes 20000 --workers 64 --latency constant:2
+
+  # Scaling: 4 sender processes against 4 stub processes sharing the port
+  python apns_stub.py benchmark --pushes 100000 --workers 32 --processes 4
+        """
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    certs_parser = subparsers.add_parser("certs", help="Generate CA, server and client certificates")
+    certs_parser.add_argument("--dir", default="stub-certs", help="Output directory (default: stub-certs)")
+    certs_parser.add_argument("--topic", default=DEFAULT_TOPIC, help=f"Client certificate topic (default: {DEFAULT_TOPIC})")
+    certs_parser.set_defaults(func=certs_main)
+
+    def add_server_arguments(sub):
+        sub.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+        sub.add_argument("--port", type=int, default=0, help="Port to listen on (default: a free port)")
+        sub.add_argument("--certs", help="Certificate directory, generated if empty")
+        sub.add_argument("--inject", type=parse_injection, action="append", default=[],
+                         metavar="STATUS[:REASON]=RATE",
+                         help="Answer a share of valid requests with an error, e.g. 429=0.05 (repeatable)")
+        sub.add_argument("--goaway-after", type=int, metavar="N",
+                         help="Send GOAWAY after N requests on each connection")
+        sub.add_argument("--max-streams", type=int, default=1000,
+                         help="SETTINGS_MAX_CONCURRENT_STREAMS (default: 1000)")
+        sub.add_argument("--seed", type=int, help="Seed for latency and error injection")
+
+    serve_parser = subparsers.add_parser("serve", help="Run the stub until interrupted")
+    add_server_arguments(serve_parser)
+    serve_parser.add_argument("--latency", type=parse_latency,
+                              help="Response latency in ms: MS, uniform:LOW:HIGH, normal:MEAN:SD, "
+                                   "lognormal:MEDIAN:SIGMA or exponential:MEAN")
+    serve_parser.add_argument("--require-client-cert", action="store_true",
+                              help="Reject TLS handshakes without a client certificate")
+    serve_parser.add_argument("--no-client-certs", action="store_true",
+                              help="Only accept provider tokens (JWT)")
+    serve_parser.add_argument("--jwt-key", type=load_jwt_key, action="append", metavar="KEY_ID=PATH",
+                              help="Verify provider tokens with this key (.p8 or public PEM; repeatable)")
+    serve_parser.add_argument("--topic", action="append",
+                              help="Accepted apns-topic (repeatable; default: the client certificate's)")
+    serve_parser.add_argument("--unregistered", metavar="FILE",
+                              help="Tokens (one per line) answered with 410 Unregistered")
+    serve_parser.add_argument("--record", metavar="FILE", help="Append received requests as JSON lines")
+    serve_parser.set_defaults(func=serve_main, certs="stub-certs")
+
+    bench_parser = subparsers.add_parser("benchmark", help="Measure push throughput against a local stub")
+    add_server_arguments(bench_parser)
+    bench_parser.add_argument("--latency", dest="latency_spec", default="constant:1",
+                              help="Stub response latency distribution in ms (default: constant:1)")
+    bench_parser.add_argument("--pushes", type=int, default=10000, help="Pushes to send (default: 10000)")
+    bench_parser.add_argument("--workers", type=int, default=32,
+                              help="Concurrent pushes per sender process (default: 32)")
+    bench_parser.add_argument("--processes", type=int, default=1,
+                              help="Sender processes, sharding the tokens by hash (default: 1)")
+    bench_parser.add_argument("--stub-processes", type=int,
+                              help="Stub processes sharing the port (default: --processes)")
+    bench_parser.add_argument("--rate", type=float, help="Global pushes per second ceiling (default: unlimited)")
+    bench_parser.add_argument("--max-retries", type=int, default=5, help="Retries per push (default: 5)")
+    bench_parser.add_argument("--json", metavar="PATH", help="Write the results as JSON")
+    bench_parser.set_defaults(func=benchmark_main, seed=1)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,19 +8,40 @@ using SSL certificates. Uses the apns2 library for robust APNs communication.
 
 Usage:
     python test_push.py --token <device_token> --message <message> --cert <cert_path> [options]
+    python test_push.py --token-file <tokens.txt> --message <message> --cert <cert_path> --rate 500 [options]
 
 Requirements:
     pip install apns2
 """
 
 import argparse
+import atexit
+import bisect
+import csv
+import glob
+import hashlib
+import itertools
 import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import re
+import secrets
+import sqlite3
 import sys
+import threading
 import time
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from json.encoder import encode_basestring
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple, Union
 
 try:
+    import certifi
     import httpx
     from cryptography.hazmat.primitives import serialization
     from cryptography.hazmat.primitives.serialization import pkcs12
@@ -32,6 +53,1060 @@ except ImportError as e:
     sys.exit(1)
 
 
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` tokens per second."""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Initialize the bucket full.
+        
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size (default: one second worth of tokens, at least 1)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def set_rate(self, rate: float):
+        """Change the refill rate, keeping the tokens accumulated so far."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+    
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Block until `tokens` are available and take them.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class RateLimiter:
+    """
+    Global and per-device push budgets with adaptive (AIMD) pacing.
+    
+    The global rate is halved whenever APNs answers 429 and grows back
+    additively with each successful push, so sustained sends settle just
+    below the rate APNs accepts instead of provoking a cascade of rejections.
+    """
+    
+    RECOVERY_STEPS = 50  # successful pushes needed to climb back from the floor to the ceiling
+    
+    def __init__(self, rate: Optional[float] = None, device_rate: Optional[float] = None,
+                 burst: Optional[float] = None, min_rate: float = 1.0):
+        """
+        Initialize the limiter.
+        
+        Args:
+            rate: Global ceiling in pushes per second (None for no global limit)
+            device_rate: Pushes per second per device token (None for no per-device limit)
+            burst: Global burst size (default: one second at the ceiling)
+            min_rate: Floor the adaptive global rate never drops below
+        """
+        self.ceiling = rate
+        self.device_rate = device_rate
+        self.min_rate = min(min_rate, rate) if rate else min_rate
+        self.global_bucket = TokenBucket(rate, burst) if rate else None
+        self._device_buckets = {}
+        self._lock = threading.Lock()
+        self.throttle_events = 0
+    
+    @property
+    def current_rate(self) -> Optional[float]:
+        return self.global_bucket.rate if self.global_bucket else None
+    
+    def acquire(self, device_token: str) -> float:
+        """Wait for both the device's and the global budget; returns seconds waited."""
+        waited = 0.0
+        if self.device_rate:
+            with self._lock:
+                bucket = self._device_buckets.get(device_token)
+                if bucket is None:
+                    bucket = self._device_buckets[device_token] = TokenBucket(self.device_rate, 1.0)
+            waited += bucket.acquire()
+        if self.global_bucket:
+            waited += self.global_bucket.acquire()
+        return waited
+    
+    def throttle(self):
+        """Multiplicative decrease after APNs pushed back."""
+        with self._lock:
+            self.throttle_events += 1
+        if self.global_bucket:
+            self.global_bucket.set_rate(max(self.min_rate, self.global_bucket.rate / 2))
+    
+    def recover(self):
+        """Additive increase after a successful push."""
+        if self.global_bucket and self.global_bucket.rate < self.ceiling:
+            step = (self.ceiling - self.min_rate) / self.RECOVERY_STEPS
+            self.global_bucket.set_rate(min(self.ceiling, self.global_bucket.rate + step))
+
+
+class RetryPolicy:
+    """Jittered exponential backoff for pushes APNs may accept when retried."""
+    
+    RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+    
+    def __init__(self, max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0):
+        """
+        Initialize the policy.
+        
+        Args:
+            max_retries: Retries after the first attempt (0 disables retrying)
+            base_delay: Backoff cap of the first retry in seconds
+            max_delay: Upper bound of any backoff in seconds
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def should_retry(self, status_code: int) -> bool:
+        return status_code in self.RETRYABLE_STATUSES
+    
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Backoff before retry number `attempt` (0-based), with full jitter.
+        
+        A Retry-After header from APNs takes precedence when it is longer.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.max_delay))
+            except ValueError:
+                pass
+        return delay
+
+
+class PayloadTemplate:
+    """
+    APNs payload compiled once into compact JSON bytes with substitution slots.
+    
+    A string value of the form "{{name}}" anywhere in the payload becomes a
+    slot. Rendering only JSON-encodes the slot values and joins them with the
+    pre-encoded fixed parts, so sending one campaign payload to many devices
+    does not re-serialise the whole payload for every push.
+    
+    Built-in per-recipient slots (see render_for): token, index and
+    messageId (a fresh UUID per push).
+    """
+    
+    MAX_PAYLOAD_SIZE = 4096  # APNs limit for regular remote notifications
+    SLOT_PATTERN = re.compile(r'^\{\{(\w+)\}\}$')
+    MARKER_PATTERN = re.compile(rb'"\\u0000(\d+)\\u0000"')
+    
+    # Maximum encoded size in bytes of each built-in slot value
+    BUILTIN_SLOT_SIZES = {"token": 162, "index": 20, "messageId": 38}
+    
+    def __init__(self, payload: Dict[str, Any], max_slot_sizes: Optional[Dict[str, int]] = None,
+                 max_size: int = MAX_PAYLOAD_SIZE):
+        """
+        Compile a payload.
+        
+        Args:
+            payload: APNs payload dictionary, optionally containing "{{name}}" slots
+            max_slot_sizes: Maximum encoded size in bytes of custom slot values (required for every custom slot)
+            max_size: Payload size limit in bytes
+            
+        Raises:
+            ValueError: If a custom slot has no maximum size, or the payload cannot fit
+                in max_size with the largest slot values
+        """
+        self.max_size = max_size
+        self.slot_names: List[str] = []
+        
+        def mark(value):
+            if isinstance(value, dict):
+                return {key: mark(item) for key, item in value.items()}
+            if isinstance(value, list):
+                return [mark(item) for item in value]
+            if isinstance(value, str):
+                match = self.SLOT_PATTERN.match(value)
+                if match:
+                    self.slot_names.append(match.group(1))
+                    return f"\x00{len(self.slot_names) - 1}\x00"
+            return value
+        
+        encoded = self._encode(mark(payload))
+        parts = self.MARKER_PATTERN.split(encoded)
+        # parts alternates fixed bytes and slot indexes: [fixed, slot, fixed, slot, ..., fixed]
+        self._fixed = parts[0::2]
+        self._slots = [self.slot_names[int(index)] for index in parts[1::2]]
+        self.static = encoded if not self._slots else None
+        self.fixed_size = sum(len(part) for part in self._fixed)
+        
+        sizes = dict(self.BUILTIN_SLOT_SIZES)
+        sizes.update(max_slot_sizes or {})
+        unsized = sorted(set(self._slots) - set(sizes))
+        if unsized:
+            raise ValueError(f"Payload slots without a maximum size: {', '.join(unsized)}")
+        worst_case = self.fixed_size + sum(sizes[name] for name in self._slots)
+        if worst_case > max_size:
+            raise ValueError(f"Payload can reach {worst_case} bytes, over the APNs limit of {max_size} bytes")
+    
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    
+    @staticmethod
+    def _encode_slot(value: Any) -> bytes:
+        # Fast paths for the usual slot values (IDs, tokens, counters)
+        if isinstance(value, str):
+            return encode_basestring(value).encode('utf-8')
+        if type(value) is int:
+            return str(value).encode('ascii')
+        return PayloadTemplate._encode(value)
+    
+    def render(self, values: Optional[Dict[str, Any]] = None) -> bytes:
+        """
+        Fill the slots and return the payload bytes.
+        
+        Raises:
+            KeyError: If a slot has no value
+            ValueError: If the rendered payload exceeds the size limit
+        """
+        if self.static is not None:
+            return self.static
+        encode = self._encode_slot
+        chunks = [self._fixed[0]]
+        for name, fixed in zip(self._slots, self._fixed[1:]):
+            chunks.append(encode(values[name]))
+            chunks.append(fixed)
+        body = b''.join(chunks)
+        if len(body) > self.max_size:
+            raise ValueError(f"Payload is {len(body)} bytes, over the APNs limit of {self.max_size} bytes")
+        return body
+    
+    def render_for(self, device_token: str, index: int = 0,
+                   values: Optional[Dict[str, Any]] = None) -> bytes:
+        """Render with the built-in per-recipient slots plus any custom values."""
+        if self.static is not None:
+            return self.static
+        slots = {"token": device_token, "index": index}
+        if "messageId" in self._slots:
+            slots["messageId"] = str(uuid.uuid4())
+        slots.update(values or {})
+        return self.render(slots)
+
+
+class IterablePayloadFactory:
+    """
+    Seeded generator of realistic Iterable push payloads.
+    
+    Payloads carry the "itbl" dictionary the SDK reads (campaignId,
+    templateId, messageId, isGhostPush, defaultAction, actionButtons,
+    attachment-url), mixed by weight across the kinds in DEFAULT_MIX. The
+    payload for a given index depends only on the seed and the index, so a
+    run can be reproduced exactly and workers can render payloads in any
+    order.
+    
+    Kinds:
+        alert: Plain alert that opens the app
+        deeplink: Default action opening a URL (sometimes the legacy root "url" key)
+        buttons: One to four action buttons, including text input and destructive ones
+        rich_media: mutable-content push with an image, GIF or video attachment-url
+        ghost: Silent InAppUpdate/UpdateEmbedded/InAppRemove push
+        proof: Proof push (campaignId 0, templateId set)
+        test: Test push (campaignId 0, templateId 0)
+        unicode: Emoji, CJK, RTL, combining characters and JSON escapes
+        max_size: Padded to exactly the APNs limit
+        oversize: One byte over the APNs limit (rejected before sending)
+    """
+    
+    DEFAULT_MIX = {
+        "alert": 30, "deeplink": 15, "buttons": 15, "rich_media": 15, "ghost": 10,
+        "proof": 3, "test": 2, "unicode": 5, "max_size": 5, "oversize": 0
+    }
+    
+    WORDS = ["sale", "new", "arrivals", "your", "cart", "is", "waiting", "only", "today", "free",
+             "shipping", "on", "orders", "back", "in", "stock", "don't", "miss", "out", "limited"]
+    UNICODE_SAMPLES = ["🎉🛒✨", "限时优惠", "تخفيضات كبيرة", "Ça va? Ñandú", "e\u0301a\u0300", "👩‍👩‍👧‍👦",
+                       "tab\there", "line\nbreak", "\"quoted\" \\ back\\slash", "\u202eRTL override"]
+    LINK_BASES = ["https://links.tsetester.com/a/click", "https://links.iterable.com/u/click",
+                  "tester://product", "https://tsetester.com/update/hi"]
+    ATTACHMENT_TYPES = [("png", "image"), ("jpg", "image"), ("gif", "image"), ("mp4", "video")]
+    CUSTOM_ACTIONS = ["handleFindCoffee", "addToCart", "snooze"]
+    SYSTEM_IMAGES = ["cart", "heart.fill", "bell.slash", "trash"]
+    SILENT_TYPES = ["InAppUpdate", "UpdateEmbedded", "InAppRemove"]
+    
+    def __init__(self, seed: int = 0, mix: Optional[Dict[str, float]] = None,
+                 max_size: int = PayloadTemplate.MAX_PAYLOAD_SIZE):
+        """
+        Args:
+            seed: Seed of the payload sequence
+            mix: Relative weight per kind (default: DEFAULT_MIX)
+            max_size: Payload size limit targeted by max_size and oversize
+        
+        Raises:
+            ValueError: If the mix names an unknown kind or has no positive weight
+        """
+        mix = dict(self.DEFAULT_MIX if mix is None else mix)
+        unknown = set(mix) - set(self.DEFAULT_MIX)
+        if unknown:
+            raise ValueError(f"Unknown payload kinds: {', '.join(sorted(unknown))}")
+        self.kinds = [kind for kind, weight in mix.items() if weight > 0]
+        if not self.kinds:
+            raise ValueError("Payload mix needs at least one kind with a positive weight")
+        weights = list(itertools.accumulate(mix[kind] for kind in self.kinds))
+        self._cumulative = [weight / weights[-1] for weight in weights]
+        self.seed = seed
+        self.max_size = max_size
+    
+    @classmethod
+    def parse_mix(cls, spec: str) -> Dict[str, float]:
+        """
+        Parse a mix such as "alert:5,buttons:2,oversize:1".
+        
+        Kinds that are not listed get no weight.
+        """
+        mix = {}
+        for item in spec.split(","):
+            kind, _, weight = item.strip().partition(":")
+            try:
+                mix[kind] = float(weight) if weight else 1.0
+            except ValueError:
+                raise ValueError(f"Invalid weight in payload mix item '{item}'")
+        return mix
+    
+    def generate(self, index: int) -> Tuple[str, Dict[str, Any]]:
+        """Return the kind and payload dictionary for a position in the sequence."""
+        rnd = random.Random(f"{self.seed}:{index}")
+        kind = self.kinds[min(bisect.bisect(self._cumulative, rnd.random()), len(self.kinds) - 1)]
+        return kind, getattr(self, f"_build_{kind}")(rnd)
+    
+    def stream(self, count: int, start: int = 0) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+        """Yield (index, kind, payload) for count payloads."""
+        for index in range(start, start + count):
+            kind, payload = self.generate(index)
+            yield index, kind, payload
+    
+    def render_for(self, device_token: str, index: int = 0,
+                   values: Optional[Dict[str, Any]] = None) -> bytes:
+        """Encode the payload at index; same signature as PayloadTemplate.render_for."""
+        return PayloadTemplate._encode(self.generate(index)[1])
+    
+    def write_jsonl(self, output_path: str, count: int) -> Dict[str, int]:
+        """
+        Write count payloads as JSON lines ('-' for stdout).
+        
+        Each line holds index, kind, size (encoded bytes) and payload.
+        
+        Returns:
+            Number of payloads per kind
+        """
+        counts: Dict[str, int] = {}
+        out = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8")
+        try:
+            for index, kind, payload in self.stream(count):
+                counts[kind] = counts.get(kind, 0) + 1
+                record = {"index": index, "kind": kind, "size": len(PayloadTemplate._encode(payload)),
+                          "payload": payload}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return counts
+    
+    # Payload builders
+    
+    def _text(self, rnd: random.Random, low: int, high: int) -> str:
+        text = " ".join(rnd.choice(self.WORDS) for _ in range(rnd.randint(low, high)))
+        return text[:1].upper() + text[1:]
+    
+    def _link(self, rnd: random.Random) -> str:
+        return f"{rnd.choice(self.LINK_BASES)}/{rnd.getrandbits(40):x}?campaign={rnd.randint(1, 999)}"
+    
+    def _itbl(self, rnd: random.Random, campaign_id: Optional[int] = None,
+              template_id: Optional[int] = None, ghost: bool = False) -> Dict[str, Any]:
+        return {
+            "campaignId": rnd.randint(100000, 9999999) if campaign_id is None else campaign_id,
+            "templateId": rnd.randint(100000, 9999999) if template_id is None else template_id,
+            "messageId": f"{rnd.getrandbits(128):032x}",
+            "isGhostPush": ghost
+        }
+    
+    def _alert(self, rnd: random.Random, **itbl) -> Dict[str, Any]:
+        payload = {
+            "aps": {
+                "alert": {"title": self._text(rnd, 1, 4), "body": self._text(rnd, 4, 20)},
+                "sound": "default"
+            },
+            "itbl": self._itbl(rnd, **itbl)
+        }
+        if rnd.random() < 0.3:
+            payload["aps"]["badge"] = rnd.randint(0, 99)
+        return payload
+    
+    def _action(self, rnd: random.Random) -> Dict[str, str]:
+        choice = rnd.random()
+        if choice < 0.6:
+            return {"type": "openUrl", "data": self._link(rnd)}
+        if choice < 0.8:
+            return {"type": rnd.choice(self.CUSTOM_ACTIONS), "data": self._text(rnd, 1, 3)}
+        return {"type": "", "data": ""}
+    
+    def _build_alert(self, rnd: random.Random) -> Dict[str, Any]:
+        return self._alert(rnd)
+    
+    def _build_deeplink(self, rnd: random.Random) -> Dict[str, Any]:
+        payload = self._alert(rnd)
+        link = self._link(rnd)
+        if rnd.random() < 0.2:
+            payload["url"] = link  # Legacy templates put the default action here
+        else:
+            payload["itbl"]["defaultAction"] = {"type": "openUrl", "data": link}
+        return payload
+    
+    def _build_buttons(self, rnd: random.Random) -> Dict[str, Any]:
+        payload = self._alert(rnd)
+        payload["aps"]["mutable-content"] = 1
+        buttons = []
+        for number in range(rnd.randint(1, 4)):
+            button_type = rnd.choices(["default", "destructive", "textInput"], [6, 2, 2])[0]
+            button = {
+                "identifier": f"button{number + 1}",
+                "title": self._text(rnd, 1, 3),
+                "buttonType": button_type,
+                "openApp": rnd.random() < 0.7,
+                "requiresUnlock": rnd.random() < 0.2,
+                "action": self._action(rnd)
+            }
+            if button_type == "textInput":
+                button["inputTitle"] = "Send"
+                button["inputPlaceholder"] = self._text(rnd, 2, 4)
+            if rnd.random() < 0.3:
+                button["actionIcon"] = {"iconType": "systemImage", "imageName": rnd.choice(self.SYSTEM_IMAGES)}
+            buttons.append(button)
+        payload["itbl"]["actionButtons"] = buttons
+        if rnd.random() < 0.5:
+            payload["itbl"]["defaultAction"] = self._action(rnd)
+        return payload
+    
+    def _build_rich_media(self, rnd: random.Random) -> Dict[str, Any]:
+        payload = self._alert(rnd)
+        payload["aps"]["mutable-content"] = 1
+        extension, folder = rnd.choice(self.ATTACHMENT_TYPES)
+        payload["itbl"]["attachment-url"] = (f"https://library.iterable.com/{rnd.randint(1000, 9999)}/{folder}/"
+                                             f"{rnd.getrandbits(128):032x}.{extension}")
+        return payload
+    
+    def _build_ghost(self, rnd: random.Random) -> Dict[str, Any]:
+        payload = {"aps": {"content-available": 1}, "itbl": self._itbl(rnd, ghost=True)}
+        payload["notificationType"] = rnd.choice(self.SILENT_TYPES)
+        if payload["notificationType"] == "InAppRemove":
+            payload["messageId"] = f"{rnd.getrandbits(128):032x}"
+        return payload
+    
+    def _build_proof(self, rnd: random.Random) -> Dict[str, Any]:
+        return self._alert(rnd, campaign_id=0)
+    
+    def _build_test(self, rnd: random.Random) -> Dict[str, Any]:
+        return self._alert(rnd, campaign_id=0, template_id=0)
+    
+    def _build_unicode(self, rnd: random.Random) -> Dict[str, Any]:
+        payload = self._build_deeplink(rnd)
+        alert = payload["aps"]["alert"]
+        alert["title"] = " ".join(rnd.sample(self.UNICODE_SAMPLES, 2))
+        alert["body"] = " ".join(rnd.sample(self.UNICODE_SAMPLES, 4))
+        return payload
+    
+    def _fill(self, rnd: random.Random, payload: Dict[str, Any], size: int) -> Dict[str, Any]:
+        # Pad the alert body so the encoded payload is exactly size bytes
+        alert = payload["aps"]["alert"]
+        alert["body"] = ""
+        budget = size - len(PayloadTemplate._encode(payload))
+        chunks = []
+        while budget > 0:
+            chunk = rnd.choice(self.WORDS + self.UNICODE_SAMPLES[:4]) + " "
+            cost = len(PayloadTemplate._encode(chunk)) - 2
+            if cost > budget:
+                chunk, cost = "x" * budget, budget
+            chunks.append(chunk)
+            budget -= cost
+        alert["body"] = "".join(chunks)
+        return payload
+    
+    def _build_max_size(self, rnd: random.Random) -> Dict[str, Any]:
+        return self._fill(rnd, self._build_buttons(rnd), self.max_size)
+    
+    def _build_oversize(self, rnd: random.Random) -> Dict[str, Any]:
+        return self._fill(rnd, self._build_buttons(rnd), self.max_size + 1)
+
+
+class InvalidTokenStore:
+    """
+    Persistent record of device tokens APNs rejected.
+    
+    Rows live in SQLite so they survive between runs; the tokens are also
+    kept in in-memory sets, so checking a token before sending is a single
+    hash lookup. DeviceTokenNotForTopic only applies to the topic (bundle ID)
+    it was reported for; the other reasons apply to every topic.
+    """
+    
+    # APNs reasons that mean the token will never be accepted (for the topic)
+    INVALID_REASONS = ("BadDeviceToken", "Unregistered", "DeviceTokenNotForTopic")
+    TOPIC_REASONS = ("DeviceTokenNotForTopic",)
+    
+    DEFAULT_PATH = Path.home() / ".cache" / "iterable-push" / "invalid_tokens.db"
+    
+    def __init__(self, path: Union[str, Path] = DEFAULT_PATH):
+        """
+        Open (or create) the store.
+        
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS invalid_tokens (
+                token TEXT NOT NULL,
+                topic TEXT NOT NULL DEFAULT '',
+                reason TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                apns_timestamp INTEGER,
+                recorded_at REAL NOT NULL,
+                PRIMARY KEY (token, topic)
+            )""")
+        self._db.commit()
+        self._tokens = set()
+        self._topic_tokens = set()
+        for token, topic in self._db.execute("SELECT token, topic FROM invalid_tokens"):
+            if topic:
+                self._topic_tokens.add((token, topic))
+            else:
+                self._tokens.add(token)
+    
+    def __len__(self) -> int:
+        return len(self._tokens) + len(self._topic_tokens)
+    
+    def is_invalid(self, device_token: str, topic: str = "") -> bool:
+        """Check whether APNs already rejected the token (for this topic)."""
+        return device_token in self._tokens or (device_token, topic) in self._topic_tokens
+    
+    def record(self, device_token: str, reason: str, status: int, topic: str = "",
+               apns_timestamp: Optional[int] = None):
+        """
+        Remember a rejected token.
+        
+        Args:
+            device_token: Rejected device token
+            reason: APNs reason (one of INVALID_REASONS)
+            status: HTTP status of the rejection
+            topic: Bundle ID the push was sent to
+            apns_timestamp: For 410 Unregistered, when APNs last saw the token valid (ms since epoch)
+        """
+        topic = topic if reason in self.TOPIC_REASONS else ""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO invalid_tokens VALUES (?, ?, ?, ?, ?, ?)",
+                (device_token, topic, reason, status, apns_timestamp, time.time()))
+            self._db.commit()
+            if topic:
+                self._topic_tokens.add((device_token, topic))
+            else:
+                self._tokens.add(device_token)
+    
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Yield every rejected token, oldest first."""
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT token, topic, reason, status, apns_timestamp, recorded_at "
+                "FROM invalid_tokens ORDER BY recorded_at, token")
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        for row in rows:
+            yield dict(zip(columns, row))
+    
+    def export(self, output_path: str) -> int:
+        """
+        Write the rejected tokens as CSV (or JSON for .json paths; '-' for stdout).
+        
+        Returns:
+            Number of tokens exported
+        """
+        rows = list(self.rows())
+        out = sys.stdout if output_path == "-" else open(output_path, "w", newline="")
+        try:
+            if output_path.endswith(".json"):
+                json.dump(rows, out, indent=2)
+                out.write("\n")
+            else:
+                writer = csv.DictWriter(out, fieldnames=["token", "topic", "reason", "status",
+                                                         "apns_timestamp", "recorded_at"])
+                writer.writeheader()
+                writer.writerows(rows)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return len(rows)
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class LatencyHistogram:
+    """
+    Log-linear (HDR-style) histogram of durations in microseconds.
+    
+    Values below 2 * SUB_BUCKETS are counted exactly; above that each power
+    of two is split into SUB_BUCKETS linear buckets, so every recorded value
+    is within 1/SUB_BUCKETS (about 3%) of its bucket at any magnitude while
+    memory stays bounded by the range rather than the number of samples.
+    """
+    
+    SUB_BUCKET_BITS = 5
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+    
+    @classmethod
+    def bucket_of(cls, value: int) -> int:
+        """Lowest value of the bucket holding `value`."""
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS - 1
+        if shift <= 0:
+            return value
+        return (value >> shift) << shift
+    
+    def record(self, seconds: float):
+        value = max(0, int(seconds * 1_000_000))
+        bucket = self.bucket_of(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+    
+    def merge(self, other: "LatencyHistogram"):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+    
+    def percentile(self, percent: float) -> int:
+        """Value (microseconds) at or below which `percent` of the samples fall."""
+        if not self.count:
+            return 0
+        rank = max(1, int(round(percent / 100.0 * self.count)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                # Report the bucket's highest value, capped at the observed maximum
+                shift = bucket.bit_length() - self.SUB_BUCKET_BITS - 1
+                return min(self.max, bucket + (1 << shift) - 1 if shift > 0 else bucket)
+        return self.max
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_us": self.total // self.count if self.count else 0,
+            "p50_us": self.percentile(50),
+            "p90_us": self.percentile(90),
+            "p99_us": self.percentile(99),
+            "max_us": self.max
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.summary()
+        data["buckets"] = {str(bucket): count for bucket, count in sorted(self.counts.items())}
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = {int(bucket): count for bucket, count in data["buckets"].items()}
+        histogram.count = data["count"]
+        histogram.total = data["mean_us"] * data["count"]
+        histogram.max = data["max_us"]
+        return histogram
+
+
+class LatencyRecorder:
+    """
+    Per-request phase timings aggregated by environment, status and phase.
+    
+    Timings come from the httpx "trace" extension, so connection set-up is
+    only measured for requests that actually opened a connection:
+    
+        acquire           call start until the request headers are sent (pool wait, connect, TLS)
+        connect           TCP connect (new connections only)
+        tls               TLS handshake (new connections only)
+        write             sending request headers and body
+        response_headers  body sent until the response headers arrive
+        total             the whole request, including reading the response
+    """
+    
+    PHASES = ("acquire", "connect", "tls", "write", "response_headers", "total")
+    
+    def __init__(self):
+        self.histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reporter = None
+    
+    def start_request(self) -> "RequestTimer":
+        return RequestTimer(self)
+    
+    def record(self, environment: str, status: str, timings: Dict[str, float]):
+        key = f"{environment}/{status}"
+        with self._lock:
+            phases = self.histograms.setdefault(key, {})
+            for phase, seconds in timings.items():
+                phases.setdefault(phase, LatencyHistogram()).record(seconds)
+    
+    def merge(self, data: Dict[str, Dict[str, Dict[str, Any]]]):
+        """Add histograms previously exported with to_dict()."""
+        with self._lock:
+            for key, phases in data.items():
+                target = self.histograms.setdefault(key, {})
+                for phase, histogram in phases.items():
+                    target.setdefault(phase, LatencyHistogram()).merge(LatencyHistogram.from_dict(histogram))
+    
+    def to_dict(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            return {key: {phase: histogram.to_dict() for phase, histogram in phases.items()}
+                    for key, phases in sorted(self.histograms.items())}
+    
+    def format_summary(self) -> str:
+        lines = [f"{'environment/status':<24} {'phase':<17} {'count':>8} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+        with self._lock:
+            for key, phases in sorted(self.histograms.items()):
+                for phase in self.PHASES:
+                    histogram = phases.get(phase)
+                    if not histogram:
+                        continue
+                    stats = histogram.summary()
+                    lines.append(f"{key:<24} {phase:<17} {stats['count']:>8} "
+                                 + " ".join(f"{stats[name] / 1000:>7.1f}ms" for name in
+                                            ("p50_us", "p90_us", "p99_us", "max_us")))
+        return "\n".join(lines)
+    
+    def report(self, json_path: Optional[str] = None):
+        """Print the summary and optionally dump the histograms as JSON."""
+        self.stop_periodic()
+        if not self.histograms:
+            return
+        print("⏱️  Push latency")
+        print(self.format_summary())
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+            print(f"💾 Latency histograms written to {json_path}")
+    
+    def start_periodic(self, interval: float):
+        """Print the summary every `interval` seconds until stop_periodic()."""
+        def run():
+            while not self._stop.wait(interval):
+                print(self.format_summary(), flush=True)
+        self._reporter = threading.Thread(target=run, daemon=True)
+        self._reporter.start()
+    
+    def stop_periodic(self):
+        if self._reporter:
+            self._stop.set()
+            self._reporter.join()
+            self._reporter = None
+
+
+class RequestTimer:
+    """httpx trace callback collecting the event times of one request."""
+    
+    def __init__(self, recorder: LatencyRecorder):
+        self.recorder = recorder
+        self.started = time.perf_counter()
+        self.events: Dict[str, float] = {}
+    
+    def __call__(self, event_name: str, info: Dict[str, Any]):
+        # "http2.*" and "http11.*" (if HTTP/2 was not negotiated) report the same phases
+        if event_name.startswith(("http2.", "http11.")):
+            event_name = "http." + event_name.split(".", 1)[1]
+        self.events[event_name] = time.perf_counter()
+    
+    def _span(self, start: str, end: str) -> Optional[float]:
+        if start in self.events and end in self.events:
+            return self.events[end] - self.events[start]
+        return None
+    
+    def finish(self, environment: str, status: str):
+        ended = time.perf_counter()
+        events = self.events
+        timings = {"total": ended - self.started}
+        if "http.send_request_headers.started" in events:
+            timings["acquire"] = events["http.send_request_headers.started"] - self.started
+        spans = {
+            "connect": ("connection.connect_tcp.started", "connection.connect_tcp.complete"),
+            "tls": ("connection.start_tls.started", "connection.start_tls.complete"),
+            "write": ("http.send_request_headers.started", "http.send_request_body.complete"),
+            "response_headers": ("http.send_request_body.complete", "http.receive_response_headers.complete")
+        }
+        for phase, (start, end) in spans.items():
+            span = self._span(start, end)
+            if span is not None:
+                timings[phase] = span
+        self.recorder.record(environment, status, timings)
+
+
+class ResultSink:
+    """
+    Append-only JSONL log with one record per push outcome.
+    
+    Records are buffered and written in batches (one write and flush per
+    batch, or sooner once flush_interval has passed), so logging does not
+    add a syscall to every push. When the file grows past max_bytes it is
+    renamed to the next free "<stem>.NNNN<suffix>" segment and a new file is
+    started; nothing is ever deleted. Device tokens are stored as a short
+    SHA-256 hash.
+    
+    Record fields: outcome (sent, failed, rejected, skipped or error),
+    apns_id, token_hash, topic, priority, push_type, status, reason,
+    apns_timestamp, attempts, size, started_at and finished_at (Unix
+    seconds), latency_ms (last attempt) and elapsed_ms (including retries).
+    """
+    
+    OUTCOMES = ("sent", "failed", "rejected", "skipped", "error")
+    
+    def __init__(self, path: Union[str, Path], batch_size: int = 256, flush_interval: float = 1.0,
+                 max_bytes: int = 100 * 1024 * 1024):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._buffer: List[bytes] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def token_hash(device_token: str) -> str:
+        return hashlib.sha256(device_token.encode()).hexdigest()[:16]
+    
+    @staticmethod
+    def shard_path(path: Union[str, Path], shard: int) -> Path:
+        """Per-process log file for a shard of a sharded run."""
+        path = Path(path)
+        return path.with_name(f"{path.stem}.shard{shard}{path.suffix}")
+    
+    def record(self, **fields):
+        line = (json.dumps(fields, separators=(',', ':')) + "\n").encode('utf-8')
+        with self._lock:
+            self._buffer.append(line)
+            if (len(self._buffer) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+    
+    def flush(self):
+        with self._lock:
+            self._flush()
+    
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer or self._file is None:
+            return
+        self._file.write(b"".join(self._buffer))
+        self._file.flush()
+        self._buffer = []
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+    
+    def _rotate(self):
+        self._file.close()
+        number = 1
+        while True:
+            segment = self.path.with_name(f"{self.path.stem}.{number:04d}{self.path.suffix}")
+            if not segment.exists():
+                break
+            number += 1
+        self.path.rename(segment)
+        self._file = open(self.path, "ab")
+    
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    @staticmethod
+    def segments(path: Union[str, Path]) -> List[Path]:
+        """A log file with its rotated segments and shard files, oldest segments first."""
+        path = Path(path)
+        related = sorted(path.parent.glob(f"{glob.escape(path.stem)}.*{glob.escape(path.suffix)}"))
+        return related + ([path] if path.exists() else [])
+    
+    @classmethod
+    def summarize(cls, paths: Iterable[Union[str, Path]]) -> Dict[str, Any]:
+        """
+        Roll up result logs (each with its rotated segments and shard files).
+        
+        Returns:
+            Counts by outcome, status/reason, topic and push type; latency
+            percentiles of sent and failed pushes; throughput; retries
+        """
+        files = []
+        for path in paths:
+            files.extend(segment for segment in cls.segments(path) if segment not in files)
+        outcomes = {outcome: 0 for outcome in cls.OUTCOMES}
+        statuses: Dict[str, int] = {}
+        topics: Dict[str, int] = {}
+        push_types: Dict[str, int] = {}
+        latency, elapsed = LatencyHistogram(), LatencyHistogram()
+        tokens = set()
+        records = attempts = malformed = 0
+        first_start = last_finish = None
+        for file in files:
+            with open(file, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        malformed += 1  # e.g. a run killed mid-write
+                        continue
+                    records += 1
+                    outcome = record.get("outcome")
+                    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                    key = f"{record.get('status') or '-'} {record.get('reason') or ''}".rstrip()
+                    statuses[key] = statuses.get(key, 0) + 1
+                    topic = record.get("topic") or "-"
+                    topics[topic] = topics.get(topic, 0) + 1
+                    push_type = record.get("push_type") or "-"
+                    push_types[push_type] = push_types.get(push_type, 0) + 1
+                    tokens.add(record.get("token_hash"))
+                    attempts += record.get("attempts") or 0
+                    if outcome in ("sent", "failed"):
+                        if record.get("latency_ms") is not None:
+                            latency.record(record["latency_ms"] / 1000)
+                        if record.get("elapsed_ms") is not None:
+                            elapsed.record(record["elapsed_ms"] / 1000)
+                    if record.get("started_at") is not None:
+                        first_start = min(first_start or record["started_at"], record["started_at"])
+                    if record.get("finished_at") is not None:
+                        last_finish = max(last_finish or record["finished_at"], record["finished_at"])
+        duration = (last_finish - first_start) if first_start is not None and last_finish is not None else 0.0
+        return {
+            "files": [str(file) for file in files],
+            "records": records,
+            "malformed": malformed,
+            "unique_tokens": len(tokens),
+            "outcomes": outcomes,
+            "statuses": dict(sorted(statuses.items(), key=lambda item: -item[1])),
+            "topics": topics,
+            "push_types": push_types,
+            "attempts": attempts,
+            "retries": max(0, attempts - outcomes["sent"] - outcomes["failed"]),
+            "duration": duration,
+            "rate": outcomes["sent"] / duration if duration > 0 else 0.0,
+            "latency": latency.summary(),
+            "elapsed": elapsed.summary()
+        }
+    
+    @staticmethod
+    def format_summary(summary: Dict[str, Any]) -> str:
+        lines = [f"📁 {summary['records']} records from {len(summary['files'])} file(s), "
+                 f"{summary['unique_tokens']} devices, {summary['malformed']} malformed lines",
+                 "📊 " + ", ".join(f"{count} {outcome}" for outcome, count in summary["outcomes"].items()),
+                 f"🚀 {summary['rate']:.1f} sent/s over {summary['duration']:.2f}s, {summary['retries']} retries"]
+        for name, label in (("latency", "last attempt"), ("elapsed", "with retries")):
+            stats = summary[name]
+            if stats["count"]:
+                lines.append(f"⏱️  {label:<13} " + "  ".join(
+                    f"{key[:-3]} {stats[key] / 1000:.1f}ms" for key in ("p50_us", "p90_us", "p99_us", "max_us")))
+        lines.append("📋 status/reason")
+        lines.extend(f"   {key:<32} {count:>8}" for key, count in summary["statuses"].items())
+        for name in ("topics", "push_types"):
+            lines.append(f"🏷️  {name}: " + ", ".join(f"{key} {count}" for key, count in summary[name].items()))
+        return "\n".join(lines)
+
+
+def read_device_tokens(token_file: str) -> Iterator[str]:
+    """Stream device tokens from a file, one per line ('#' starts a comment)."""
+    with open(token_file, 'r') as f:
+        for line in f:
+            token = line.split('#', 1)[0].strip()
+            if token:
+                yield token
+
+
+def shard_of(device_token: str, shards: int) -> int:
+    """Stable shard index of a device token (same token, same shard, in every process)."""
+    return zlib.crc32(device_token.lower().encode("ascii", "replace")) % shards
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """
+    Client SSLContext that resumes TLS sessions on new connections.
+    
+    The last session seen for each server name is offered when the next
+    connection to it is wrapped, so reconnects after a GOAWAY or a dropped
+    connection (and connections opened by other threads) can skip the full
+    certificate handshake. Sessions are saved again when a socket closes,
+    because TLS 1.3 tickets only arrive after the handshake.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.sslsocket_class = _SessionSavingSSLSocket
+        self._sessions: Dict[Optional[str], ssl.SSLSession] = {}
+        self.handshakes = 0
+        self.resumed = 0
+    
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True,
+                    suppress_ragged_eofs=True, server_hostname=None, session=None):
+        if session is None and not server_side:
+            session = self._sessions.get(server_hostname)
+        # A session the server no longer accepts just falls back to a full handshake
+        wrapped = super().wrap_socket(sock, server_side, do_handshake_on_connect,
+                                      suppress_ragged_eofs, server_hostname, session)
+        self.handshakes += 1
+        if wrapped.session_reused:
+            self.resumed += 1
+        self.save_session(wrapped)
+        return wrapped
+    
+    def save_session(self, sock: ssl.SSLSocket):
+        """Remember the socket's session for its server name if it can be resumed."""
+        try:
+            session = sock.session
+        except (ssl.SSLError, ValueError, OSError):
+            return
+        if session is not None and (session.has_ticket or session.id):
+            self._sessions[sock.server_hostname] = session
+
+
+class _SessionSavingSSLSocket(ssl.SSLSocket):
+    def close(self):
+        if isinstance(self.context, ResumingSSLContext) and self.fileno() != -1:
+            self.context.save_session(self)
+        super().close()
+
+
 class APNsPushSender:
     """Direct APNs push notification sender using httpx with certificate authentication."""
     
@@ -39,7 +1114,11 @@ class APNsPushSender:
     PRODUCTION_URL = "https://api.push.apple.com:443"
     SANDBOX_URL = "https://api.sandbox.push.apple.com:443"
     
-    def __init__(self, cert_path: str, sandbox: bool = True, cert_password: str = None):
+    def __init__(self, cert_path: str, sandbox: bool = True, cert_password: str = None,
+                 rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None,
+                 quiet: bool = False, invalid_tokens: Optional[InvalidTokenStore] = None,
+                 latency: Optional[LatencyRecorder] = None, base_url: Optional[str] = None,
+                 ca_cert: Optional[str] = None, results: Optional[ResultSink] = None):
         """
         Initialize APNs client.
         
@@ -47,82 +1126,136 @@ class APNsPushSender:
             cert_path: Path to .pem or .p12 certificate file
             sandbox: Use sandbox environment (default: True)
             cert_password: Password for P12 certificate (None for no password)
+            rate_limiter: Pacing applied before every attempt (None for no pacing)
+            retry_policy: Backoff for 429/5xx responses and dropped connections (default: RetryPolicy())
+            quiet: Only report failures (for bulk sends)
+            invalid_tokens: Store of tokens APNs rejected; they are skipped and new rejections recorded
+            latency: Recorder for per-request phase timings (None to skip tracing)
+            base_url: APNs endpoint override, e.g. a local apns_stub.py (default: Apple's endpoint)
+            ca_cert: CA bundle to verify the server with instead of the system roots
+            results: JSONL log receiving one record per push outcome
         """
         self.cert_path = Path(cert_path)
         self.sandbox = sandbox
         self.environment = "sandbox" if sandbox else "production"
-        self.base_url = self.SANDBOX_URL if sandbox else self.PRODUCTION_URL
+        self.base_url = (base_url or (self.SANDBOX_URL if sandbox else self.PRODUCTION_URL)).rstrip("/")
+        self.ca_cert = ca_cert
         self.cert_password = cert_password
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.quiet = quiet
+        self.invalid_tokens = invalid_tokens
+        self.latency = latency
+        self.results = results
+        self.stats = {"sent": 0, "failed": 0, "retries": 0, "throttled": 0, "skipped": 0}
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self._clients = []
+        self._client_lock = threading.Lock()
         
         if not self.cert_path.exists():
             raise FileNotFoundError(f"Certificate file not found: {cert_path}")
         
-        # Prepare certificate - store temp files for P12
-        self.temp_cert_file = None
-        self.temp_key_file = None
-        if self.cert_path.suffix.lower() == '.p12':
-            self._prepare_p12_certificate()
+        # One TLS context (client certificate, CA roots, session cache) shared by every connection
+        self.ssl_context = self._create_ssl_context()
         print(f"✅ APNs client initialized for {self.environment}")
     
-    def _prepare_p12_certificate(self):
-        """Prepare P12 certificate by converting to temporary PEM files."""
+    def _create_ssl_context(self) -> ResumingSSLContext:
+        """Build the TLS context once, loading the client certificate without writing a plaintext key to disk."""
+        context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.minimum_version = ssl.TLSVersion.TLSv1_2
+        context.load_verify_locations(cafile=self.ca_cert or certifi.where())
+        if self.cert_path.suffix.lower() == '.p12':
+            self._load_p12_certificate(context)
+        else:
+            context.load_cert_chain(str(self.cert_path), password=self.cert_password or None)
+        return context
+    
+    def _load_p12_certificate(self, context: ssl.SSLContext):
+        """
+        Load a P12 certificate into the TLS context.
+        
+        OpenSSL only loads certificate chains from files, so the PEM goes to
+        an anonymous in-memory file (memfd) where the platform has one.
+        Elsewhere it goes to a private temporary file with the key encrypted
+        under a one-off random password, removed as soon as it is loaded.
+        """
         try:
-            # Handle P12 certificate - convert to PEM
             # Use provided password or assume no password
-            if self.cert_password is not None:
-                password = self.cert_password.encode() if self.cert_password else None
-            else:
-                password = None  # Assume no password if not provided
-            
-            # Load P12 file
+            password = self.cert_password.encode() if self.cert_password else None
             with open(self.cert_path, 'rb') as f:
                 p12_data = f.read()
             
             private_key, certificate, additional_certificates = pkcs12.load_key_and_certificates(
                 p12_data, password
             )
+            chain = b"".join(cert.public_bytes(serialization.Encoding.PEM)
+                             for cert in [certificate] + list(additional_certificates or []))
             
-            # Create temporary PEM files
-            cert_file = tempfile.NamedTemporaryFile(mode='w', suffix='.pem', delete=False)
-            key_file = tempfile.NamedTemporaryFile(mode='w', suffix='.pem', delete=False)
-            
-            # Write certificate
-            cert_pem = certificate.public_bytes(serialization.Encoding.PEM).decode()
-            cert_file.write(cert_pem)
-            cert_file.close()
+            if hasattr(os, "memfd_create"):
+                key_pem = private_key.private_bytes(
+                    encoding=serialization.Encoding.PEM,
+                    format=serialization.PrivateFormat.PKCS8,
+                    encryption_algorithm=serialization.NoEncryption()
+                )
+                fd = os.memfd_create("apns-client-cert", getattr(os, "MFD_CLOEXEC", 0))
+                try:
+                    os.write(fd, chain + key_pem)
+                    context.load_cert_chain(f"/proc/self/fd/{fd}")
+                finally:
+                    os.close(fd)
+                return
             
-            # Write private key
+            ephemeral_password = secrets.token_bytes(32)
             key_pem = private_key.private_bytes(
                 encoding=serialization.Encoding.PEM,
                 format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption()
-            ).decode()
-            key_file.write(key_pem)
-            key_file.close()
-            
-            # Store temp file paths
-            self.temp_cert_file = cert_file.name
-            self.temp_key_file = key_file.name
+                encryption_algorithm=serialization.BestAvailableEncryption(ephemeral_password)
+            )
+            fd, path = tempfile.mkstemp(suffix='.pem')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(chain + key_pem)
+                context.load_cert_chain(path, password=ephemeral_password)
+            finally:
+                os.unlink(path)
             
         except Exception as e:
             raise Exception(f"Failed to prepare P12 certificate: {e}")
     
-    def _get_temp_pem_files(self):
-        """Get temporary PEM file paths for P12 certificates."""
-        return self.temp_cert_file, self.temp_key_file
+    def _get_client(self) -> httpx.Client:
+        """
+        Get this thread's persistent HTTP/2 client, creating it on first use.
+        
+        Each sending thread owns its connection: httpcore's synchronous HTTP/2
+        connection does not serialise stream-ID allocation and header encoding
+        across threads, and sharing one leads to PROTOCOL_ERROR GOAWAYs.
+        """
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = httpx.Client(http2=True, timeout=30.0, verify=self.ssl_context)
+            with self._client_lock:
+                self._clients.append(client)
+            self._local.client = client
+        return client
     
-    def __del__(self):
-        """Clean up temporary files."""
-        if self.temp_cert_file and Path(self.temp_cert_file).exists():
-            try:
-                Path(self.temp_cert_file).unlink()
-            except:
-                pass
-        if self.temp_key_file and Path(self.temp_key_file).exists():
-            try:
-                Path(self.temp_key_file).unlink()
-            except:
-                pass
+    def close(self):
+        """Close the HTTP/2 connections and the invalid-token store."""
+        with self._client_lock:
+            for client in self._clients:
+                client.close()
+            self._clients = []
+            self._local = threading.local()
+        if self.invalid_tokens is not None:
+            self.invalid_tokens.close()
+            self.invalid_tokens = None
+        if self.results is not None:
+            self.results.close()
+            self.results = None
+    
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
     
     def create_payload(self, message: str, title: str = "Test Push", 
                       badge: Optional[int] = None, sound: str = "default",
@@ -158,24 +1291,43 @@ class APNsPushSender:
             
         return payload
     
-    def send_push(self, device_token: str, payload: Dict[str, Any], 
+    def send_push(self, device_token: str, payload: Union[Dict[str, Any], bytes], 
                   bundle_id: str = "com.sumeru.IterableSDK-Integration-Tester",
-                  priority: int = 10, expiration: Optional[int] = None) -> bool:
+                  priority: int = 10, expiration: Optional[int] = None,
+                  apns_id: Optional[str] = None, push_type: Optional[str] = None) -> bool:
         """
         Send push notification to device.
         
+        429 and 5xx responses and dropped connections are retried with
+        jittered exponential backoff. Every attempt carries the same apns-id,
+        so APNs can recognise a retry of a push it already accepted.
+        
         Args:
             device_token: Device token (64, 128, or 160 hex characters)
-            payload: APNs payload dictionary
+            payload: APNs payload dictionary, or pre-encoded JSON bytes (see PayloadTemplate)
             bundle_id: App bundle identifier
             priority: Notification priority (5=low, 10=high)
             expiration: Expiration timestamp (None=no expiration)
+            apns_id: Notification ID (default: a new UUID)
+            push_type: apns-push-type header, e.g. alert or background (None to omit)
             
         Returns:
             True if successful, False otherwise
         """
+        # Generate unique message ID (UUID format works best with APNs), kept across retries
+        apns_id = apns_id or str(uuid.uuid4())
+        result = {"apns_id": apns_id, "topic": bundle_id, "priority": priority, "push_type": push_type}
+        
         # Validate device token
         if not self._validate_device_token(device_token):
+            self._count("failed")
+            self._record_result(device_token, result, "rejected", reason="BadDeviceTokenFormat")
+            return False
+        
+        if self.invalid_tokens is not None and self.invalid_tokens.is_invalid(device_token, bundle_id):
+            print(f"⛔ Skipping {device_token[:8]}...{device_token[-8:]}: previously rejected by APNs")
+            self._count("skipped")
+            self._record_result(device_token, result, "skipped", reason="KnownInvalidToken")
             return False
         
         # Prepare headers
@@ -187,52 +1339,227 @@ class APNsPushSender:
         
         if expiration:
             headers["apns-expiration"] = str(expiration)
-        
-        # Generate unique message ID (UUID format works best with APNs)
-        import uuid
-        apns_id = str(uuid.uuid4())
+        if push_type:
+            headers["apns-push-type"] = push_type
         headers["apns-id"] = apns_id
         
         url = f"{self.base_url}/3/device/{device_token}"
         
+        # Serialise once; retries resend the same bytes
+        body = payload if isinstance(payload, bytes) else PayloadTemplate._encode(payload)
+        result["size"] = len(body)
+        if len(body) > PayloadTemplate.MAX_PAYLOAD_SIZE:
+            print(f"❌ Payload is {len(body)} bytes, over the APNs limit of {PayloadTemplate.MAX_PAYLOAD_SIZE} bytes")
+            self._count("failed")
+            self._record_result(device_token, result, "rejected", reason="PayloadTooLarge")
+            return False
+        
         try:
-            print(f"🚀 Sending push to {self.environment} APNs...")
-            print(f"📱 Device Token: {device_token[:8]}...{device_token[-8:]}")
-            print(f"📦 Bundle ID: {bundle_id}")
-            
-            # Extract message for display
-            if "aps" in payload and "alert" in payload["aps"]:
-                alert = payload["aps"]["alert"]
-                if isinstance(alert, dict):
-                    message = alert.get("body", "N/A")
+            if not self.quiet:
+                print(f"🚀 Sending push to {self.environment} APNs...")
+                print(f"📱 Device Token: {device_token[:8]}...{device_token[-8:]}")
+                print(f"📦 Bundle ID: {bundle_id}")
+                
+                # Extract message for display
+                if isinstance(payload, bytes):
+                    message = f"Pre-encoded payload ({len(body)} bytes)"
+                elif "aps" in payload and "alert" in payload["aps"]:
+                    alert = payload["aps"]["alert"]
+                    if isinstance(alert, dict):
+                        message = alert.get("body", "N/A")
+                    else:
+                        message = str(alert)
                 else:
-                    message = str(alert)
-            else:
-                message = "Silent push"
-            print(f"💬 Message: {message}")
-            print(f"🆔 APNs ID: {apns_id}")
-            
-            # Send HTTPS request with client certificate
-            # Use the certificate files directly (convert P12 to temp PEM if needed)
-            if self.cert_path.suffix.lower() == '.p12':
-                cert_file, key_file = self._get_temp_pem_files()
-                cert = (cert_file, key_file)
-            else:
-                cert = str(self.cert_path)
+                    message = "Silent push"
+                print(f"💬 Message: {message}")
+                print(f"🆔 APNs ID: {apns_id}")
             
-            with httpx.Client(cert=cert, http2=True, timeout=30.0, verify=True) as client:
-                response = client.post(
-                    url,
-                    headers=headers,
-                    json=payload
-                )
+            client = self._get_client()
+            attempt = 0
+            result["started_at"] = time.time()
+            started = time.monotonic()
+            while True:
+                if self.rate_limiter:
+                    self.rate_limiter.acquire(device_token)
+                
+                # Send HTTPS request with client certificate over the persistent connection
+                response, error = None, None
+                timer = self.latency.start_request() if self.latency else None
+                request_started = time.monotonic()
+                try:
+                    response = client.post(
+                        url,
+                        headers=headers,
+                        content=body,
+                        extensions={"trace": timer} if timer else None
+                    )
+                except httpx.TransportError as e:
+                    error = e
+                result["latency_ms"] = round((time.monotonic() - request_started) * 1000, 3)
+                result["attempts"] = attempt + 1
+                if timer:
+                    timer.finish(self.environment, str(response.status_code) if response is not None else "error")
+                
+                if response is not None and not self.retry_policy.should_retry(response.status_code):
+                    if response.status_code == 200 and self.rate_limiter:
+                        self.rate_limiter.recover()
+                    success = self._handle_response(response, apns_id, device_token, bundle_id)
+                    self._count("sent" if success else "failed")
+                    self._record_result(device_token, result, "sent" if success else "failed",
+                                        response=response, started=started)
+                    return success
+                
+                if response is not None and response.status_code == 429:
+                    self._count("throttled")
+                    if self.rate_limiter:
+                        self.rate_limiter.throttle()
+                
+                if attempt >= self.retry_policy.max_retries:
+                    break
+                
+                delay = self.retry_policy.delay(
+                    attempt, response.headers.get("retry-after") if response is not None else None)
+                attempt += 1
+                self._count("retries")
+                if not self.quiet:
+                    cause = f"status {response.status_code}" if response is not None else f"{type(error).__name__}"
+                    print(f"⏳ Retry {attempt}/{self.retry_policy.max_retries} after {cause} in {delay:.2f}s")
+                time.sleep(delay)
             
-            return self._handle_response(response, apns_id)
+            self._count("failed")
+            if response is not None:
+                self._record_result(device_token, result, "failed", response=response, started=started)
+                return self._handle_response(response, apns_id, device_token, bundle_id)
+            print(f"❌ Error sending push: {error}")
+            self._record_result(device_token, result, "error", reason=type(error).__name__, started=started)
+            return False
                 
         except Exception as e:
+            self._count("failed")
             print(f"❌ Error sending push: {e}")
+            self._record_result(device_token, result, "error", reason=type(e).__name__)
             return False
     
+    def _record_result(self, device_token: str, result: Dict[str, Any], outcome: str,
+                       reason: Optional[str] = None, response: Optional[httpx.Response] = None,
+                       started: Optional[float] = None):
+        """Append the outcome of a push to the result log, if there is one."""
+        if self.results is None:
+            return
+        status, apns_timestamp = None, None
+        if response is not None:
+            status = response.status_code
+            if status != 200:
+                try:
+                    error_data = response.json()
+                    reason = error_data.get("reason")
+                    apns_timestamp = error_data.get("timestamp")
+                except ValueError:
+                    pass
+        finished = time.time()
+        self.results.record(
+            outcome=outcome,
+            apns_id=result["apns_id"],
+            token_hash=ResultSink.token_hash(device_token),
+            topic=result["topic"],
+            priority=result["priority"],
+            push_type=result["push_type"],
+            environment=self.environment,
+            status=status,
+            reason=reason,
+            apns_timestamp=apns_timestamp,
+            attempts=result.get("attempts", 0),
+            size=result.get("size"),
+            started_at=result.get("started_at", finished),
+            finished_at=finished,
+            latency_ms=result.get("latency_ms"),
+            elapsed_ms=round((time.monotonic() - started) * 1000, 3) if started is not None else None
+        )
+    
+    def send_bulk(self, device_tokens: Iterable[str],
+                  payload: Union[Dict[str, Any], PayloadTemplate, IterablePayloadFactory],
+                  bundle_id: str = "com.sumeru.IterableSDK-Integration-Tester",
+                  priority: int = 10, expiration: Optional[int] = None,
+                  workers: int = 8, queue_size: int = 100,
+                  push_type: Optional[str] = None, indexed: bool = False) -> Dict[str, Any]:
+        """
+        Send one payload to many devices over persistent HTTP/2 connections (one per worker).
+        
+        Tokens are fed to worker threads through a bounded queue. The loop
+        blocks while the queue is full, so rate limiting and backoff in the
+        workers slow down reading the tokens instead of piling them up.
+        The payload is compiled once; each push only fills its slots. With a
+        payload factory, the Nth token gets the factory's Nth payload.
+        Tokens in the invalid-token store are dropped before queueing.
+        
+        Args:
+            device_tokens: Device tokens, consumed lazily
+            payload: APNs payload dictionary, compiled template or payload factory
+            bundle_id: App bundle identifier
+            priority: Notification priority (5=low, 10=high)
+            expiration: Expiration timestamp (None=no expiration)
+            workers: Concurrent pushes (HTTP/2 streams)
+            queue_size: Maximum tokens waiting for a worker
+            push_type: apns-push-type header (None to omit)
+            indexed: device_tokens are (index, token) pairs numbered within a larger list
+                (e.g. one shard of a token file) rather than bare tokens numbered from 0
+            
+        Returns:
+            Summary with sent, failed, retries, throttled, skipped, elapsed and rate
+        """
+        template = payload
+        if not isinstance(payload, (PayloadTemplate, IterablePayloadFactory)):
+            template = PayloadTemplate(payload)
+        work = queue.Queue(maxsize=queue_size)
+        
+        def worker():
+            while True:
+                item = work.get()
+                try:
+                    if item is None:
+                        return
+                    index, token = item
+                    try:
+                        body = template.render_for(token, index)
+                    except (KeyError, ValueError) as e:
+                        print(f"❌ Cannot render payload for {token[:8]}...: {e}")
+                        self._count("failed")
+                        continue
+                    self.send_push(token, body, bundle_id, priority, expiration, push_type=push_type)
+                finally:
+                    work.task_done()
+        
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        
+        started = time.monotonic()
+        total = 0
+        invalid = self.invalid_tokens
+        skipped = {"apns_id": None, "topic": bundle_id, "priority": priority, "push_type": push_type}
+        for index, token in (device_tokens if indexed else enumerate(device_tokens)):
+            total += 1
+            if invalid is not None and invalid.is_invalid(token, bundle_id):
+                self._count("skipped")
+                self._record_result(token, skipped, "skipped", reason="KnownInvalidToken")
+                continue
+            work.put((index, token))  # Blocks while the queue is full (back-pressure)
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        
+        summary = dict(self.stats)
+        summary.update({
+            "total": total,
+            "elapsed": elapsed,
+            "rate": summary["sent"] / elapsed if elapsed > 0 else 0.0
+        })
+        if self.rate_limiter and self.rate_limiter.current_rate:
+            summary["final_rate_limit"] = self.rate_limiter.current_rate
+        return summary
+    
     def _validate_device_token(self, token: str) -> bool:
         """Validate device token format."""
         # iOS device tokens: 32 bytes (64 hex), 64 bytes (128 hex), or 80 bytes (160 hex)
@@ -248,11 +1575,13 @@ class APNsPushSender:
             
         return True
     
-    def _handle_response(self, response: httpx.Response, apns_id: str) -> bool:
-        """Handle APNs response."""
+    def _handle_response(self, response: httpx.Response, apns_id: str,
+                         device_token: Optional[str] = None, bundle_id: str = "") -> bool:
+        """Handle APNs response, recording permanently rejected tokens."""
         if response.status_code == 200:
-            print(f"✅ Push sent successfully!")
-            print(f"📋 Status: {response.status_code}")
+            if not self.quiet:
+                print(f"✅ Push sent successfully!")
+                print(f"📋 Status: {response.status_code}")
             return True
         else:
             print(f"❌ Push failed!")
@@ -266,11 +1595,378 @@ class APNsPushSender:
                     print(f"⏰ Timestamp: {error_data['timestamp']}")
             except:
                 print(f"📄 Response: {response.text}")
+                return False
+            
+            reason = error_data.get('reason')
+            if self.invalid_tokens is not None and device_token and reason in InvalidTokenStore.INVALID_REASONS:
+                self.invalid_tokens.record(device_token, reason, response.status_code, bundle_id,
+                                           error_data.get('timestamp'))
+                print(f"🗑️  Recorded invalid token ({reason})")
                 
             return False
 
 
 
+def _send_shard(shard: int, shards: int, token_file: str, payload: Union["PayloadTemplate", "IterablePayloadFactory"],
+                sender_options: Dict[str, Any], retry_options: Dict[str, Any],
+                limiter_options: Optional[Dict[str, Any]], send_options: Dict[str, Any],
+                invalid_token_db: Optional[str], trace_latency: bool,
+                results_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Worker process: send the tokens of one shard over this process's own connections."""
+    latency = LatencyRecorder() if trace_latency else None
+    results = None
+    if results_options:
+        results_options = dict(results_options, path=ResultSink.shard_path(results_options["path"], shard))
+        results = ResultSink(**results_options)
+    sender = APNsPushSender(
+        rate_limiter=RateLimiter(**limiter_options) if limiter_options else None,
+        retry_policy=RetryPolicy(**retry_options),
+        invalid_tokens=InvalidTokenStore(invalid_token_db) if invalid_token_db else None,
+        latency=latency,
+        results=results,
+        **sender_options
+    )
+    # Keep each token's position in the whole file, so a payload factory gives
+    # it the same payload as an unsharded run would
+    tokens = ((index, token) for index, token in enumerate(read_device_tokens(token_file))
+              if shard_of(token, shards) == shard)
+    try:
+        summary = sender.send_bulk(tokens, payload, indexed=True, **send_options)
+    finally:
+        sender.close()
+    summary["shard"] = shard
+    if latency:
+        summary["latency"] = latency.to_dict()
+    return summary
+
+
+def send_sharded(token_file: str, payload: Union["PayloadTemplate", "IterablePayloadFactory"], processes: int,
+                 sender_options: Dict[str, Any], retry_options: Optional[Dict[str, Any]] = None,
+                 limiter_options: Optional[Dict[str, Any]] = None,
+                 send_options: Optional[Dict[str, Any]] = None,
+                 invalid_token_db: Optional[str] = None,
+                 latency: Optional[LatencyRecorder] = None,
+                 results_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Send to every token in a file from several processes.
+    
+    Each worker process streams the token file itself and keeps the tokens
+    whose hash falls in its shard, so tokens never cross process boundaries
+    and no process holds the whole list. Workers open their own HTTP/2
+    connections; a global rate limit is split evenly between them, while
+    per-device budgets stay exact because a device always lands in the
+    same shard.
+    
+    Args:
+        token_file: File with one device token per line
+        payload: Compiled payload template or payload factory
+        processes: Number of worker processes (shards)
+        sender_options: APNsPushSender keyword arguments (cert_path, sandbox, base_url, ...)
+        retry_options: RetryPolicy keyword arguments
+        limiter_options: RateLimiter keyword arguments for the whole run (None for no pacing)
+        send_options: send_bulk keyword arguments (bundle_id, priority, workers, queue_size)
+        invalid_token_db: Invalid-token store shared by the workers (None to disable)
+        latency: Recorder the workers' latency histograms are merged into
+        results_options: ResultSink keyword arguments; each worker logs to its own shard file
+        
+    Returns:
+        Aggregated summary; per-worker summaries under "shards"
+    """
+    shard_limits = None
+    if limiter_options:
+        shard_limits = dict(limiter_options)
+        for key in ("rate", "burst"):
+            if shard_limits.get(key):
+                shard_limits[key] = shard_limits[key] / processes
+    
+    started = time.monotonic()
+    shards, errors = [], []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        futures = {
+            pool.submit(_send_shard, shard, processes, token_file, payload, sender_options,
+                        retry_options or {}, shard_limits, send_options or {}, invalid_token_db,
+                        latency is not None, results_options): shard
+            for shard in range(processes)
+        }
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ Shard {shard} failed: {e}")
+                errors.append({"shard": shard, "error": str(e)})
+                continue
+            if latency and "latency" in result:
+                latency.merge(result.pop("latency"))
+            print(f"🧩 Shard {shard}: {result['sent']}/{result['total']} sent in {result['elapsed']:.2f}s "
+                  f"({result['rate']:.1f}/s), {result['failed']} failed")
+            shards.append(result)
+    elapsed = time.monotonic() - started
+    
+    summary = {key: sum(result[key] for result in shards)
+               for key in ("sent", "failed", "retries", "throttled", "skipped", "total")}
+    summary.update({
+        "elapsed": elapsed,
+        "rate": summary["sent"] / elapsed if elapsed > 0 else 0.0,
+        "processes": processes,
+        "shards": sorted(shards, key=lambda result: result["shard"]),
+        "shard_errors": errors
+    })
+    return summary
+
+
+class LoadProfile:
+    """
+    Declarative send schedule made of consecutive segments.
+    
+    Segments (comma-separated, or a JSON list of objects with the same fields):
+    
+        steady:RATE:SECONDS      constant RATE pushes/s
+        ramp:FROM:TO:SECONDS     rate changing linearly from FROM to TO pushes/s
+        spike:COUNT              COUNT pushes due at the same instant (campaign blast)
+        poisson:RATE:SECONDS     random arrivals averaging RATE pushes/s
+    """
+    
+    FIELDS = {
+        "steady": ("rate", "duration"),
+        "ramp": ("start_rate", "end_rate", "duration"),
+        "spike": ("count",),
+        "poisson": ("rate", "duration")
+    }
+    
+    def __init__(self, segments: List[Dict[str, Any]]):
+        for segment in segments:
+            fields = self.FIELDS.get(segment.get("type"))
+            if fields is None or any(field not in segment for field in fields):
+                raise ValueError(f"Invalid load profile segment: {segment}")
+            if any(float(segment[field]) < 0 for field in fields):
+                raise ValueError(f"Load profile values must not be negative: {segment}")
+            segment.setdefault("duration", 0.0)
+        self.segments = segments
+    
+    @classmethod
+    def parse(cls, spec: str) -> "LoadProfile":
+        """Parse "steady:50:30,spike:500,ramp:50:0:10" or "@profile.json"."""
+        if spec.startswith("@"):
+            with open(spec[1:], "r") as f:
+                return cls(json.load(f))
+        segments = []
+        for part in spec.split(","):
+            kind, *values = part.strip().split(":")
+            fields = cls.FIELDS.get(kind)
+            if fields is None or len(values) != len(fields):
+                raise ValueError(f"Invalid load profile segment: {part}")
+            segment = {"type": kind}
+            segment.update((field, float(value)) for field, value in zip(fields, values))
+            segments.append(segment)
+        return cls(segments)
+    
+    @property
+    def duration(self) -> float:
+        return sum(segment["duration"] for segment in self.segments)
+    
+    def expected_count(self) -> float:
+        """Pushes the profile asks for (the mean, for Poisson segments)."""
+        total = 0.0
+        for segment in self.segments:
+            if segment["type"] == "spike":
+                total += segment["count"]
+            elif segment["type"] == "ramp":
+                total += (segment["start_rate"] + segment["end_rate"]) / 2 * segment["duration"]
+            else:
+                total += segment["rate"] * segment["duration"]
+        return total
+    
+    def arrivals(self, seed: Optional[int] = None) -> Iterator[Tuple[float, int]]:
+        """Lazily yield (offset from start in seconds, segment index) for every push, in order."""
+        rng = random.Random(seed)
+        start = 0.0
+        for index, segment in enumerate(self.segments):
+            kind, duration = segment["type"], segment["duration"]
+            if kind == "spike":
+                for _ in range(int(segment["count"])):
+                    yield start, index
+            elif kind == "steady" and segment["rate"] > 0:
+                for k in range(int(segment["rate"] * duration)):
+                    yield start + k / segment["rate"], index
+            elif kind == "poisson" and segment["rate"] > 0:
+                offset = rng.expovariate(segment["rate"])
+                while offset < duration:
+                    yield start + offset, index
+                    offset += rng.expovariate(segment["rate"])
+            elif kind == "ramp" and duration > 0:
+                # The k-th push is due when the integrated rate a*t + (b-a)*t^2/(2T) reaches k
+                a, b = segment["start_rate"], segment["end_rate"]
+                slope = (b - a) / duration
+                for k in range(int((a + b) / 2 * duration)):
+                    if slope:
+                        offset = (math.sqrt(max(0.0, a * a + 2 * slope * k)) - a) / slope
+                    else:
+                        offset = k / a
+                    yield start + offset, index
+            start += duration
+
+
+class LoadScheduler:
+    """
+    Drive an APNsPushSender along a LoadProfile with monotonic-clock pacing.
+    
+    Due times are absolute offsets from one monotonic start, so sleep
+    overshoot never accumulates. The dispatcher sleeps until shortly before
+    each due time and spins for the rest. Pushes whose send starts later than
+    max_lag after their due time are shed, which bounds the schedule drift
+    when APNs or the workers cannot keep up.
+    """
+    
+    SPIN_SECONDS = 0.001
+    
+    def __init__(self, sender: "APNsPushSender", profile: LoadProfile, workers: int = 8,
+                 max_lag: float = 1.0, seed: Optional[int] = None):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            sender: Sender the pushes go through
+            profile: Schedule to follow
+            workers: Concurrent pushes in flight
+            max_lag: Shed pushes starting more than this many seconds late (0 never sheds)
+            seed: Seed for Poisson arrivals
+        """
+        self.sender = sender
+        self.profile = profile
+        self.workers = workers
+        self.max_lag = max_lag
+        self.seed = seed
+    
+    def run(self, device_tokens: Iterable[str],
+            payload: Union[Dict[str, Any], PayloadTemplate, IterablePayloadFactory],
+            bundle_id: str = "com.sumeru.IterableSDK-Integration-Tester",
+            priority: int = 10, push_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Send the profile's pushes, cycling through the device tokens.
+        
+        Returns:
+            Overall and per-segment target vs achieved rates and lateness
+            
+        Raises:
+            ValueError: If the payload has custom slots, which nothing fills in profile mode
+        """
+        template = payload
+        if not isinstance(payload, (PayloadTemplate, IterablePayloadFactory)):
+            template = PayloadTemplate(payload)
+        if isinstance(template, PayloadTemplate):
+            # Only the built-in slots get values here; fail before any push is dispatched
+            unfilled = sorted(set(template.slot_names) - set(PayloadTemplate.BUILTIN_SLOT_SIZES))
+            if unfilled:
+                raise ValueError(f"Payload slots without a value: {', '.join(unfilled)}")
+        tokens = itertools.cycle(device_tokens)
+        segments = [{"index": index, "type": segment["type"], "target": 0, "sent": 0, "failed": 0,
+                     "shed": 0, "first_start": None, "last_start": None, "lateness": LatencyHistogram()}
+                    for index, segment in enumerate(self.profile.segments)]
+        lock = threading.Lock()
+        work = queue.Queue(maxsize=self.workers * 2)
+        
+        def worker():
+            while True:
+                item = work.get()
+                try:
+                    if item is None:
+                        return
+                    due, index, push_index, token = item
+                    started = time.monotonic()
+                    lateness = started - due
+                    stats = segments[index]
+                    if self.max_lag and lateness > self.max_lag:
+                        with lock:
+                            stats["shed"] += 1
+                        continue
+                    with lock:
+                        stats["lateness"].record(max(0.0, lateness))
+                        if stats["first_start"] is None:
+                            stats["first_start"] = started
+                        stats["last_start"] = max(stats["last_start"] or started, started)
+                    try:
+                        body = template.render_for(token, push_index)
+                    except (KeyError, ValueError) as e:
+                        print(f"❌ Cannot render payload for {token[:8]}...: {e}")
+                        with lock:
+                            stats["failed"] += 1
+                        continue
+                    success = self.sender.send_push(token, body, bundle_id, priority, push_type=push_type)
+                    with lock:
+                        stats["sent" if success else "failed"] += 1
+                finally:
+                    work.task_done()
+        
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        
+        dispatch_lateness = LatencyHistogram()
+        start = time.monotonic() + 0.05
+        for push_index, (offset, index) in enumerate(self.profile.arrivals(self.seed)):
+            due = start + offset
+            remaining = due - time.monotonic()
+            if remaining > self.SPIN_SECONDS:
+                time.sleep(remaining - self.SPIN_SECONDS)
+            while time.monotonic() < due:
+                pass
+            dispatch_lateness.record(time.monotonic() - due)
+            segments[index]["target"] += 1
+            work.put((due, index, push_index, next(tokens)))  # Blocks when every worker is busy
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+        
+        segment_start = 0.0
+        overall = LatencyHistogram()
+        for stats, segment in zip(segments, self.profile.segments):
+            duration = segment["duration"]
+            started = stats["sent"] + stats["failed"]
+            span = (stats["last_start"] - stats["first_start"]) if stats["first_start"] is not None else 0.0
+            window = max(duration, span)
+            stats["offset"] = segment_start
+            stats["duration"] = duration
+            stats["target_rate"] = stats["target"] / duration if duration else None
+            stats["achieved_rate"] = started / window if window else None
+            overall.merge(stats["lateness"])
+            stats["lateness"] = stats["lateness"].summary()
+            for key in ("first_start", "last_start"):
+                stats.pop(key)
+            segment_start += duration
+        
+        totals = {key: sum(stats[key] for stats in segments) for key in ("target", "sent", "failed", "shed")}
+        duration = self.profile.duration
+        totals.update({
+            "elapsed": elapsed,
+            "duration": duration,
+            "target_rate": totals["target"] / duration if duration else None,
+            "achieved_rate": (totals["sent"] + totals["failed"]) / elapsed if elapsed else None,
+            "lateness": overall.summary(),
+            "dispatch_lateness": dispatch_lateness.summary(),
+            "segments": segments
+        })
+        return totals
+    
+    @staticmethod
+    def format_report(report: Dict[str, Any]) -> str:
+        def rate(value):
+            return f"{value:.1f}/s" if value is not None else "burst"
+        
+        lines = [f"{'segment':<14} {'target':>7} {'sent':>7} {'failed':>7} {'shed':>6} "
+                 f"{'target rate':>12} {'achieved':>10} {'late p50':>9} {'late p99':>9} {'late max':>9}"]
+        for stats in report["segments"]:
+            lateness = stats["lateness"]
+            lines.append(f"{stats['index']}:{stats['type']:<12} {stats['target']:>7} {stats['sent']:>7} "
+                         f"{stats['failed']:>7} {stats['shed']:>6} {rate(stats['target_rate']):>12} "
+                         f"{rate(stats['achieved_rate']):>10} "
+                         + " ".join(f"{lateness[key] / 1000:>7.1f}ms" for key in ("p50_us", "p99_us", "max_us")))
+        return "\n".join(lines)
+
+
 def prompt_for_missing_args(args):
     """Prompt user for missing required arguments."""
     
@@ -279,7 +1975,7 @@ def prompt_for_missing_args(args):
         print()
     
     # Prompt for device token if not provided
-    if not args.token:
+    if not args.token and not getattr(args, 'token_file', None):
         if args.interactive:
             print("📱 Device Token Configuration")
         else:
@@ -339,7 +2035,7 @@ def prompt_for_missing_args(args):
         args._silent_prompted = True
     
     # Prompt for message if not provided and not silent
-    if not args.silent and not args.message:
+    if not args.silent and not args.message and not getattr(args, 'payload_factory', False):
         if args.interactive:
             print("💬 Message Configuration")
         else:
@@ -386,6 +2082,24 @@ Examples:
   
   # Silent push
   python test_push.py --token abc123... --cert push_cert.pem --silent
+  
+  # Bulk push to every token in a file, paced at 500/s and 1/s per device
+  python test_push.py --token-file tokens.txt --message "Hello" --cert push_cert.pem --rate 500 --device-rate 1
+  
+  # Bulk push with a fresh itbl.messageId per recipient ({{token}} and {{index}} also work)
+  python test_push.py --token-file tokens.txt --message "Hello" --cert push_cert.pem \\
+      --custom-data '{"itbl": {"messageId": "{{messageId}}"}}'
+  
+  # Write 10000 reproducible Iterable payloads (buttons, deep links, rich media, ...) as JSONL
+  python test_push.py --generate-payloads 10000 --payload-seed 7 --payloads-out payloads.jsonl
+  
+  # Log every outcome as JSON lines, then roll the log up
+  python test_push.py --token-file tokens.txt --message "Hello" --cert push_cert.pem --results results.jsonl
+  python test_push.py --summarize-results results.jsonl --summary-json summary.json
+  
+  # Bulk push a seeded mix of generated payloads, one per token
+  python test_push.py --token-file tokens.txt --cert push_cert.pem --payload-factory \\
+      --payload-mix 'buttons:3,rich_media:2,ghost:1,max_size:1'
         """
     )
     
@@ -420,6 +2134,14 @@ Examples:
         default="com.sumeru.IterableSDK-Integration-Tester",
         help="App bundle identifier"
     )
+    parser.add_argument(
+        "--base-url",
+        help="Send to this APNs endpoint instead of Apple's, e.g. https://localhost:2197 for apns_stub.py"
+    )
+    parser.add_argument(
+        "--ca-cert",
+        help="CA certificate to verify the APNs endpoint with (e.g. the stub's ca.pem)"
+    )
     parser.add_argument(
         "--production",
         action="store_true",
@@ -447,6 +2169,12 @@ Examples:
         default=10,
         help="Push priority: 5=low, 10=high (default: 10)"
     )
+    parser.add_argument(
+        "--push-type",
+        choices=["alert", "background", "voip", "complication", "fileprovider", "mdm", "liveactivity",
+                 "location", "pushtotalk"],
+        help="apns-push-type header (default: not sent)"
+    )
     parser.add_argument(
         "--custom-data",
         help="Custom JSON data to include in payload"
@@ -462,11 +2190,230 @@ Examples:
         help="Run in interactive mode (prompt for all arguments)"
     )
     
+    # Latency instrumentation
+    parser.add_argument(
+        "--latency",
+        action="store_true",
+        help="Trace request phases and print p50/p90/p99/max latencies at exit"
+    )
+    parser.add_argument(
+        "--latency-json",
+        metavar="PATH",
+        help="Also write the latency histograms as JSON at exit (implies --latency)"
+    )
+    parser.add_argument(
+        "--latency-interval",
+        type=float,
+        metavar="SECONDS",
+        help="Print the latency summary periodically during single-process bulk sends (implies --latency)"
+    )
+    
+    # Invalid-token store
+    parser.add_argument(
+        "--invalid-token-db",
+        default=str(InvalidTokenStore.DEFAULT_PATH),
+        help=f"SQLite store of tokens APNs rejected (default: {InvalidTokenStore.DEFAULT_PATH})"
+    )
+    parser.add_argument(
+        "--no-invalid-token-db",
+        action="store_true",
+        help="Neither skip nor record rejected tokens"
+    )
+    parser.add_argument(
+        "--export-invalid-tokens",
+        metavar="PATH",
+        help="Export rejected tokens as CSV (JSON for .json, '-' for stdout) and exit"
+    )
+    
+    # Result log
+    parser.add_argument(
+        "--results",
+        metavar="PATH",
+        help="Append one JSON line per push outcome to this file (per-shard files with --processes)"
+    )
+    parser.add_argument(
+        "--results-batch",
+        type=int,
+        default=256,
+        help="Records buffered before each write to --results (default: 256)"
+    )
+    parser.add_argument(
+        "--results-max-mb",
+        type=float,
+        default=100,
+        help="Rotate --results to a numbered segment past this size in MB (default: 100, 0 never rotates)"
+    )
+    parser.add_argument(
+        "--summarize-results",
+        nargs="+",
+        metavar="PATH",
+        help="Roll up result logs (with their rotated segments and shard files) and exit"
+    )
+    parser.add_argument(
+        "--summary-json",
+        metavar="PATH",
+        help="Also write the --summarize-results roll-up as JSON"
+    )
+    
+    # Generated Iterable payloads
+    parser.add_argument(
+        "--payload-factory",
+        action="store_true",
+        help="Send generated Iterable payloads (itbl metadata, buttons, attachments, ...) instead of --message"
+    )
+    parser.add_argument(
+        "--generate-payloads",
+        type=int,
+        metavar="COUNT",
+        help="Write COUNT generated payloads as JSON lines to --payloads-out and exit"
+    )
+    parser.add_argument(
+        "--payloads-out",
+        default="-",
+        metavar="PATH",
+        help="JSONL output of --generate-payloads (default: stdout)"
+    )
+    parser.add_argument(
+        "--payload-seed",
+        type=int,
+        default=0,
+        help="Seed of the generated payload sequence (default: 0)"
+    )
+    parser.add_argument(
+        "--payload-mix",
+        help="Relative weight per payload kind, e.g. 'alert:5,buttons:2,oversize:1' (kinds: "
+             + ", ".join(IterablePayloadFactory.DEFAULT_MIX) + ")"
+    )
+    
+    # Bulk sending and pacing
+    parser.add_argument(
+        "--token-file",
+        help="Send to every device token in this file (one per line) instead of --token"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Global ceiling in pushes per second; lowered adaptively on 429 (default: unlimited)"
+    )
+    parser.add_argument(
+        "--device-rate",
+        type=float,
+        help="Pushes per second per device token (default: unlimited)"
+    )
+    parser.add_argument(
+        "--burst",
+        type=float,
+        help="Global burst size (default: one second at --rate)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Concurrent pushes in bulk mode (default: 8)"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Shard --token-file across this many sender processes (default: 1)"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=100,
+        help="Maximum tokens waiting for a worker in bulk mode (default: 100)"
+    )
+    
+    # Load profiles
+    parser.add_argument(
+        "--profile",
+        help="Send along a load profile, e.g. 'steady:50:30,spike:500,ramp:50:0:10' or @profile.json "
+             "(segments: steady:RATE:SECONDS, ramp:FROM:TO:SECONDS, spike:COUNT, poisson:RATE:SECONDS); "
+             "--token/--token-file tokens are reused in turn"
+    )
+    parser.add_argument(
+        "--max-lag",
+        type=float,
+        default=1.0,
+        help="Drop profile pushes that would start more than this many seconds late (default: 1.0, 0 never drops)"
+    )
+    parser.add_argument(
+        "--profile-seed",
+        type=int,
+        help="Seed for Poisson arrivals"
+    )
+    parser.add_argument(
+        "--profile-report",
+        metavar="PATH",
+        help="Write the load profile report as JSON"
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=5,
+        help="Retries for 429/5xx responses and dropped connections (default: 5)"
+    )
+    parser.add_argument(
+        "--backoff-base",
+        type=float,
+        default=0.5,
+        help="Backoff cap of the first retry in seconds, doubled per retry (default: 0.5)"
+    )
+    parser.add_argument(
+        "--backoff-max",
+        type=float,
+        default=30.0,
+        help="Maximum backoff in seconds (default: 30)"
+    )
+    
     args = parser.parse_args()
     
+    if args.export_invalid_tokens:
+        store = InvalidTokenStore(args.invalid_token_db)
+        try:
+            count = store.export(args.export_invalid_tokens)
+        finally:
+            store.close()
+        if args.export_invalid_tokens != "-":
+            print(f"📤 Exported {count} invalid tokens to {args.export_invalid_tokens}")
+        sys.exit(0)
+    
+    if args.summarize_results:
+        summary = ResultSink.summarize(args.summarize_results)
+        if not summary["files"]:
+            print(f"❌ Error: No result logs found for {', '.join(args.summarize_results)}")
+            sys.exit(1)
+        print(ResultSink.format_summary(summary))
+        if args.summary_json:
+            with open(args.summary_json, "w") as f:
+                json.dump(summary, f, indent=2)
+            print(f"💾 Summary written to {args.summary_json}")
+        sys.exit(0)
+    
+    factory = None
+    if args.payload_factory or args.generate_payloads:
+        try:
+            mix = IterablePayloadFactory.parse_mix(args.payload_mix) if args.payload_mix else None
+            factory = IterablePayloadFactory(seed=args.payload_seed, mix=mix)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+    
+    if args.generate_payloads:
+        counts = factory.write_jsonl(args.payloads_out, args.generate_payloads)
+        if args.payloads_out != "-":
+            print(f"🧪 Wrote {args.generate_payloads} payloads to {args.payloads_out}: "
+                  + ", ".join(f"{kind} {count}" for kind, count in sorted(counts.items())))
+        sys.exit(0)
+    
     # Prompt for missing required arguments
     prompt_for_missing_args(args)
     
+    # Shard workers only hand back their latency histograms when they finish
+    if args.latency_interval and args.token_file and args.processes > 1 and not args.profile:
+        print("❌ Error: --latency-interval cannot be combined with --processes > 1")
+        sys.exit(1)
+    
     # Parse custom data
     custom_data = None
     if args.custom_data:
@@ -478,10 +2425,31 @@ Examples:
     
     try:
         # Create APNs client
+        rate_limiter = None
+        if args.rate or args.device_rate:
+            rate_limiter = RateLimiter(rate=args.rate, device_rate=args.device_rate, burst=args.burst)
+        invalid_tokens = None if args.no_invalid_token_db else InvalidTokenStore(args.invalid_token_db)
+        latency = None
+        if args.latency or args.latency_json or args.latency_interval:
+            latency = LatencyRecorder()
+            atexit.register(latency.report, args.latency_json)
+        sharded = bool(args.token_file) and args.processes > 1 and not args.profile
+        results_options = None
+        if args.results:
+            results_options = {"path": args.results, "batch_size": args.results_batch,
+                               "max_bytes": int(args.results_max_mb * 1024 * 1024)}
         sender = APNsPushSender(
             cert_path=args.cert,
             sandbox=not args.production,
-            cert_password=args.cert_password
+            cert_password=args.cert_password,
+            rate_limiter=rate_limiter,
+            retry_policy=RetryPolicy(args.max_retries, args.backoff_base, args.backoff_max),
+            quiet=bool(args.token_file) and not args.verbose,
+            invalid_tokens=invalid_tokens,
+            latency=latency,
+            base_url=args.base_url,
+            ca_cert=args.ca_cert,
+            results=ResultSink(**results_options) if results_options and not sharded else None
         )
         
         # Create payload
@@ -502,16 +2470,110 @@ Examples:
                 custom_data=custom_data
             )
         
-        if args.verbose:
+        if args.verbose and factory is None:
             print(f"📋 Payload: {json.dumps(payload, indent=2)}")
         
+        # Compile once; fails here if the payload cannot fit in 4 KB
+        template = factory if factory is not None else PayloadTemplate(payload)
+        if factory is not None:
+            print(f"🧪 Generated payloads (seed {factory.seed}): {', '.join(factory.kinds)}")
+        elif args.verbose:
+            print(f"📏 Payload size: {template.fixed_size} bytes + {len(template.slot_names)} slot(s)")
+        
+        # Follow a load profile
+        if args.profile:
+            profile = LoadProfile.parse(args.profile)
+            tokens = list(read_device_tokens(args.token_file)) if args.token_file else [args.token]
+            sender.quiet = not args.verbose
+            print(f"📈 Load profile: {len(profile.segments)} segments, ~{profile.expected_count():.0f} pushes "
+                  f"over {profile.duration:.1f}s")
+            scheduler = LoadScheduler(sender, profile, workers=args.workers, max_lag=args.max_lag,
+                                      seed=args.profile_seed)
+            try:
+                report = scheduler.run(tokens, template, bundle_id=args.bundle_id, priority=args.priority,
+                                       push_type=args.push_type)
+            finally:
+                sender.close()
+            print(LoadScheduler.format_report(report))
+            lateness = report['lateness']
+            print(f"📊 {report['sent']}/{report['target']} pushes sent in {report['elapsed']:.2f}s, "
+                  f"{report['failed']} failed, {report['shed']} shed; lateness p99 {lateness['p99_us'] / 1000:.1f}ms, "
+                  f"max {lateness['max_us'] / 1000:.1f}ms")
+            if args.profile_report:
+                with open(args.profile_report, "w") as f:
+                    json.dump(report, f, indent=2)
+                print(f"💾 Load profile report written to {args.profile_report}")
+            sys.exit(0 if report['failed'] == 0 and report['shed'] == 0 else 1)
+        
+        # Send to every token in the file from several processes
+        if sharded:
+            if invalid_tokens is not None:
+                print(f"⛔ {len(invalid_tokens)} known invalid tokens will be skipped")
+            sender.close()
+            summary = send_sharded(
+                args.token_file, template, args.processes,
+                sender_options={
+                    "cert_path": args.cert,
+                    "sandbox": not args.production,
+                    "cert_password": args.cert_password,
+                    "quiet": not args.verbose,
+                    "base_url": args.base_url,
+                    "ca_cert": args.ca_cert
+                },
+                retry_options={"max_retries": args.max_retries, "base_delay": args.backoff_base,
+                               "max_delay": args.backoff_max},
+                limiter_options={"rate": args.rate, "device_rate": args.device_rate, "burst": args.burst}
+                if args.rate or args.device_rate else None,
+                send_options={"bundle_id": args.bundle_id, "priority": args.priority,
+                              "workers": args.workers, "queue_size": args.queue_size,
+                              "push_type": args.push_type},
+                invalid_token_db=None if args.no_invalid_token_db else args.invalid_token_db,
+                latency=latency,
+                results_options=results_options
+            )
+            print(f"📊 Sent {summary['sent']}/{summary['total']} pushes in {summary['elapsed']:.2f}s "
+                  f"({summary['rate']:.1f}/s) from {summary['processes']} processes, {summary['failed']} failed, "
+                  f"{summary['retries']} retries, {summary['throttled']} throttled, "
+                  f"{summary['skipped']} skipped as invalid")
+            sys.exit(0 if summary['failed'] == 0 and not summary['shard_errors'] else 1)
+        
+        # Send to every token in the file
+        if args.token_file:
+            if latency and args.latency_interval:
+                latency.start_periodic(args.latency_interval)
+            try:
+                summary = sender.send_bulk(
+                    read_device_tokens(args.token_file),
+                    payload=template,
+                    bundle_id=args.bundle_id,
+                    priority=args.priority,
+                    workers=args.workers,
+                    queue_size=args.queue_size,
+                    push_type=args.push_type
+                )
+            finally:
+                sender.close()
+            print(f"📊 Sent {summary['sent']}/{summary['total']} pushes in {summary['elapsed']:.2f}s "
+                  f"({summary['rate']:.1f}/s), {summary['failed']} failed, {summary['retries']} retries, "
+                  f"{summary['throttled']} throttled, {summary['skipped']} skipped as invalid")
+            if 'final_rate_limit' in summary:
+                print(f"🚦 Final rate limit: {summary['final_rate_limit']:.1f}/s")
+            if args.verbose:
+                print(f"🔐 TLS handshakes: {sender.ssl_context.handshakes} "
+                      f"({sender.ssl_context.resumed} resumed sessions)")
+            sys.exit(0 if summary['failed'] == 0 else 1)
+        
         # Send push
-        success = sender.send_push(
-            device_token=args.token,
-            payload=payload,
-            bundle_id=args.bundle_id,
-            priority=args.priority
-        )
+        try:
+            success = sender.send_push(
+                device_token=args.token,
+                payload=template.render_for(args.token),
+                bundle_id=args.bundle_id,
+                priority=args.priority,
+                push_type=args.push_type
+            )
+        finally:
+            sender.close()
         
         sys.exit(0 if success else 1)
         
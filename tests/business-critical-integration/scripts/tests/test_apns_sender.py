@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Exercise APNsPushSender against an in-process apns_stub.py.
+
+The stub records every request it answers, so retries, the apns-id they
+carry and the effect of throttling are checked from the server's side.
+"""
+
+import collections
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apns_stub import APNsStub, generate_certificates  # noqa: E402
+from test_push import (  # noqa: E402
+    APNsPushSender, IterablePayloadFactory, RateLimiter, RetryPolicy, send_sharded
+)
+
+TOPIC = "com.sumeru.IterableSDK-Integration-Tester"
+
+
+class RecordingRateLimiter(RateLimiter):
+    """RateLimiter that remembers the global rate after every throttle."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.throttled_rates = []
+
+    def throttle(self):
+        super().throttle()
+        self.throttled_rates.append(self.current_rate)
+
+
+def device_tokens(count):
+    return [f"{index:064x}" for index in range(1, count + 1)]
+
+
+class APNsSenderStubTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._certs_dir = tempfile.TemporaryDirectory()
+        cls.certs = generate_certificates(cls._certs_dir.name, TOPIC)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._certs_dir.cleanup()
+
+    def start_stub(self, **options):
+        stub = APNsStub(self.certs["server"], self.certs["server_key"], ca_file=self.certs["ca"],
+                        require_client_cert=True, keep_records=True, seed=7, **options).start()
+        self.addCleanup(stub.stop)
+        return stub
+
+    def sender(self, stub, **options):
+        sender = APNsPushSender(self.certs["client"], base_url=stub.url, ca_cert=self.certs["ca"],
+                                quiet=True, **options)
+        self.addCleanup(sender.close)
+        return sender
+
+    def attempts_by_token(self, records, tokens):
+        """Group the stub's records by token, checking every token ended accepted under one apns-id."""
+        by_token = collections.defaultdict(list)
+        for record in records:
+            by_token[record["token"]].append(record)
+        self.assertEqual(set(by_token), set(tokens))
+        for token, attempts in by_token.items():
+            self.assertEqual(len({attempt["apns_id"] for attempt in attempts}), 1, token)
+            self.assertEqual(attempts[-1]["status"], 200, token)
+        self.assertEqual(len({attempts[0]["apns_id"] for attempts in by_token.values()}), len(tokens))
+        return by_token
+
+    def test_429_is_retried_with_the_same_apns_id_and_throttles(self):
+        stub = self.start_stub(inject=[(429, "TooManyRequests", 0.3)])
+        limiter = RecordingRateLimiter(rate=1000)
+        sender = self.sender(stub, rate_limiter=limiter,
+                             retry_policy=RetryPolicy(max_retries=20, base_delay=0.001, max_delay=0.01))
+        tokens = device_tokens(40)
+
+        summary = sender.send_bulk(tokens, {"aps": {"alert": "hi"}}, TOPIC, workers=4)
+
+        self.assertEqual((summary["sent"], summary["failed"]), (40, 0))
+        for token, attempts in self.attempts_by_token(stub.records, tokens).items():
+            self.assertEqual([attempt["status"] for attempt in attempts].count(200), 1, token)
+        rejected = [record for record in stub.records if record["status"] == 429]
+        self.assertTrue(rejected)
+        self.assertEqual({record["reason"] for record in rejected}, {"TooManyRequests"})
+        self.assertEqual(len(stub.records), 40 + len(rejected))
+        self.assertEqual(summary["retries"], len(rejected))
+        self.assertEqual(summary["throttled"], len(rejected))
+        # AIMD: every 429 halves the global rate (recovering additively in between)
+        self.assertEqual(limiter.throttle_events, len(rejected))
+        self.assertLessEqual(limiter.throttled_rates[0], 500)
+        self.assertLess(min(limiter.throttled_rates), 1000)
+
+    def test_goaway_moves_the_remaining_pushes_to_a_new_connection(self):
+        stub = self.start_stub(goaway_after=5)
+        sender = self.sender(stub, retry_policy=RetryPolicy(max_retries=5, base_delay=0.001, max_delay=0.01))
+        tokens = device_tokens(23)
+
+        summary = sender.send_bulk(tokens, {"aps": {"alert": "hi"}}, TOPIC, workers=1)
+
+        self.assertEqual((summary["sent"], summary["failed"]), (23, 0))
+        by_token = self.attempts_by_token(stub.records, tokens)
+        # httpcore fails the stream in flight when the GOAWAY arrives even
+        # though the stub still answers it, so that push is resent on a new
+        # connection under the same apns-id (which lets APNs collapse it)
+        retried = [token for token, attempts in by_token.items() if len(attempts) > 1]
+        self.assertTrue(retried)
+        self.assertEqual(summary["retries"], len(stub.records) - len(tokens))
+        for token in retried:
+            self.assertEqual([attempt["status"] for attempt in by_token[token]], [200, 200])
+        self.assertGreaterEqual(stub.stats["goaway"], len(retried))
+        self.assertEqual(stub._connections, stub.stats["goaway"] + 1)
+
+    def test_sharded_run_gives_each_token_its_unsharded_payload(self):
+        stub = self.start_stub()
+        tokens = device_tokens(12)
+        token_file = os.path.join(self._certs_dir.name, "tokens.txt")
+        with open(token_file, "w") as f:
+            f.write("# device tokens\n\n" + "\n".join(tokens) + "\n")
+        factory = IterablePayloadFactory(seed=3, mix={"alert": 1, "deeplink": 1, "buttons": 1})
+
+        summary = send_sharded(
+            token_file, factory, 3,
+            sender_options={"cert_path": self.certs["client"], "base_url": stub.url,
+                            "ca_cert": self.certs["ca"], "quiet": True},
+            send_options={"bundle_id": TOPIC, "workers": 2})
+
+        self.assertEqual((summary["sent"], summary["failed"], summary["shard_errors"]), (12, 0, []))
+        self.assertTrue(all(shard["total"] < 12 for shard in summary["shards"]))
+        payloads = {record["token"]: record["payload"] for record in stub.records}
+        self.assertEqual(payloads, {token: factory.generate(index)[1] for index, token in enumerate(tokens)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Compile-time checks of PayloadTemplate."""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test_push import PayloadTemplate  # noqa: E402
+
+
+class PayloadTemplateTests(unittest.TestCase):
+
+    def test_builtin_slots_need_no_declared_size(self):
+        template = PayloadTemplate({"aps": {"alert": "hi"}, "itbl": {"messageId": "{{messageId}}"}})
+        payload = json.loads(template.render_for("ab" * 32, 3))
+        self.assertEqual(len(payload["itbl"]["messageId"]), 36)
+
+    def test_custom_slot_without_maximum_size_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, "without a maximum size: campaignId"):
+            PayloadTemplate({"aps": {"alert": "hi"}, "itbl": {"campaignId": "{{campaignId}}"}})
+
+    def test_custom_slot_size_counts_towards_the_limit(self):
+        payload = {"aps": {"alert": "x" * 4000}, "itbl": {"campaignId": "{{campaignId}}"}}
+        PayloadTemplate(payload, {"campaignId": 20})
+        with self.assertRaisesRegex(ValueError, "over the APNs limit"):
+            PayloadTemplate(payload, {"campaignId": 200})
+
+
+if __name__ == "__main__":
+    unittest.main()